@@ -0,0 +1,231 @@
+# audio_io.py
+"""
+In-memory audio encoding and background file writes.
+
+Captured NumPy buffers are encoded straight into a ``BytesIO`` container for upload, so the hot path never
+touches the disk. Copies kept in the session folder are written by a background thread instead.
+
+Uploads can be compressed before they leave the machine: FLAC is lossless and roughly halves speech, while MP3
+and Opus shrink it by an order of magnitude. The compressed codecs are encoded by pydub and need ffmpeg.
+"""
+import contextlib
+import hashlib
+import io
+import logging
+import os
+import queue
+import threading
+import wave
+
+import numpy as np
+from pydub import AudioSegment
+
+logger = logging.getLogger(__name__)
+
+# Upload codecs: pydub export format, ffmpeg codec, default bitrate and the file extension sent to the API
+UPLOAD_CODECS = {
+    "wav": (None, None, None, "wav"),
+    "flac": ("flac", None, None, "flac"),
+    "mp3": ("mp3", None, "32k", "mp3"),
+    "opus": ("ogg", "libopus", "24k", "ogg"),
+}
+
+
+def to_int16(audio_data):
+    """
+    Returns the samples as a C-contiguous int16 array, scaling float input (range -1.0 to 1.0) as needed.
+    """
+    samples = np.asarray(audio_data)
+    if np.issubdtype(samples.dtype, np.floating):
+        samples = np.clip(samples, -1.0, 1.0) * 32767
+    return np.ascontiguousarray(samples, dtype=np.int16)
+
+
+def encode_wav(audio_data, rate, sample_width=2, name="audio.wav"):
+    """
+    Encodes a NumPy audio buffer as a WAV file held entirely in memory.
+
+    Args:
+        audio_data (numpy.ndarray): Samples shaped (n,) or (n, channels).
+        rate (int): The sample rate of the audio.
+        sample_width (int, optional): Bytes per sample. Only 16-bit audio is produced. Defaults to 2.
+        name (str, optional): File name reported to upload APIs, which use its extension to detect the format.
+
+    Returns:
+        io.BytesIO: The encoded WAV, rewound to the start and carrying a ``name`` attribute.
+    """
+    if sample_width != 2:
+        raise ValueError("Only 16-bit audio is supported")
+    samples = to_int16(audio_data)
+    channels = samples.shape[1] if samples.ndim > 1 else 1
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(samples.tobytes())
+    buffer.seek(0)
+    buffer.name = name
+    return buffer
+
+
+def pcm_fingerprint(audio, rate):
+    """
+    Returns a SHA-256 hex digest of the audio decoded to 16-bit mono PCM at ``rate``.
+
+    The hash is taken over the decoded samples rather than the file bytes, so the same recording matches whether
+    it arrives as a NumPy buffer, a WAV file or a losslessly re-encoded copy (e.g. FLAC), regardless of headers
+    or metadata.
+
+    Args:
+        audio (str | numpy.ndarray): A file path, or samples already at ``rate``.
+        rate (int): The sample rate to decode files to.
+    """
+    if isinstance(audio, (str, os.PathLike)):
+        segment = AudioSegment.from_file(audio).set_frame_rate(rate).set_channels(1).set_sample_width(2)
+        pcm = segment.raw_data
+    else:
+        samples = to_int16(audio)
+        if samples.ndim > 1 and samples.shape[1] > 1:
+            samples = samples.mean(axis=1).astype(np.int16)
+        pcm = samples.tobytes()
+    return hashlib.sha256(pcm).hexdigest()
+
+
+def concatenate_wav(clips):
+    """
+    Joins WAV clips that share the same format into a single WAV file.
+
+    Args:
+        clips (list): Encoded WAV files as bytes.
+
+    Returns:
+        bytes: One WAV file containing every clip in order.
+    """
+    params = None
+    frames = []
+    for clip in clips:
+        with wave.open(io.BytesIO(clip), "rb") as wav_file:
+            clip_params = (wav_file.getnchannels(), wav_file.getsampwidth(), wav_file.getframerate())
+            if params is not None and clip_params != params:
+                raise ValueError("Cannot join WAV clips with different formats")
+            params = clip_params
+            frames.append(wav_file.readframes(wav_file.getnframes()))
+    if params is None:
+        return b""
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(params[0])
+        wav_file.setsampwidth(params[1])
+        wav_file.setframerate(params[2])
+        wav_file.writeframes(b"".join(frames))
+    return buffer.getvalue()
+
+
+def encode_audio(audio_data, rate, codec="wav", sample_width=2, bitrate=None):
+    """
+    Encodes a NumPy audio buffer in memory with one of the UPLOAD_CODECS.
+
+    Args:
+        audio_data (numpy.ndarray): Samples shaped (n,) or (n, channels).
+        rate (int): The sample rate of the audio.
+        codec (str, optional): One of 'wav', 'flac', 'mp3' or 'opus'. Defaults to 'wav'.
+        sample_width (int, optional): Bytes per sample. Defaults to 2.
+        bitrate (str, optional): Bitrate for lossy codecs, e.g. '32k'. Defaults to the codec's speech default.
+
+    Returns:
+        io.BytesIO: The encoded audio, rewound and named with the codec's file extension.
+    """
+    if codec not in UPLOAD_CODECS:
+        raise ValueError(f"Unsupported upload codec: {codec}")
+    export_format, ffmpeg_codec, default_bitrate, extension = UPLOAD_CODECS[codec]
+    if export_format is None:
+        return encode_wav(audio_data, rate, sample_width, name=f"audio.{extension}")
+
+    samples = to_int16(audio_data)
+    segment = AudioSegment(
+        data=samples.tobytes(),
+        sample_width=sample_width,
+        frame_rate=rate,
+        channels=samples.shape[1] if samples.ndim > 1 else 1,
+    )
+    return _export(segment, export_format, ffmpeg_codec, bitrate or default_bitrate, extension)
+
+
+def encode_file(path, codec, bitrate=None):
+    """
+    Re-encodes an audio file on disk with one of the UPLOAD_CODECS and returns it as an in-memory file.
+    """
+    export_format, ffmpeg_codec, default_bitrate, extension = UPLOAD_CODECS[codec]
+    segment = AudioSegment.from_file(path)
+    if export_format is None:
+        export_format = "wav"
+    return _export(segment, export_format, ffmpeg_codec, bitrate or default_bitrate, extension)
+
+
+def _export(segment, export_format, ffmpeg_codec, bitrate, extension):
+    buffer = io.BytesIO()
+    segment.export(buffer, format=export_format, codec=ffmpeg_codec, bitrate=bitrate)
+    buffer.seek(0)
+    buffer.name = f"audio.{extension}"
+    return buffer
+
+
+@contextlib.contextmanager
+def open_upload(audio, rate, sample_width=2, codec="wav"):
+    """
+    Yields a binary file object for uploading ``audio``, which may be a file path, an open file object or a
+    NumPy buffer. Buffers are encoded with ``codec``; uncompressed WAV files on disk are re-encoded too, while
+    files that are already compressed are uploaded as they are. Files opened here are closed afterwards; file
+    objects passed in are left open.
+    """
+    if isinstance(audio, (str, os.PathLike)):
+        if codec != "wav" and os.fspath(audio).lower().endswith(".wav"):
+            yield encode_file(audio, codec)
+        else:
+            with open(audio, "rb") as audio_file:
+                yield audio_file
+    elif hasattr(audio, "read"):
+        yield audio
+    else:
+        yield encode_audio(audio, rate, codec, sample_width)
+
+
+class BackgroundWriter:
+    """
+    Writes audio files from a single background thread so capture and upload never wait on disk I/O.
+
+    Example:
+        writer = BackgroundWriter(rate=16000)
+        writer.save("session/user_voice.wav", audio_data)
+        writer.flush()  # wait for pending writes, e.g. before deleting the files
+    """
+
+    def __init__(self, rate, sample_width=2):
+        self.rate = rate
+        self.sample_width = sample_width
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="audio-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            path, audio_data = self._queue.get()
+            try:
+                buffer = encode_wav(audio_data, self.rate, self.sample_width)
+                with open(path, "wb") as audio_file:
+                    audio_file.write(buffer.getbuffer())
+            except Exception as e:
+                logger.error(f"Failed to save audio to {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def save(self, path, audio_data):
+        """Queues ``audio_data`` to be written to ``path`` as a WAV file and returns immediately."""
+        self._queue.put((path, audio_data))
+
+    def flush(self):
+        """Blocks until every queued write has finished."""
+        self._queue.join()
@@ -0,0 +1,375 @@
+# backends.py
+"""
+Interchangeable backends for the three model calls: transcription, translation and text-to-speech.
+
+Every backend has the same asyncio interface:
+
+    text = await backend.transcribe(audio, prompt=TRANSCRIPTION_PROMPT)    # path, file object or int16 buffer
+    text = await backend.translate(text, content, history=())               # content is the system prompt
+    async for token in backend.stream_translation(text, content): ...      # the same, token by token
+    clip = await backend.synthesize(text, voice)                            # WAV bytes
+    await backend.close()
+
+and names the models it uses (``transcription_model``, ``translation_model``, ``tts_model``), which the callers
+put into their cache keys so results of different backends never mix.
+
+- ``OpenAIBackend`` calls the OpenAI API over one pooled connection pool (see transport.py).
+- ``WhisperBackend`` transcribes with a resident local Whisper model and hands translation and speech to another
+  backend.
+- ``FakeBackend`` answers without network or model after delays drawn from configurable distributions, and fails
+  at configurable rates, for load tests and benchmarks of everything around the model calls.
+
+``create_backend`` builds one from its name and the loaded configuration.
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import wave
+
+import numpy as np
+from openai import AsyncOpenAI
+
+import audio_io
+import metrics
+import transport
+from latency import Latency
+from prompts import TRANSCRIPTION_MODEL, TRANSCRIPTION_PROMPT, TRANSLATION_MODEL, TTS_MODEL
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("openai", "whisper", "fake")
+
+RATE = 16000  # sample rate of captured audio
+SAMPLE_WIDTH = 2
+TTS_RATE = 24000  # sample rate of the WAV clips returned by the OpenAI speech endpoint
+
+
+class BackendError(Exception):
+    """
+    Raised when a backend call fails, e.g. on an error status from the API or an injected fake failure.
+
+    Attributes:
+        status (int): The HTTP status, if there was one; resilience.RetryPolicy retries the transient ones.
+        headers (Mapping): The response headers, e.g. with the server's ``Retry-After``.
+    """
+
+    def __init__(self, message, status=None, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class OpenAIBackend:
+    """
+    Transcribes, translates and speaks through the OpenAI API.
+
+    Args:
+        api_key (str): The OpenAI API key.
+        codec (str, optional): Upload codec for transcription, see audio_io.UPLOAD_CODECS.
+        **settings: Connection settings as returned by transport.transport_settings.
+    """
+
+    transcription_model = TRANSCRIPTION_MODEL
+    translation_model = TRANSLATION_MODEL
+    tts_model = TTS_MODEL
+
+    def __init__(self, api_key, codec="wav", **settings):
+        settings = {**transport.transport_settings({}), **settings}
+        self.codec = codec
+        self.http_client = transport.create_async_http_client(**settings)
+        # Retries are left to resilience.RetryPolicy, which also bounds them with a deadline
+        self.client = AsyncOpenAI(
+            api_key=api_key, base_url=settings["base_url"], http_client=self.http_client, max_retries=0
+        )
+        self.chat_url = transport.chat_completion_url(settings["base_url"])
+        self.headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
+
+    def _encode(self, audio):
+        with metrics.span("encode", codec=self.codec):
+            with audio_io.open_upload(audio, RATE, SAMPLE_WIDTH, codec=self.codec) as audio_file:
+                upload = os.path.basename(getattr(audio_file, "name", "audio.wav")), audio_file.read()
+        metrics.observe("upload_bytes", len(upload[1]), buckets=metrics.SIZE_BUCKETS, codec=self.codec)
+        return upload
+
+    async def transcribe(self, audio, prompt=TRANSCRIPTION_PROMPT):
+        # Encoding may run ffmpeg, so it is kept off the event loop
+        upload = await asyncio.to_thread(self._encode, audio)
+        options = {"prompt": prompt} if prompt else {}
+        with metrics.span("transcribe", backend="openai"):
+            response = await self.client.audio.transcriptions.create(
+                model=self.transcription_model, file=upload, **options
+            )
+        text = getattr(response, "text", None)
+        logger.debug(f"Transcription response: {len(text or '')} characters from {len(upload[1])} uploaded bytes")
+        return text
+
+    def _payload(self, text, content, history=()):
+        messages = [{"role": "system", "content": content}]
+        for source, translation in history:
+            messages.append({"role": "user", "content": source})
+            messages.append({"role": "assistant", "content": translation})
+        messages.append({"role": "user", "content": f"{text}"})
+        return {"model": self.translation_model, "messages": messages}
+
+    async def translate(self, text, content, history=()):
+        with metrics.span("translate", backend="openai"):
+            response = await self.http_client.post(
+                self.chat_url, headers=self.headers, json=self._payload(text, content, history)
+            )
+        if response.status_code != 200:
+            raise BackendError(
+                f"Translation request failed ({response.status_code}): {response.text}",
+                status=response.status_code,
+                headers=response.headers,
+            )
+        return response.json()["choices"][0]["message"]["content"].strip()
+
+    async def stream_translation(self, text, content, history=()):
+        with metrics.span("translate", backend="openai", streamed="true"):
+            start = time.perf_counter()
+            first = True
+            async for token in transport.astream_chat_completion(
+                self.http_client, self.chat_url, self.headers, self._payload(text, content, history)
+            ):
+                if first:
+                    metrics.observe("translate_first_token_seconds", time.perf_counter() - start)
+                    first = False
+                yield token
+
+    async def synthesize(self, text, voice):
+        with metrics.span("synthesize", backend="openai"):
+            response = await self.client.audio.speech.create(
+                model=self.tts_model, voice=voice, input=text, response_format="wav"
+            )
+        metrics.observe("tts_bytes", len(response.content), buckets=metrics.SIZE_BUCKETS)
+        return response.content
+
+    async def close(self):
+        await self.http_client.aclose()
+
+
+class WhisperBackend:
+    """
+    Transcribes with a local Whisper model (see whisper_models) and delegates translation and speech.
+
+    Transcriptions run on a worker thread, one at a time, so the event loop stays responsive and concurrent
+    utterances do not oversubscribe the CPU.
+
+    Args:
+        size (str, optional): The Whisper model name; defaults to whisper_models.DEFAULT_MODEL.
+        delegate (optional): The backend used for translate, stream_translation and synthesize.
+        preload (bool, optional): Start loading the model in the background right away.
+    """
+
+    local_transcription = True  # see resilience.wrap_backend
+
+    def __init__(self, size=None, delegate=None, preload=False):
+        # Imported here so the other backends work without PyTorch installed
+        import whisper_models
+
+        self._models = whisper_models
+        self.size = size or whisper_models.DEFAULT_MODEL
+        self.delegate = delegate
+        self.transcription_model = f"whisper-local-{self.size}"
+        self._lock = threading.Lock()
+        if preload:
+            whisper_models.preload(self.size)
+
+    @property
+    def translation_model(self):
+        return getattr(self.delegate, "translation_model", None)
+
+    @property
+    def tts_model(self):
+        return getattr(self.delegate, "tts_model", None)
+
+    def _transcribe(self, audio, prompt):
+        if not isinstance(audio, (str, os.PathLike)):
+            audio = audio_io.to_int16(audio).reshape(-1).astype(np.float32) / 32768.0
+        with self._lock, metrics.span("transcribe", backend="whisper"):
+            result, _, _ = self._models.transcribe(audio, self.size, initial_prompt=prompt or None)
+        return result["text"].strip()
+
+    async def transcribe(self, audio, prompt=None):
+        # The OpenAI transcription prompt is an instruction, not the preceding text Whisper expects, so it is not
+        # passed on by default
+        return await asyncio.to_thread(self._transcribe, audio, prompt)
+
+    def _require_delegate(self, call):
+        if self.delegate is None:
+            raise BackendError(f"WhisperBackend only transcribes; give it a delegate for {call}")
+        return self.delegate
+
+    async def translate(self, text, content, history=()):
+        return await self._require_delegate("translation").translate(text, content, history)
+
+    async def stream_translation(self, text, content, history=()):
+        async for token in self._require_delegate("translation").stream_translation(text, content, history):
+            yield token
+
+    async def synthesize(self, text, voice):
+        return await self._require_delegate("speech").synthesize(text, voice)
+
+    async def close(self):
+        if self.delegate is not None:
+            await self.delegate.close()
+
+
+class FakeStage:
+    """
+    The behaviour of one fake call: its latency distribution and the fraction of calls that fail.
+
+    Args:
+        latency (str | float | Latency, optional): See Latency.
+        error_rate (float, optional): Probability, from 0 to 1, that a call raises BackendError (status 503).
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0):
+        self.latency = Latency.parse(latency)
+        self.error_rate = float(error_rate)
+
+    @classmethod
+    def from_config(cls, settings):
+        settings = settings or {}
+        return cls(settings.get("latency", 0.0), settings.get("error_rate", 0.0))
+
+
+# Words the fake transcriber strings together; about 2.5 of them per second of audio, like ordinary speech
+FAKE_WORDS = "the quick brown fox jumps over the lazy dog while we translate every word as fast as we can".split()
+WORDS_PER_SECOND = 2.5
+
+
+def audio_duration(audio, rate=RATE):
+    """Returns the length in seconds of a buffer or WAV file, or 0.0 if it cannot be told cheaply."""
+    if isinstance(audio, (str, os.PathLike)):
+        try:
+            with wave.open(os.fspath(audio), "rb") as wav_file:
+                return wav_file.getnframes() / wav_file.getframerate()
+        except (wave.Error, EOFError, OSError):
+            return 0.0
+    if hasattr(audio, "read"):
+        return 0.0
+    return len(audio) / rate
+
+
+class FakeBackend:
+    """
+    Answers every call locally after a random delay, without network, model or API key.
+
+    The transcript has as many words as the audio would hold, the translation is the transcript with a marker,
+    and the speech is a silent WAV as long as the text would take to say, so everything downstream sees realistic
+    sizes. With a ``seed`` the delays and failures follow the same sequence on every run (for a given call order).
+
+    Args:
+        transcribe (FakeStage, optional): Behaviour of transcribe.
+        translate (FakeStage, optional): Behaviour of translate; the latency is the time to the first token.
+        synthesize (FakeStage, optional): Behaviour of synthesize.
+        token_interval (str | float | Latency, optional): Delay between streamed translation tokens.
+        seed (int, optional): Seed for the delays and failures.
+
+    Example:
+        backend = FakeBackend(transcribe=FakeStage("lognormal:0.5,0.4", error_rate=0.01), seed=1)
+    """
+
+    transcription_model = "fake-transcription"
+    translation_model = "fake-translation"
+    tts_model = "fake-tts"
+
+    def __init__(self, transcribe=None, translate=None, synthesize=None, token_interval=0.0, seed=None):
+        self.stages = {
+            "transcribe": transcribe or FakeStage(),
+            "translate": translate or FakeStage(),
+            "synthesize": synthesize or FakeStage(),
+        }
+        self.token_interval = Latency.parse(token_interval)
+        self.rng = random.Random(seed)
+        self.calls = {name: 0 for name in self.stages}
+        self.failures = {name: 0 for name in self.stages}
+        self._clips = {}
+
+    @classmethod
+    def from_config(cls, settings):
+        """
+        Builds a FakeBackend from the ``fake:`` section of config.yaml, e.g.
+        ``{'seed': 1, 'transcribe': {'latency': 'lognormal:0.5,0.4', 'error_rate': 0.01}}``.
+        """
+        settings = settings or {}
+        return cls(
+            transcribe=FakeStage.from_config(settings.get("transcribe")),
+            translate=FakeStage.from_config(settings.get("translate")),
+            synthesize=FakeStage.from_config(settings.get("synthesize")),
+            token_interval=settings.get("token_interval", 0.0),
+            seed=settings.get("seed"),
+        )
+
+    async def _call(self, name):
+        stage = self.stages[name]
+        self.calls[name] += 1
+        delay = stage.latency.sample(self.rng)
+        fail = stage.error_rate > 0 and self.rng.random() < stage.error_rate
+        with metrics.span(name, backend="fake"):
+            await asyncio.sleep(delay)
+            if fail:
+                self.failures[name] += 1
+                raise BackendError(f"Injected {name} failure", status=503)
+
+    async def transcribe(self, audio, prompt=None):
+        await self._call("transcribe")
+        words = max(1, round(audio_duration(audio) * WORDS_PER_SECOND))
+        return " ".join(FAKE_WORDS[i % len(FAKE_WORDS)] for i in range(words))
+
+    async def translate(self, text, content, history=()):
+        await self._call("translate")
+        return f"[translated] {text}"
+
+    async def stream_translation(self, text, content, history=()):
+        await self._call("translate")
+        for index, word in enumerate(f"[translated] {text}".split()):
+            if index:
+                delay = self.token_interval.sample(self.rng)
+                if delay:
+                    await asyncio.sleep(delay)
+            yield " " + word if index else word
+
+    async def synthesize(self, text, voice):
+        await self._call("synthesize")
+        samples = int(TTS_RATE * len(text.split()) / WORDS_PER_SECOND)
+        clip = self._clips.get(samples)
+        if clip is None:
+            clip = self._clips[samples] = audio_io.encode_wav(np.zeros(samples, dtype=np.int16), TTS_RATE).getvalue()
+        return clip
+
+    async def close(self):
+        pass
+
+    def report(self):
+        return " ".join(f"{name}={self.calls[name]} calls/{self.failures[name]} failed" for name in self.stages)
+
+
+def create_backend(name, config=None, codec="wav", model=None, preload=False):
+    """
+    Creates a backend by name.
+
+    Args:
+        name (str): 'openai', 'whisper' (local transcription, OpenAI for the rest) or 'fake'.
+        config (dict, optional): The loaded config.yaml; the OpenAI backends need ``openai.api_key``, the fake one
+                                 reads its ``fake:`` section.
+        codec (str, optional): Upload codec for the OpenAI transcription.
+        model (str, optional): The Whisper model size for 'whisper'.
+        preload (bool, optional): Start loading the Whisper model right away.
+
+    Raises:
+        ValueError: For an unknown name.
+    """
+    config = config or {}
+    if name == "fake":
+        return FakeBackend.from_config(config.get("fake"))
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    openai_backend = OpenAIBackend(config["openai"]["api_key"], codec=codec, **transport.transport_settings(config))
+    if name == "whisper":
+        return WhisperBackend(model, delegate=openai_backend, preload=preload)
+    return openai_backend
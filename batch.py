@@ -0,0 +1,220 @@
+# batch.py
+"""
+Offline batch transcription and translation of recorded audio files.
+
+Inputs may be files, directories (searched recursively) or glob patterns. Files are processed by a worker pool and
+every result is appended to a manifest (JSONL or CSV, chosen by the file extension) as soon as it completes. Files
+already recorded as completed in the manifest are skipped, so an interrupted run can simply be started again.
+"""
+import csv
+import glob
+import json
+import logging
+import os
+import queue
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from colorama import Fore, Style
+from pydub import AudioSegment
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg", ".oga", ".opus", ".webm", ".mp4", ".mpeg", ".mpga")
+MANIFEST_FIELDS = ["file", "status", "audio_seconds", "seconds", "transcription", "translation", "error"]
+
+
+def expand_inputs(inputs):
+    """
+    Expands files, directories and glob patterns into a sorted list of unique audio file paths.
+
+    Args:
+        inputs (list): Paths or patterns as given on the command line.
+
+    Returns:
+        list: Absolute paths of the audio files found.
+    """
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                found.update(
+                    os.path.join(root, name) for name in names if name.lower().endswith(AUDIO_EXTENSIONS)
+                )
+        elif os.path.isfile(item):
+            found.add(item)
+        else:
+            found.update(
+                path
+                for path in glob.glob(item, recursive=True)
+                if os.path.isfile(path) and path.lower().endswith(AUDIO_EXTENSIONS)
+            )
+    return sorted(os.path.abspath(path) for path in found)
+
+
+def audio_duration(path):
+    """Returns the length of an audio file in seconds, reading only the header for WAV files."""
+    if path.lower().endswith(".wav"):
+        try:
+            with wave.open(path, "rb") as wav_file:
+                return wav_file.getnframes() / float(wav_file.getframerate())
+        except wave.Error:
+            pass  # compressed or unusual WAV; let ffmpeg work it out
+    return AudioSegment.from_file(path).duration_seconds
+
+
+def _is_csv(manifest_path):
+    return manifest_path.lower().endswith(".csv")
+
+
+def load_completed(manifest_path):
+    """
+    Returns the set of files recorded as successfully completed in an existing manifest.
+
+    A record cut off by an interrupted run (a last line without a newline) is dropped from the file, so the
+    resumed run appends its records on a fresh line and the file is processed again.
+    """
+    if not os.path.exists(manifest_path):
+        return set()
+    with open(manifest_path, "rb+") as manifest:
+        data = manifest.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            logger.warning(f"Dropping the incomplete last record of {manifest_path}: {data[end:]!r}")
+            manifest.truncate(end)
+    completed = set()
+    with open(manifest_path, "r", encoding="utf-8", newline="") as manifest:
+        if _is_csv(manifest_path):
+            records = csv.DictReader(manifest)
+        else:
+            records = (json.loads(line) for line in manifest if line.strip())
+        for record in records:
+            if record.get("status") == "ok":
+                completed.add(record["file"])
+    return completed
+
+
+class ManifestWriter:
+    """Appends one record per processed file to a JSONL or CSV manifest, flushing after every record."""
+
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+        is_new = not os.path.exists(manifest_path) or os.path.getsize(manifest_path) == 0
+        self._file = open(manifest_path, "a", encoding="utf-8", newline="")
+        self._csv = None
+        if _is_csv(manifest_path):
+            self._csv = csv.DictWriter(self._file, fieldnames=MANIFEST_FIELDS, extrasaction="ignore")
+            if is_new:
+                self._csv.writeheader()
+
+    def write(self, record):
+        if self._csv is not None:
+            self._csv.writerow(record)
+        else:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _timed(process, path):
+    # Runs inside the worker so the measured time excludes queueing in the pool
+    start = time.perf_counter()
+    return process(path), time.perf_counter() - start
+
+
+def run_batch(
+    files,
+    process,
+    manifest_path,
+    workers=4,
+    use_processes=False,
+    finalize=None,
+    initializer=None,
+    initargs=(),
+):
+    """
+    Processes audio files with a worker pool and records each result in the manifest.
+
+    Args:
+        files (list): The audio files to process.
+        process (callable): Called in a worker with a file path; returns a dict of result fields, e.g.
+                            {'transcription': ...}. Must be picklable when use_processes is True.
+        manifest_path (str): The JSONL or CSV manifest to append to and resume from.
+        workers (int, optional): Number of workers. Defaults to 4.
+        use_processes (bool, optional): Use a process pool (for CPU-bound local models) instead of threads.
+        finalize (callable, optional): Called in the parent with each successful result dict and may add fields,
+                                       e.g. a translation. Runs on a thread pool of the same size.
+        initializer (callable, optional): Worker initializer for the pool.
+        initargs (tuple, optional): Arguments for the initializer.
+
+    Returns:
+        dict: Summary with the counts of processed, skipped and failed files, total audio seconds, wall seconds
+              and throughput in audio-seconds per wall-second.
+    """
+    completed = load_completed(manifest_path)
+    pending = [path for path in files if path not in completed]
+    skipped = len(files) - len(pending)
+    if skipped:
+        print(Fore.CYAN + f"Skipping {skipped} file(s) already completed in {manifest_path}" + Style.RESET_ALL)
+
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    summary = {"processed": 0, "skipped": skipped, "failed": 0, "audio_seconds": 0.0}
+    start = time.perf_counter()
+
+    with ManifestWriter(manifest_path) as manifest, executor_class(
+        max_workers=workers, initializer=initializer, initargs=initargs
+    ) as pool, ThreadPoolExecutor(max_workers=workers) as finalizers:
+
+        def finish(path, future):
+            record = {"file": path, "status": "ok", "error": None}
+            try:
+                result, seconds = future.result()
+                record.update(result or {})
+                record["seconds"] = round(seconds, 3)
+                if finalize is not None:
+                    record.update(finalize(record) or {})
+                record["audio_seconds"] = round(audio_duration(path), 3)
+            except Exception as e:
+                record.update(status="error", error=str(e))
+            return record
+
+        # Each finished file is finalized on a thread and handed back here, so the manifest is written as results
+        # arrive rather than in submission order
+        records = queue.Queue()
+
+        def on_done(path, future):
+            finalizers.submit(finish, path, future).add_done_callback(lambda f: records.put(f.result()))
+
+        for path in pending:
+            pool.submit(_timed, process, path).add_done_callback(lambda f, path=path: on_done(path, f))
+
+        for _ in pending:
+            record = records.get()
+            manifest.write(record)
+            if record["status"] == "ok":
+                summary["processed"] += 1
+                summary["audio_seconds"] += record.get("audio_seconds") or 0.0
+                print(Fore.GREEN + f"Done: {record['file']}" + Style.RESET_ALL)
+            else:
+                summary["failed"] += 1
+                logger.error(Fore.RED + f"Failed: {record['file']}: {record['error']}\n")
+
+    summary["wall_seconds"] = time.perf_counter() - start
+    summary["throughput"] = summary["audio_seconds"] / summary["wall_seconds"] if summary["wall_seconds"] else 0.0
+    print(
+        Fore.YELLOW
+        + f"Processed {summary['processed']} file(s), {summary['failed']} failed, {summary['skipped']} skipped. "
+        + f"{summary['audio_seconds']:.1f}s of audio in {summary['wall_seconds']:.1f}s "
+        + f"({summary['throughput']:.2f} audio-seconds per wall-second)"
+        + Style.RESET_ALL
+    )
+    return summary
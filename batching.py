@@ -0,0 +1,194 @@
+# batching.py
+"""
+Micro-batching of translation calls.
+
+With --vad or short -d durations, utterances arrive every few seconds and each one is a separate chat completion
+with its own request overhead. ``BatchingBackend`` collects translations that arrive close together and sends them
+as one request, with every utterance introduced by a numbered marker:
+
+    <<1>>
+    first utterance
+    <<2>>
+    second utterance
+
+The model is asked to answer in the same format, and the reply is split back into one translation per utterance,
+in order. If the reply does not have exactly the markers that were sent, each utterance is translated on its own
+instead, so a batch never loses or shifts a translation.
+
+How long a new batch waits for company adapts to the traffic: when utterances arrive further apart than the
+window, a lone utterance is sent at once; in a burst, it waits about as long as the next one is expected to take,
+longer the more translations are already queued or in flight, but never longer than the window. Only requests
+with the same system prompt and conversation history are batched together.
+"""
+import asyncio
+import logging
+import re
+
+import metrics
+from conversation import count_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 0.3  # seconds a batch waits for more utterances at most
+DEFAULT_MAX_ITEMS = 8
+DEFAULT_MAX_TOKENS = 1000  # tokens of source text per batch
+GAP_SMOOTHING = 0.3  # weight of the latest gap between arrivals in its moving average
+BATCH_SIZE_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16)
+
+BATCH_INSTRUCTIONS = (
+    "The user message contains several separate texts, each introduced by a marker line such as <<1>>. Translate "
+    "every text on its own as instructed above. Answer with the same marker lines in the same order, each followed "
+    "only by the translation of that text, and nothing else."
+)
+MARKER = re.compile(r"[ \t]*<<(\d+)>>[ \t]*\n?")
+
+
+def join_batch(texts):
+    """Returns the user message for a batch of texts."""
+    return "\n".join(f"<<{number}>>\n{text}" for number, text in enumerate(texts, start=1))
+
+
+def split_batch(reply, count):
+    """Returns the ``count`` translations in a batched reply, in order, or None if its markers do not match."""
+    parts = MARKER.split(reply or "")
+    numbers = [int(number) for number in parts[1::2]]
+    translations = [text.strip() for text in parts[2::2]]
+    if numbers != list(range(1, count + 1)) or not all(translations):
+        return None
+    return translations
+
+
+class _Batch:
+    __slots__ = ("items", "tokens", "full")
+
+    def __init__(self):
+        self.items = []  # (text, future)
+        self.tokens = 0
+        self.full = asyncio.Event()
+
+
+class BatchingBackend:
+    """
+    Wraps a backend from backends.py so that ``translate`` calls arriving close together share one request. The
+    other calls, including ``stream_translation``, go to the wrapped backend unchanged.
+
+    Args:
+        backend: The backend to wrap.
+        window (float, optional): Seconds a batch waits for more utterances at most; 0 turns batching off.
+        max_items (int, optional): Utterances per batch; a full batch is sent at once.
+        max_tokens (int, optional): Tokens of source text per batch; an utterance that would exceed it starts the
+                                    next batch.
+    """
+
+    def __init__(self, backend, window=DEFAULT_WINDOW, max_items=DEFAULT_MAX_ITEMS, max_tokens=DEFAULT_MAX_TOKENS):
+        self.backend = backend
+        self.window = window
+        self.max_items = max(1, max_items)
+        self.max_tokens = max_tokens
+        self.batches = 0
+        self.batched = 0
+        self.fallbacks = 0
+        self._open = {}  # (content, history) -> the batch still accepting utterances
+        self._tasks = set()
+        self._outstanding = 0  # translations queued or in flight
+        self._gap = None  # moving average of the seconds between arrivals
+        self._last_arrival = None
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def _observe_arrival(self, now):
+        if self._last_arrival is not None:
+            gap = now - self._last_arrival
+            self._gap = gap if self._gap is None else GAP_SMOOTHING * gap + (1 - GAP_SMOOTHING) * self._gap
+        self._last_arrival = now
+
+    def _wait(self):
+        """Seconds a new batch waits for more utterances; see the module docstring."""
+        if self._gap is None or self._gap >= self.window:
+            return 0.0
+        return min(self.window, self._gap * max(1, self._outstanding))
+
+    def _close(self, key, batch):
+        if self._open.get(key) is batch:
+            del self._open[key]
+        batch.full.set()
+
+    async def translate(self, text, content, history=()):
+        if self.window <= 0:
+            return await self.backend.translate(text, content, history)
+        loop = asyncio.get_running_loop()
+        self._observe_arrival(loop.time())
+        key = (content, tuple(history))
+        tokens = count_tokens(text)
+        batch = self._open.get(key)
+        if batch is not None and batch.items and batch.tokens + tokens > self.max_tokens:
+            self._close(key, batch)
+            batch = None
+        future = loop.create_future()
+        self._outstanding += 1
+        try:
+            if batch is None:
+                batch = self._open[key] = _Batch()
+                task = asyncio.ensure_future(self._run(key, batch, content, history, self._wait()))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            batch.items.append((text, future))
+            batch.tokens += tokens
+            if len(batch.items) >= self.max_items:
+                self._close(key, batch)
+            return await future
+        finally:
+            self._outstanding -= 1
+
+    async def _run(self, key, batch, content, history, wait):
+        if wait > 0:
+            try:
+                await asyncio.wait_for(batch.full.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+        self._close(key, batch)
+        texts = [text for text, _ in batch.items]
+        futures = [future for _, future in batch.items]
+        metrics.observe("translation_batch_size", len(texts), buckets=BATCH_SIZE_BUCKETS)
+        self.batches += 1
+        self.batched += len(texts)
+        try:
+            if len(texts) == 1:
+                results = [await self.backend.translate(texts[0], content, history)]
+            else:
+                logger.info(f"Translating {len(texts)} utterances in one request (waited up to {wait:.2f}s)")
+                reply = await self.backend.translate(
+                    join_batch(texts), f"{content}\n\n{BATCH_INSTRUCTIONS}", history
+                )
+                results = split_batch(reply, len(texts))
+                if results is None:
+                    # Translated one by one rather than risking a translation ending up with the wrong utterance
+                    self.fallbacks += 1
+                    metrics.inc("translation_batch_fallbacks_total")
+                    logger.warning(f"Batched reply did not match its {len(texts)} markers; translating separately")
+                    results = await asyncio.gather(
+                        *(self.backend.translate(text, content, history) for text in texts), return_exceptions=True
+                    )
+        except Exception as e:
+            results = [e] * len(texts)
+        for future, result in zip(futures, results):
+            if future.done():
+                continue  # the caller gave up waiting
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def summary(self):
+        if not self.batches:
+            return "Translation batching: no translations"
+        return (
+            f"Translation batching: {self.batched} translations in {self.batches} requests "
+            f"({self.batched / self.batches:.1f} per request), {self.fallbacks} split up again"
+        )
+
+    def report(self):
+        """Returns the batching summary, followed by the wrapped backend's report if it has one."""
+        inner = getattr(self.backend, "report", None)
+        return f"{self.summary()}\n{inner()}" if inner is not None else self.summary()
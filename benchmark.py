@@ -0,0 +1,486 @@
+# benchmark.py
+"""
+Benchmarks for the translation tool.
+
+Usage:
+    python benchmark.py codecs sample1.wav sample2.wav [--upload] [--json results.json]
+    python benchmark.py transport [--requests 20] [--json results.json]
+    python benchmark.py long-audio recording.wav [-m small] [-w 4] [--json results.json]
+    python benchmark.py e2e corpus/ [--backend fake] [--concurrency 8] [--voice nova] [--json results.json]
+
+The 'codecs' benchmark encodes each WAV file with every upload codec and reports the encoded size, the encode
+time and, with --upload, the end-to-end transcription latency against the API configured in config.yaml.
+
+The 'transport' benchmark sends the same small request with a new connection per call and over the shared
+keep-alive pool, and reports how many milliseconds per utterance the avoided handshakes save. It uses the
+base_url from config.yaml, so it can run against a local stand-in server.
+
+The 'long-audio' benchmark transcribes each file with local Whisper in one shot and with the silence-split
+parallel path, and reports wall time and real-time factor for both. Model loading is excluded from both timings.
+
+The 'e2e' benchmark replays a corpus of WAV files through the same transcribe, translate and speak calls as the
+interactive modes (see main.py), by default against the fake backend so it runs offline. Each file counts as one
+utterance whose speech ends when it is handed over (with --realtime, after it has been played in at speaking pace).
+The first stage decodes the WAV file and, with the fake backend, encodes the upload as the OpenAI backend would.
+It reports p50/p95/p99 latency per stage, from end of speech to translated text and to the first synthesized
+audio, with failed calls counted separately rather than timed, plus throughput and peak RSS, and --json writes
+them with the commit they were measured on.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+import wave
+
+import numpy as np
+import yaml
+from colorama import Fore, Style, init
+
+import audio_io
+import transport
+
+init(autoreset=True)
+
+
+def read_wav(path):
+    """Reads a 16-bit WAV file and returns (samples, rate) with samples shaped (n, channels)."""
+    with wave.open(path, "rb") as wav_file:
+        if wav_file.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit WAV files are supported")
+        rate = wav_file.getframerate()
+        channels = wav_file.getnchannels()
+        frames = wav_file.readframes(wav_file.getnframes())
+    samples = np.frombuffer(frames, dtype=np.int16).reshape(-1, channels)
+    return samples, rate
+
+
+def print_table(rows, columns):
+    widths = [max(len(str(column)), *(len(str(row[column])) for row in rows)) for column in columns]
+    print(Fore.YELLOW + "  ".join(str(c).ljust(w) for c, w in zip(columns, widths)) + Style.RESET_ALL)
+    for row in rows:
+        print("  ".join(str(row[c]).ljust(w) for c, w in zip(columns, widths)))
+
+
+def write_results(path, benchmark, rows, **extra):
+    with open(path, "w", encoding="utf-8") as results_file:
+        json.dump(
+            {"benchmark": benchmark, "created": time.time(), **extra, "results": rows}, results_file, indent=2
+        )
+    print(Fore.GREEN + f"Results written to {path}" + Style.RESET_ALL)
+
+
+def load_config():
+    with open("config.yaml", "r") as file:
+        return yaml.safe_load(file)
+
+
+def percentile(values, q):
+    """Returns the q-th percentile (0-100) of the values, interpolating linearly between ranks."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def latency_row(name, times, failed=0):
+    row = {"metric": name, "count": len(times), "failed": failed}
+    for label, q in (("p50_ms", 50), ("p95_ms", 95), ("p99_ms", 99)):
+        row[label] = round(percentile(times, q) * 1000, 1) if times else None
+    row["max_ms"] = round(max(times) * 1000, 1) if times else None
+    return row
+
+
+def peak_rss_mb():
+    """Returns the peak resident set size of this process in MiB, or None where it cannot be read (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_codecs(cli_args):
+    client = None
+    if cli_args.upload:
+        from openai import OpenAI
+
+        config = load_config()
+        settings = transport.transport_settings(config)
+        client = OpenAI(
+            api_key=config["openai"]["api_key"],
+            base_url=settings["base_url"],
+            http_client=transport.create_http_client(**settings),
+        )
+
+    rows = []
+    for path in cli_args.files:
+        samples, rate = read_wav(path)
+        seconds = len(samples) / rate
+        for codec in cli_args.codecs:
+            encode_times = []
+            for _ in range(cli_args.repeat):
+                start = time.perf_counter()
+                encoded = audio_io.encode_audio(samples, rate, codec)
+                encode_times.append(time.perf_counter() - start)
+            size = encoded.getbuffer().nbytes
+            row = {
+                "file": path,
+                "audio_s": round(seconds, 2),
+                "codec": codec,
+                "bytes": size,
+                "ratio": round(size / (len(samples) * samples.shape[1] * 2), 3),
+                "encode_ms": round(statistics.median(encode_times) * 1000, 1),
+            }
+            if client is not None:
+                upload_times = []
+                for _ in range(cli_args.repeat):
+                    encoded = audio_io.encode_audio(samples, rate, codec)
+                    start = time.perf_counter()
+                    client.audio.transcriptions.create(model="whisper-1", file=encoded)
+                    upload_times.append(time.perf_counter() - start)
+                row["transcribe_ms"] = round(statistics.median(upload_times) * 1000, 1)
+                row["end_to_end_ms"] = round(row["encode_ms"] + row["transcribe_ms"], 1)
+            rows.append(row)
+
+    columns = ["file", "audio_s", "codec", "bytes", "ratio", "encode_ms"]
+    if client is not None:
+        columns += ["transcribe_ms", "end_to_end_ms"]
+    print_table(rows, columns)
+    if cli_args.json:
+        write_results(cli_args.json, "codecs", rows)
+
+
+def bench_transport(cli_args):
+    config = load_config()
+    settings = transport.transport_settings(config)
+    url = f"{settings['base_url']}/models"
+    headers = {"Authorization": f"Bearer {config['openai']['api_key']}"}
+
+    def timed(send):
+        times = []
+        for _ in range(cli_args.requests):
+            start = time.perf_counter()
+            send().raise_for_status()
+            times.append(time.perf_counter() - start)
+        return times
+
+    def fresh_connection():
+        # A new client per call pays the TCP (and TLS) handshake every time, like bare requests.post did
+        with transport.create_http_client(**settings) as http_client:
+            return http_client.get(url, headers=headers)
+
+    with transport.create_http_client(**settings) as pooled_client:
+        pooled_client.get(url, headers=headers)  # open the pooled connection once, as the first utterance would
+        pooled = timed(lambda: pooled_client.get(url, headers=headers))
+    fresh = timed(fresh_connection)
+
+    rows = []
+    for name, times in (("new connection", fresh), ("pooled", pooled)):
+        rows.append(
+            {
+                "transport": name,
+                "requests": len(times),
+                "p50_ms": round(statistics.median(times) * 1000, 1),
+                "mean_ms": round(statistics.mean(times) * 1000, 1),
+            }
+        )
+    print_table(rows, ["transport", "requests", "p50_ms", "mean_ms"])
+    saved = rows[0]["p50_ms"] - rows[1]["p50_ms"]
+    print(Fore.GREEN + f"Pooling saves {saved:.1f} ms per API call (median) against {url}" + Style.RESET_ALL)
+    if cli_args.json:
+        write_results(cli_args.json, "transport", rows + [{"saved_p50_ms": round(saved, 1)}])
+
+
+def bench_long_audio(cli_args):
+    # Imported here so the other benchmarks do not need torch and Whisper installed
+    from concurrent.futures import ProcessPoolExecutor
+
+    import long_audio
+    import whisper_models
+
+    whisper_models.get_model(cli_args.model)
+    rows = []
+    with ProcessPoolExecutor(
+        max_workers=cli_args.workers,
+        initializer=whisper_models.init_worker,
+        initargs=(max(1, (os.cpu_count() or 1) // cli_args.workers),),
+    ) as pool:
+        # Load the model in every worker before timing; each worker keeps it resident
+        list(pool.map(whisper_models.warm_up, [cli_args.model] * cli_args.workers * 2))
+        for path in cli_args.files:
+            seconds = long_audio.load_for_whisper(path).duration_seconds
+
+            start = time.perf_counter()
+            whisper_models.transcribe(path, cli_args.model)
+            single = time.perf_counter() - start
+
+            start = time.perf_counter()
+            segments = long_audio.transcribe_long(path, cli_args.model, max_chunk=cli_args.max_chunk, executor=pool)
+            parallel = time.perf_counter() - start
+
+            for mode, wall, chunks in (("single-shot", single, 1), ("split-parallel", parallel, len(segments))):
+                rows.append(
+                    {
+                        "file": path,
+                        "audio_s": round(seconds, 1),
+                        "mode": mode,
+                        "chunks": chunks,
+                        "wall_s": round(wall, 2),
+                        "realtime_factor": round(seconds / wall, 2) if wall else 0.0,
+                    }
+                )
+
+    print_table(rows, ["file", "audio_s", "mode", "chunks", "wall_s", "realtime_factor"])
+    if cli_args.json:
+        write_results(cli_args.json, "long-audio", rows)
+
+
+# Fake backend latencies used when config.yaml has no 'fake:' section, in the range of the real API calls
+DEFAULT_FAKE = {
+    "seed": 0,
+    "transcribe": {"latency": "lognormal:0.6,0.35"},
+    "translate": {"latency": "lognormal:0.45,0.35"},
+    "synthesize": {"latency": "lognormal:0.5,0.3"},
+    "token_interval": "uniform:0.01,0.03",
+}
+
+
+def wav_seconds(path):
+    """Returns the duration of a WAV file in seconds, read from its header."""
+    with wave.open(path, "rb") as wav_file:
+        return wav_file.getnframes() / wav_file.getframerate()
+
+
+def decode_utterance(path, rate):
+    """Reads a WAV file as an int16 buffer shaped (n, 1) at ``rate``, mixing down and resampling as needed."""
+    samples, file_rate = read_wav(path)
+    mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0].astype(np.float64)
+    if file_rate != rate:
+        positions = np.arange(0, len(mono) * rate / file_rate) * file_rate / rate
+        mono = np.interp(positions, np.arange(len(mono)), mono)
+    return np.round(mono).astype(np.int16).reshape(-1, 1)
+
+
+def bench_e2e(cli_args):
+    # Imported here so the other benchmarks do not need the audio device, keyboard and model libraries
+    import backends
+    import batch
+    import conversation
+    import main as app
+    from prompts import build_content
+
+    config = load_config() if os.path.exists("config.yaml") else {}
+    model_backend = None
+    if cli_args.backend == "fake":
+        model_backend = backends.FakeBackend.from_config(config.get("fake") or DEFAULT_FAKE)
+    argv = ["--backend", cli_args.backend, "--player", "null", "--cache", cli_args.cache, "--no-save-audio"]
+    flags = (
+        ("--retries", cli_args.retries),
+        ("--deadline", cli_args.deadline),
+        ("--hedge", cli_args.hedge),
+        ("--context-tokens", cli_args.context_tokens),
+        ("--batch-window", cli_args.batch_window),
+    )
+    for flag, value in flags:
+        if value is not None:
+            argv += [flag, str(value)]
+    app.configure(argv, model_backend)
+    logging.getLogger().setLevel(logging.WARNING)  # the per-call log lines would dominate the timings
+
+    files = [path for path in batch.expand_inputs(cli_args.corpus) if path.lower().endswith(".wav")]
+    if not files:
+        print(Fore.RED + f"No WAV files found in {' '.join(cli_args.corpus)}." + Style.RESET_ALL)
+        return 1
+    corpus = [(path, wav_seconds(path)) for path in files] * cli_args.repeat
+    content = build_content(cli_args.language)
+    if app.args.context_tokens > 0:
+        # As in main.py: the compact prompt plus the recent utterances that fit the budget
+        app.context = conversation.ConversationContext.for_language(
+            cli_args.language, budget=app.args.context_tokens, max_turns=app.args.context_turns
+        )
+        content = app.context.content
+    stages = ("capture", "transcribe", "translate", "speak", "speech_to_text", "speech_to_audio")
+    times = {name: [] for name in stages}
+    failed = collections.Counter()
+
+    def capture(path):
+        audio = decode_utterance(path, app.RATE)
+        if cli_args.backend == "fake":
+            # The OpenAI backend encodes the upload inside its transcribe call; the fake backend stands in for it
+            audio_io.encode_audio(audio, app.RATE, app.args.codec)
+        return audio
+
+    async def process(path, speech_end):
+        # Stage times are recorded only for calls that succeed, so failures cannot pull the percentiles down
+        try:
+            audio = await asyncio.to_thread(capture, path)
+        except Exception:
+            failed["capture"] += 1
+            return
+        times["capture"].append(time.perf_counter() - speech_end)
+
+        start = time.perf_counter()
+        transcribed_text = await app.transcribe_audio_async(audio)
+        if not transcribed_text:
+            failed["transcribe"] += 1
+            return
+        times["transcribe"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        translated_text = await app.translate_text_async(transcribed_text, content)
+        if not translated_text:
+            failed["translate"] += 1
+            return
+        times["translate"].append(time.perf_counter() - start)
+        times["speech_to_text"].append(time.perf_counter() - speech_end)
+
+        if cli_args.voice:
+            start = time.perf_counter()
+            try:
+                audio_content = await app.synthesize_speech_async(translated_text, cli_args.voice)
+            except Exception:
+                failed["speak"] += 1
+                return
+            app.play_audio(audio_content, block=False)  # the first audio is handed to the player here
+            times["speak"].append(time.perf_counter() - start)
+            times["speech_to_audio"].append(time.perf_counter() - speech_end)
+
+    async def replay():
+        slots = asyncio.Semaphore(cli_args.concurrency)
+
+        async def run(path, speech_end):
+            # Waiting for a free slot counts towards the end-to-end latency, as it would for a live speaker
+            async with slots:
+                await process(path, speech_end)
+
+        tasks = []
+        for path, seconds in corpus:
+            if cli_args.realtime:
+                await asyncio.sleep(seconds)  # the utterance is being spoken
+            tasks.append(asyncio.create_task(run(path, time.perf_counter())))
+        await asyncio.gather(*tasks)
+
+    start = time.perf_counter()
+    app.engine_loop.run(replay())
+    wall = time.perf_counter() - start
+    audio_seconds = sum(seconds for _, seconds in corpus)
+
+    rows = [latency_row(name, values, failed[name]) for name, values in times.items() if values or failed[name]]
+    print_table(rows, ["metric", "count", "failed", "p50_ms", "p95_ms", "p99_ms", "max_ms"])
+    summary = {
+        "utterances": len(corpus),
+        "wall_s": round(wall, 2),
+        "utterances_per_min": round(len(corpus) / wall * 60, 1) if wall else None,
+        "audio_s_per_wall_s": round(audio_seconds / wall, 2) if wall else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if app.context is not None and app.context.calls:
+        summary["prompt_tokens_sent"] = round(app.context.sent_tokens / app.context.calls)
+        summary["prompt_tokens_full"] = round(app.context.full_tokens / app.context.calls)
+    print(Fore.GREEN + "  ".join(f"{key}={value}" for key, value in summary.items()) + Style.RESET_ALL)
+    if hasattr(app.backend, "report"):
+        print(app.backend.report())
+    if cli_args.json:
+        settings = {
+            "backend": cli_args.backend,
+            "files": len(files),
+            "repeat": cli_args.repeat,
+            "concurrency": cli_args.concurrency,
+            "realtime": cli_args.realtime,
+            "voice": cli_args.voice,
+            "cache": cli_args.cache,
+            "context_tokens": app.args.context_tokens,
+            "batch_window": app.args.batch_window,
+        }
+        write_results(cli_args.json, "e2e", rows, commit=current_commit(), settings=settings, summary=summary)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the real-time translation tool")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    codecs_parser = subparsers.add_parser("codecs", help="Compare upload size and latency per codec")
+    codecs_parser.add_argument("files", nargs="+", help="16-bit WAV files to encode")
+    codecs_parser.add_argument(
+        "--codecs",
+        nargs="+",
+        choices=list(audio_io.UPLOAD_CODECS),
+        default=list(audio_io.UPLOAD_CODECS),
+        help="Codecs to compare (default: all)",
+    )
+    codecs_parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the median is reported")
+    codecs_parser.add_argument(
+        "--upload", action="store_true", help="Also time transcription requests using the key in config.yaml"
+    )
+    codecs_parser.add_argument("--json", help="Write machine-readable results to this file")
+    codecs_parser.set_defaults(func=bench_codecs)
+
+    transport_parser = subparsers.add_parser(
+        "transport", help="Measure the latency saved per call by the pooled keep-alive transport"
+    )
+    transport_parser.add_argument("--requests", type=int, default=20, help="Requests per transport")
+    transport_parser.add_argument("--json", help="Write machine-readable results to this file")
+    transport_parser.set_defaults(func=bench_transport)
+
+    long_parser = subparsers.add_parser(
+        "long-audio", help="Compare single-shot and silence-split parallel local Whisper transcription"
+    )
+    long_parser.add_argument("files", nargs="+", help="Long recordings to transcribe")
+    long_parser.add_argument("-m", "--model", default="small", help="Whisper model size")
+    long_parser.add_argument(
+        "-w", "--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="Worker processes"
+    )
+    long_parser.add_argument("--max-chunk", type=float, default=30.0, help="Maximum chunk length in seconds")
+    long_parser.add_argument("--json", help="Write machine-readable results to this file")
+    long_parser.set_defaults(func=bench_long_audio)
+
+    e2e_parser = subparsers.add_parser(
+        "e2e", help="Replay a WAV corpus through transcription, translation and speech and report latency percentiles"
+    )
+    e2e_parser.add_argument("corpus", nargs="+", help="WAV files, directories or glob patterns; one utterance each")
+    e2e_parser.add_argument(
+        "--backend", choices=["fake", "openai", "whisper"], default="fake", help="Model backend (default: fake)"
+    )
+    e2e_parser.add_argument("--concurrency", type=int, default=8, help="Utterances processed at once")
+    e2e_parser.add_argument("--repeat", type=int, default=1, help="Times the corpus is replayed")
+    e2e_parser.add_argument(
+        "--realtime", action="store_true", help="Feed utterances at speaking pace, one after another"
+    )
+    e2e_parser.add_argument("--voice", help="Also synthesize the translation with this voice")
+    e2e_parser.add_argument("--language", help="Target language, as for main.py -c")
+    e2e_parser.add_argument("--cache", choices=["off", "memory"], default="off", help="Result caching (default: off)")
+    e2e_parser.add_argument("--retries", type=int, help="Retries per model call, as for main.py")
+    e2e_parser.add_argument("--deadline", type=float, help="Seconds per model call including retries, as for main.py")
+    e2e_parser.add_argument("--hedge", type=float, help="Hedging percentile, as for main.py")
+    e2e_parser.add_argument("--batch-window", type=float, help="Translation batching window, as for main.py")
+    e2e_parser.add_argument(
+        "--context-tokens", type=int, help="Prompt token budget, as for main.py; 0 sends the full prompt alone"
+    )
+    e2e_parser.add_argument("--json", help="Write machine-readable results to this file")
+    e2e_parser.set_defaults(func=bench_e2e)
+
+    cli_args = parser.parse_args(argv)
+    return cli_args.func(cli_args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
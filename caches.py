@@ -0,0 +1,323 @@
+# caches.py
+"""
+Content-addressed caches for API results.
+
+A ``TieredCache`` keeps recent entries in an in-memory LRU and, optionally, in a size-bounded persistent store (a
+SQLite file for text, a directory of files for audio clips), so results survive restarts. Keys are SHA-256 digests
+of everything that determines the result (see ``make_key``), so a hit is always safe to reuse.
+"""
+import collections
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "liveTranslation"
+)
+
+
+def make_key(*parts):
+    """Returns a hex SHA-256 digest of the given parts (str or bytes), unambiguously delimited."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, (bytes, bytearray, memoryview)) else str(part).encode("utf-8")
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def normalize_text(text):
+    """Normalizes text for cache lookups: Unicode NFKC, collapsed whitespace, stripped ends."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class CacheStats:
+    """Hit, miss and eviction counters for a cache."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __str__(self):
+        return (
+            f"hits={self.hits} misses={self.misses} evictions={self.evictions} "
+            f"hit_rate={self.hit_rate:.0%}"
+        )
+
+
+class LRUCache:
+    """
+    A thread-safe, in-memory least-recently-used cache.
+
+    Args:
+        max_entries (int): Entries kept before the least recently used one is evicted.
+        max_bytes (int, optional): Also evict once the values (str or bytes) add up to more than this.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=None):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            return self._entries[key]
+
+    def put(self, key, value):
+        if self.max_bytes is not None and len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = value
+            self._bytes += len(value)
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.stats.evictions += 1
+
+
+class SQLiteStore:
+    """
+    A persistent key/value store in a single SQLite file, bounded by total value size.
+
+    Values may be str or bytes and are returned as stored. When the total size exceeds ``max_bytes`` the least
+    recently used entries are deleted.
+
+    Args:
+        path (str): The database file; its directory is created if needed.
+        max_bytes (int): Size limit for the stored values.
+    """
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024):
+        # Several processes may open the same file; SQLite serializes their writes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    @property
+    def total_bytes(self):
+        return self._total
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+            self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.stats.hits += 1
+            return row[0]
+
+    def put(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            self._total += size - (old[0] if old else 0)
+            self._evict()
+
+    def _evict(self):
+        if self._total > self.max_bytes:
+            # Other processes may share the file (e.g. batch workers), so recount before deleting anything
+            self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        while self._total > self.max_bytes:
+            row = self._db.execute("SELECT key, size FROM entries ORDER BY last_used LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (row[0],))
+            self._total -= row[1]
+            self.stats.evictions += 1
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class FileStore:
+    """
+    A persistent store of binary values kept as one file per key in a directory, bounded by total size.
+
+    Because every value is a plain file named after its key, it can be referenced in place (e.g. hard-linked into
+    a session folder) instead of copied. When the total size exceeds ``max_bytes`` the least recently used files,
+    by modification time, which ``get`` refreshes, are deleted.
+
+    Args:
+        directory (str): Where the files are kept; created if needed.
+        max_bytes (int): Size limit for the stored files.
+        suffix (str, optional): File name extension, e.g. '.wav'.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, suffix=""):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        self.suffix = suffix
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._sizes = {}
+        for name in os.listdir(directory):
+            if name.endswith(suffix) and not name.startswith("."):
+                self._sizes[name[:len(name) - len(suffix)]] = os.path.getsize(os.path.join(directory, name))
+        self._total = sum(self._sizes.values())
+
+    def __len__(self):
+        return len(self._sizes)
+
+    @property
+    def total_bytes(self):
+        return self._total
+
+    def path(self, key):
+        """Returns the file that holds (or would hold) the value for ``key``."""
+        return os.path.join(self.directory, key + self.suffix)
+
+    def locate(self, key):
+        """Returns the path of the stored file for ``key``, or None; does not count as a lookup."""
+        path = self.path(key)
+        return path if os.path.exists(path) else None
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as file:
+                value = file.read()
+            os.utime(path)  # marks the entry as recently used
+        except FileNotFoundError:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return value
+
+    def put(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        path = self.path(key)
+        # Written under a hidden temporary name first so readers never see a partial file
+        temporary = os.path.join(self.directory, f".{key}.{threading.get_ident()}.tmp")
+        with open(temporary, "wb") as file:
+            file.write(value)
+        os.replace(temporary, path)
+        with self._lock:
+            self._total += size - self._sizes.get(key, 0)
+            self._sizes[key] = size
+            self._evict()
+
+    def _evict(self):
+        if self._total <= self.max_bytes:
+            return
+
+        def last_used(key):
+            try:
+                return os.path.getmtime(self.path(key))
+            except FileNotFoundError:
+                return 0.0
+
+        for key in sorted(self._sizes, key=last_used):
+            if self._total <= self.max_bytes:
+                break
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+            self._total -= self._sizes.pop(key)
+            self.stats.evictions += 1
+
+    def close(self):
+        pass
+
+
+class TieredCache:
+    """
+    An in-memory LRU in front of an optional persistent SQLiteStore or FileStore.
+
+    Disk hits are promoted to memory. Writes go to both tiers.
+
+    Args:
+        name (str): Used in the statistics report.
+        max_entries (int, optional): Size of the in-memory tier.
+        store (SQLiteStore | FileStore, optional): The persistent tier.
+        max_bytes (int, optional): Byte limit for the in-memory tier, for large values such as audio.
+    """
+
+    def __init__(self, name, max_entries=1024, store=None, max_bytes=None):
+        self.name = name
+        self.memory = LRUCache(max_entries, max_bytes)
+        self.store = store
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.store is not None:
+            try:
+                value = self.store.get(key)
+            except (sqlite3.Error, OSError) as e:
+                # An unreadable disk tier is a miss; the caller falls back to the API
+                logger.error(f"Failed to read {self.name} cache entry: {e}")
+                return None
+            if value is not None:
+                self.memory.put(key, value)
+        return value
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.store is not None:
+            try:
+                self.store.put(key, value)
+            except (sqlite3.Error, OSError) as e:
+                logger.error(f"Failed to persist {self.name} cache entry: {e}")
+
+    def report(self):
+        lines = [f"{self.name} cache (memory, {len(self.memory)} entries): {self.memory.stats}"]
+        if self.store is not None:
+            lines.append(
+                f"{self.name} cache (disk, {self.store.total_bytes / 1024:.0f} KiB): {self.store.stats}"
+            )
+        return "\n".join(lines)
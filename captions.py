@@ -0,0 +1,250 @@
+# captions.py
+"""
+Live captions: provisional transcripts of an utterance while it is still being spoken.
+
+``LiveCaptioner`` is fed the microphone samples as they arrive and transcribes the growing utterance again and
+again. Successive transcripts of the same audio mostly differ near the end, where a word has only been half
+spoken, so words are committed with a local-agreement policy (``LocalAgreement``): a word becomes final once the
+last two transcripts agree on it and on everything before it. Committed words are shown once and never change;
+the rest of the latest transcript is shown as provisional text.
+
+Only the audio since the last pause is transcribed. When the voice-activity detector from vad.py sees a pause
+(or the utterance reaches its maximum length), the last transcript commits the utterance, its audio is dropped
+and the next utterance starts from an empty buffer, with the committed text of the previous ones as the
+transcription prompt so Whisper continues in the same style.
+
+    captioner = LiveCaptioner(backend.transcribe, RATE)
+    captioner.feed(samples)                        # from the audio callback, via the caller's loop
+    update = await captioner.step()                # None while there is nothing new to transcribe
+    if update is not None:
+        show(update.committed, update.provisional)
+        if update.final:
+            translate(update.text)                 # the whole utterance, exactly once
+"""
+import collections
+import logging
+import re
+
+import numpy as np
+
+import metrics
+import vad
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 1.0  # seconds of new audio before the growing utterance is transcribed again
+DEFAULT_AGREEMENT = 2  # transcripts that must agree before a word is committed
+PROMPT_CHARS = 200  # committed text passed as the transcription prompt
+
+_NORMALIZE = re.compile(r"[^\w']+")
+
+
+def _normalize(word):
+    return _NORMALIZE.sub("", word.lower())
+
+
+class LocalAgreement:
+    """
+    Commits the words on which the last ``n`` transcripts of the same growing audio agree (LocalAgreement-n).
+
+    Args:
+        n (int, optional): Transcripts that must agree on a word, including the latest.
+    """
+
+    def __init__(self, n=DEFAULT_AGREEMENT):
+        self.n = max(1, n)
+        self.committed = []
+        self._transcripts = collections.deque(maxlen=self.n)
+
+    def update(self, text):
+        """
+        Adds a transcript of the audio so far.
+
+        Returns:
+            tuple: (newly committed words, provisional words after them), both lists of words as transcribed.
+        """
+        words = (text or "").split()
+        self._transcripts.append(words)
+        start = len(self.committed)
+        agreed = start
+        if len(self._transcripts) == self.n:
+            normalized = [[_normalize(word) for word in transcript] for transcript in self._transcripts]
+            shortest = min(len(transcript) for transcript in normalized)
+            while agreed < shortest and len({transcript[agreed] for transcript in normalized}) == 1:
+                agreed += 1
+        new = words[start:agreed]
+        self.committed.extend(new)
+        return new, words[len(self.committed):]
+
+    def finish(self, text=None):
+        """Commits the rest of ``text`` (or of the latest transcript) and starts over; returns the words added."""
+        if text is None:
+            words = self._transcripts[-1] if self._transcripts else []
+        else:
+            words = (text or "").split()
+        new = words[len(self.committed):]
+        self.committed = []
+        self._transcripts.clear()
+        return new
+
+
+class CaptionUpdate:
+    """
+    The result of one transcription pass.
+
+    Attributes:
+        committed (list): Words that became final with this pass.
+        provisional (list): Words after them that may still change.
+        final (bool): Whether the utterance ended with this pass.
+        text (str): The whole committed utterance when ``final``, else the text committed so far.
+        audio (numpy.ndarray): The samples of the utterance when ``final``, else None.
+    """
+
+    __slots__ = ("committed", "provisional", "final", "text", "audio")
+
+    def __init__(self, committed, provisional, final, text, audio=None):
+        self.committed = committed
+        self.provisional = provisional
+        self.final = final
+        self.text = text
+        self.audio = audio
+
+
+class LiveCaptioner:
+    """
+    Transcribes the utterance in progress every ``interval`` seconds of new audio and commits stable words.
+
+    Not thread-safe: ``feed`` and ``step`` are meant to be called from the same event loop, one after the other.
+
+    Args:
+        transcribe (callable): ``await transcribe(samples, prompt=...)`` returning the text of int16 samples, such
+                               as a backend's ``transcribe``.
+        rate (int): Sample rate of the fed audio.
+        interval (float, optional): Seconds of new audio between transcription passes.
+        agreement (int, optional): Transcripts that must agree before a word is committed.
+        detector (vad.VoiceActivityDetector, optional): Finds the pauses that end an utterance.
+        silence_duration (float, optional): Seconds of silence that end an utterance.
+        max_duration (float, optional): Seconds after which an utterance is ended without a pause.
+        min_duration (float, optional): Utterances shorter than this are dropped untranscribed, as clicks or coughs.
+        frame_ms (int, optional): Frame length for the voice-activity detector.
+    """
+
+    def __init__(
+        self,
+        transcribe,
+        rate,
+        interval=DEFAULT_INTERVAL,
+        agreement=DEFAULT_AGREEMENT,
+        detector=None,
+        silence_duration=vad.DEFAULT_SILENCE_DURATION,
+        max_duration=vad.DEFAULT_MAX_UTTERANCE,
+        min_duration=vad.DEFAULT_MIN_UTTERANCE,
+        frame_ms=vad.DEFAULT_FRAME_MS,
+    ):
+        self.transcribe = transcribe
+        self.rate = rate
+        self.interval_samples = int(interval * rate)
+        self.agreement = LocalAgreement(agreement)
+        self.detector = detector or vad.VoiceActivityDetector()
+        self.frame_samples = int(rate * frame_ms / 1000)
+        self.silence_frames = max(1, int(round(silence_duration * 1000 / frame_ms)))
+        self.max_samples = int(max_duration * rate)
+        self.min_samples = int(min_duration * rate)
+        self.preroll_frames = max(1, int(round(vad.DEFAULT_PREROLL * 1000 / frame_ms)))
+        self.history = ""  # committed text of earlier utterances, for the transcription prompt
+        self._frames = []  # the utterance in progress, in frames
+        self._pending = np.zeros(0, dtype=np.int16)  # samples not yet analysed: part of a frame, or audio after a pause
+        self._speech = False
+        self._trailing_silence = 0
+        self._ended = False
+        self._transcribed_frames = 0
+
+    @property
+    def _samples(self):
+        return len(self._frames) * self.frame_samples
+
+    def feed(self, samples):
+        """Adds int16 samples. Once the utterance has ended, further samples wait for the next one."""
+        samples = np.concatenate([self._pending, np.asarray(samples, dtype=np.int16).reshape(-1)])
+        usable = len(samples) - len(samples) % self.frame_samples
+        offset = 0
+        while offset < usable and not self._ended:
+            frame = samples[offset:offset + self.frame_samples]
+            offset += self.frame_samples
+            speech = self.detector.is_speech(frame)
+            if not self._speech:
+                # Only a short pre-roll of silence is kept before speech starts
+                self._frames.append(frame)
+                del self._frames[: max(0, len(self._frames) - self.preroll_frames)]
+                self._speech = speech
+                continue
+            self._frames.append(frame)
+            self._trailing_silence = 0 if speech else self._trailing_silence + 1
+            if self._trailing_silence >= self.silence_frames or self._samples >= self.max_samples:
+                self._ended = True
+        self._pending = samples[offset:]
+
+    async def step(self):
+        """
+        Transcribes the utterance in progress if enough new audio has arrived or it has ended.
+
+        A failed transcription is logged and does not end the session: the audio stays in the utterance and is sent
+        again with the next pass, and an utterance that has ended keeps the words committed before the failure.
+
+        Returns:
+            CaptionUpdate: The committed and provisional words, or None if nothing was transcribed.
+        """
+        if not self._speech:
+            return None
+        new_frames = len(self._frames) - self._transcribed_frames
+        if not self._ended and new_frames * self.frame_samples < self.interval_samples:
+            return None
+        frames = self._frames
+        if self._ended:
+            # Keep a short tail of the pause so the last word is not clipped
+            frames = frames[: len(frames) - max(0, self._trailing_silence - self.silence_frames // 3)]
+            if len(frames) * self.frame_samples < self.min_samples and not self.agreement.committed:
+                self._finish("", None)
+                return None
+            if self._transcribed_frames and len(self._frames) - self._transcribed_frames <= self._trailing_silence:
+                # Only silence since the last pass: its transcript is final, the audio is not sent again
+                return self._finish(None, np.concatenate(frames))
+        self._transcribed_frames = len(self._frames)
+        audio = np.concatenate(frames)
+        prompt = self.history[-PROMPT_CHARS:] or None
+        try:
+            with metrics.span("caption", final=str(self._ended).lower()):
+                text = await self.transcribe(audio, prompt=prompt)
+        except Exception as e:
+            metrics.inc("caption_failures_total")
+            logger.error(f"Caption transcription failed: {e}")
+            if not self._ended:
+                return None
+            text = " ".join(self.agreement.committed)
+        if not self._ended:
+            committed, provisional = self.agreement.update(text)
+            return CaptionUpdate(committed, provisional, False, " ".join(self.agreement.committed))
+        return self._finish(text, audio)
+
+    async def flush(self):
+        """Ends the utterance in progress and returns its final update, or None if nothing was spoken."""
+        if not self._speech:
+            return None
+        self._ended = True
+        return await self.step()
+
+    def _finish(self, text, audio):
+        before = list(self.agreement.committed)
+        committed = self.agreement.finish(text)
+        utterance = " ".join(before + committed)
+        if utterance:
+            self.history = f"{self.history} {utterance}".strip()[-PROMPT_CHARS:]
+        self._frames = []
+        self._speech = False
+        self._trailing_silence = 0
+        self._ended = False
+        self._transcribed_frames = 0
+        # The samples that arrived after the pause start the next utterance
+        pending, self._pending = self._pending, np.zeros(0, dtype=np.int16)
+        self.feed(pending)
+        return CaptionUpdate(committed, [], True, utterance, audio)
@@ -0,0 +1,133 @@
+# conversation.py
+"""
+Rolling conversation context for the translation calls.
+
+Without it every utterance is translated on its own under the long system prompt from prompts.py, so a sentence
+split across two recordings is translated as two fragments and every call pays for the full prompt again. A
+``ConversationContext`` instead sends a compact system prompt, built once per session, followed by the most recent
+source/translation pairs that fit into a token budget:
+
+    conversation = ConversationContext.for_language("French", budget=600, max_turns=6)
+    history = conversation.window(text)           # earlier (source, translation) pairs that fit the budget
+    translated = await backend.translate(text, conversation.content, history=history)
+    conversation.add(text, translated)
+    print(conversation.report())                  # prompt tokens per call with the full prompt and as sent
+
+Token counts use tiktoken when it is installed and an estimate of four UTF-8 bytes per token otherwise.
+"""
+import collections
+import functools
+import logging
+
+import metrics
+from prompts import build_compact_content, build_content
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET = 600  # prompt tokens per call: system prompt, earlier turns and the text to translate
+DEFAULT_MAX_TURNS = 6
+MESSAGE_OVERHEAD = 3  # tokens the chat format adds per message
+REPLY_OVERHEAD = 3  # tokens that prime the reply
+TOKEN_BUCKETS = (25, 50, 100, 200, 300, 400, 600, 800, 1200, 1600, 3200)
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text):
+    """Returns the number of tokens in ``text``, exact with tiktoken and estimated without it."""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return max(1, (len(text.encode("utf-8")) + 3) // 4)
+
+
+def prompt_tokens(content, text, history=()):
+    """Returns the prompt tokens of a chat completion with this system prompt, earlier pairs and text."""
+    tokens = REPLY_OVERHEAD + count_tokens(content) + count_tokens(text) + 2 * MESSAGE_OVERHEAD
+    for source, translation in history:
+        tokens += count_tokens(source) + count_tokens(translation) + 2 * MESSAGE_OVERHEAD
+    return tokens
+
+
+class ConversationContext:
+    """
+    The system prompt and recent turns of one session.
+
+    Turns are added as translations complete; with several utterances in flight, a translation sees the turns
+    that finished before it started.
+
+    Args:
+        content (str): The system prompt to send.
+        full_content (str, optional): The prompt that would be sent without the context, for the token report.
+                                      Defaults to ``content``.
+        budget (int, optional): Prompt tokens per call. The oldest turns are left out to stay within it; the
+                                system prompt and the text itself are always sent.
+        max_turns (int, optional): Earlier turns kept at most; 0 sends none (each text is translated on its own).
+    """
+
+    def __init__(self, content, full_content=None, budget=DEFAULT_BUDGET, max_turns=DEFAULT_MAX_TURNS):
+        self.content = content
+        self.full_content = full_content if full_content is not None else content
+        self.budget = budget
+        self.max_turns = max(0, max_turns)
+        self.turns = collections.deque(maxlen=self.max_turns or None)
+        self.calls = 0
+        self.full_tokens = 0
+        self.sent_tokens = 0
+        self._content_tokens = count_tokens(content)
+        self._full_content_tokens = count_tokens(self.full_content)
+
+    @classmethod
+    def for_language(cls, language=None, budget=DEFAULT_BUDGET, max_turns=DEFAULT_MAX_TURNS):
+        """Builds a context with the compact prompt for a language of prompts.language_map (see build_content)."""
+        return cls(build_compact_content(language), build_content(language), budget, max_turns)
+
+    def window(self, text):
+        """
+        Returns the most recent turns, oldest first, that fit into the budget together with the system prompt and
+        ``text``, and records the prompt size of the call.
+        """
+        text_tokens = count_tokens(text)
+        used = REPLY_OVERHEAD + self._content_tokens + text_tokens + 2 * MESSAGE_OVERHEAD
+        history = []
+        if self.max_turns:
+            for source, translation, tokens in reversed(self.turns):
+                if used + tokens > self.budget:
+                    break
+                history.append((source, translation))
+                used += tokens
+            history.reverse()
+        full = REPLY_OVERHEAD + self._full_content_tokens + text_tokens + 2 * MESSAGE_OVERHEAD
+        self.calls += 1
+        self.full_tokens += full
+        self.sent_tokens += used
+        metrics.observe("prompt_tokens", full, buckets=TOKEN_BUCKETS, prompt="full")
+        metrics.observe("prompt_tokens", used, buckets=TOKEN_BUCKETS, prompt="sent")
+        logger.info(f"Prompt tokens: {used} sent with {len(history)} earlier turns, {full} with the full prompt")
+        return history
+
+    def add(self, source, translation):
+        """Appends a completed turn; empty ones are skipped."""
+        if self.max_turns and source and translation:
+            tokens = count_tokens(source) + count_tokens(translation) + 2 * MESSAGE_OVERHEAD
+            self.turns.append((source, translation, tokens))
+
+    def report(self):
+        if not self.calls:
+            return "Prompt tokens: no translations"
+        full = self.full_tokens / self.calls
+        sent = self.sent_tokens / self.calls
+        estimated = "" if _encoding() is not None else " (estimated)"
+        return (
+            f"Prompt tokens per translation{estimated}: {sent:.0f} sent, {full:.0f} with the full prompt "
+            f"({(sent - full) / full:+.0%}) over {self.calls} calls"
+        )
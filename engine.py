@@ -0,0 +1,304 @@
+# engine.py
+"""
+Asyncio core for the interactive modes.
+
+API calls, audio capture and keyboard input are all awaited on one event loop that runs on a background thread
+(``EventLoopThread``). A keypress is therefore handled while a translation is still in flight, and several
+utterances can be transcribed, translated and spoken at the same time. Blocking sources such as the sound device
+and ``readchar`` are bridged onto the loop by helper threads feeding asyncio queues. Synchronous callers (the batch
+mode, the process and thread pools) use ``EventLoopThread.run``.
+
+``OrderedTasks`` runs utterances concurrently while keeping everything the user sees and hears in the order the
+utterances were recorded: each one gets a ``Turn`` and waits for it before printing, saving or queuing playback.
+"""
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CTRL_C = "\x03"  # returned by read_key when Ctrl+C is pressed while the terminal is in raw mode
+
+
+class EventLoopThread:
+    """
+    An asyncio event loop running forever on a daemon thread.
+
+    Example:
+        loop_thread = EventLoopThread()
+        text = loop_thread.run(translate_text_async("Hola"))  # blocks the calling thread only
+    """
+
+    def __init__(self, name="engine"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine):
+        """Schedules a coroutine on the loop and returns a concurrent.futures.Future for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine):
+        """
+        Runs a coroutine on the loop and blocks until it finishes. If the caller is interrupted (Ctrl+C), the
+        coroutine is cancelled before the KeyboardInterrupt is re-raised.
+
+        Raises:
+            RuntimeError: If called from the loop's own thread, where blocking would deadlock.
+        """
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+            raise RuntimeError("EventLoopThread.run() called from inside the event loop; await the coroutine instead")
+        future = self.submit(coroutine)
+        try:
+            return future.result()
+        except KeyboardInterrupt:
+            future.cancel()
+            raise
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+
+class CoroutineExecutor:
+    """
+    Gives an EventLoopThread the ``submit`` method of a concurrent.futures executor, for coroutine functions, so
+    code written against executors (e.g. playback.SentenceSpeaker) can schedule async API calls.
+    """
+
+    def __init__(self, loop_thread):
+        self._loop_thread = loop_thread
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedules ``fn(*args, **kwargs)`` on the loop and returns a concurrent.futures.Future for its result."""
+        return self._loop_thread.submit(fn(*args, **kwargs))
+
+
+def _read_key_blocking(readkey):
+    try:
+        return readkey()
+    except KeyboardInterrupt:
+        # readchar puts the terminal in raw mode, so Ctrl+C arrives as a key; never let it escape into the loop
+        return CTRL_C
+
+
+async def read_key(readkey):
+    """
+    Waits for one keypress without blocking the event loop.
+
+    The key is read on a worker thread only while this coroutine is awaited, so no stray reader is left behind
+    to swallow input once the caller stops asking for keys.
+
+    Args:
+        readkey (callable): A blocking key reader, e.g. ``readchar.readkey``.
+
+    Returns:
+        str: The key, or CTRL_C.
+    """
+    return await asyncio.to_thread(_read_key_blocking, readkey)
+
+
+async def iterate_in_thread(iterable, maxsize=2):
+    """
+    Consumes a blocking iterable (e.g. a generator reading the microphone) on a helper thread and yields its items
+    on the event loop.
+
+    The helper thread runs at most ``maxsize`` items ahead of the consumer, so a slow consumer holds back the
+    producer instead of letting items pile up.
+
+    Args:
+        iterable (iterable): The blocking source.
+        maxsize (int, optional): Items that may wait between the producer and the consumer.
+    """
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue()
+    slots = threading.Semaphore(max(1, int(maxsize)))
+    finished = object()
+    stopped = threading.Event()
+
+    def pump():
+        iterator = iter(iterable)
+        try:
+            while True:
+                slots.acquire()
+                if stopped.is_set():
+                    break
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                loop.call_soon_threadsafe(items.put_nowait, item)
+        except BaseException as e:  # handed to the consumer, which re-raises it
+            loop.call_soon_threadsafe(items.put_nowait, e)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            if not stopped.is_set():
+                loop.call_soon_threadsafe(items.put_nowait, finished)
+
+    thread = threading.Thread(target=pump, name="engine-source", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = await items.get()
+            if item is finished:
+                return
+            slots.release()
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+        slots.release()  # wakes the helper thread if it is waiting for room
+
+
+class Turn:
+    """
+    One utterance's place in line. ``await turn.wait()`` returns once every earlier utterance has called
+    ``done()``; call ``done()`` only after ``wait()``.
+    """
+
+    def __init__(self, previous=None):
+        self._previous = previous
+        self._done = asyncio.Event()
+
+    async def wait(self):
+        if self._previous is not None:
+            await self._previous._done.wait()
+
+    def done(self):
+        self._done.set()
+
+
+class StageStats:
+    """
+    Latency counters for a single stage of OrderedTasks.
+
+    Attributes:
+        name (str): The stage name.
+        count (int): Number of items the stage has processed.
+        dropped (int): Number of items the stage returned None for (or failed on) and did not forward.
+        total_time (float): Total seconds the stage spent working on items.
+        max_time (float): Slowest single item, in seconds.
+        total_wait (float): Total seconds the stage spent idle waiting for input.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.dropped = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.total_wait = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, busy, wait=0.0, dropped=False):
+        with self._lock:
+            self.count += 1
+            self.total_time += busy
+            self.total_wait += wait
+            self.max_time = max(self.max_time, busy)
+            if dropped:
+                self.dropped += 1
+
+    @property
+    def mean_time(self):
+        return self.total_time / self.count if self.count else 0.0
+
+    def summary(self):
+        return (
+            f"{self.name:<12} items={self.count:<5} dropped={self.dropped:<4} "
+            f"mean={self.mean_time:.3f}s max={self.max_time:.3f}s idle={self.total_wait:.3f}s"
+        )
+
+
+class OrderedTasks:
+    """
+    Runs utterance handlers concurrently, at most ``limit`` at a time, with per-stage latency counters.
+
+    Each handler is called with a Turn and should ``await turn.wait()`` before its ordered work (printing,
+    saving, queuing audio), so results come out in submission order even though the API calls overlap.
+
+    Args:
+        limit (int): Maximum number of handlers in flight; ``submit`` waits for a free slot.
+        stages (list, optional): Stage names for the latency report, e.g. ['transcribe', 'translate', 'speak'].
+
+    Example:
+        tasks = OrderedTasks(limit=2, stages=["transcribe", "translate"])
+        async for audio in iterate_in_thread(chunks):
+            await tasks.submit(lambda turn, audio=audio: handle(audio, turn))
+        await tasks.join()
+        print(tasks.report())
+    """
+
+    def __init__(self, limit=2, stages=()):
+        self.limit = max(1, int(limit))
+        self.stats = {name: StageStats(name) for name in stages}
+        self._slots = asyncio.Semaphore(self.limit)
+        self._last_turn = None
+        self._tasks = set()
+
+    async def timed(self, stage, awaitable, timings=None):
+        """
+        Awaits ``awaitable`` and records its duration under ``stage``; a None result counts as dropped. The
+        duration is also stored in ``timings[stage]`` if a dict is given, e.g. for the utterance's session record.
+        """
+        start = time.perf_counter()
+        result = await awaitable
+        seconds = time.perf_counter() - start
+        stats = self.stats.setdefault(stage, StageStats(stage))
+        stats.record(seconds, dropped=result is None)
+        if timings is not None:
+            timings[stage] = round(seconds, 3)
+        return result
+
+    async def submit(self, handler):
+        """
+        Starts ``handler(turn)`` as a task once fewer than ``limit`` handlers are in flight.
+
+        Returns:
+            asyncio.Task: The handler's task.
+        """
+        await self._slots.acquire()
+        turn = Turn(self._last_turn)
+        self._last_turn = turn
+        task = asyncio.create_task(self._run(handler, turn))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, handler, turn):
+        try:
+            return await handler(turn)
+        except Exception as e:
+            logger.error(f"Utterance failed: {e}")
+        finally:
+            # Pass the turn on even if the handler failed before reaching it
+            await turn.wait()
+            turn.done()
+            self._slots.release()
+
+    async def join(self):
+        """Waits for every submitted handler to finish."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
+
+    def report(self):
+        """Returns a per-stage latency summary; the stage with the highest mean time is the bottleneck."""
+        lines = [stats.summary() for stats in self.stats.values()]
+        busiest = max(self.stats.values(), key=lambda s: s.mean_time, default=None)
+        if busiest is not None and busiest.count:
+            lines.append(f"Bottleneck: {busiest.name} ({busiest.mean_time:.3f}s per item)")
+        lines.append(f"Concurrent utterances: up to {self.limit}")
+        return "\n".join(lines)
@@ -0,0 +1,261 @@
+# fault_server.py
+"""
+A local stand-in for the OpenAI endpoints the tool uses, with injectable faults.
+
+It answers transcription, chat completion (plain and streamed) and speech requests with canned results, after a
+latency drawn from a distribution, and can be told to fail a share of them: error statuses with ``Retry-After``,
+calls that stall far beyond any sensible timeout, and connections dropped without an answer. Point the tool at it
+to see how retries, deadlines and hedged requests (resilience.py) behave:
+
+    python fault_server.py --port 8080 --error-rate 0.1 --stall-rate 0.02 --latency lognormal:0.3,0.4
+
+    # config.yaml
+    openai:
+      api_key: "anything"
+      base_url: "http://127.0.0.1:8080/v1"
+
+    python benchmark.py e2e corpus/ --backend openai --hedge 95
+
+GET /stats returns the number of requests and injected faults so far. Tests start it in-process with
+``create_server`` on a free port, and script the faults of the first requests with ``Faults(script=...)``.
+"""
+import argparse
+import collections
+import io
+import json
+import random
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from latency import Latency
+
+DEFAULT_PORT = 8080
+TTS_RATE = 24000
+
+
+class Faults:
+    """
+    Decides the fate of each request.
+
+    Args:
+        latency (str | Latency, optional): Delay before a normal answer.
+        error_rate (float, optional): Share of requests answered with one of ``error_statuses``.
+        error_statuses (tuple, optional): Statuses to fail with; 429 and 503 carry ``Retry-After``.
+        retry_after (float, optional): Seconds sent in ``Retry-After``.
+        stall_rate (float, optional): Share of requests that hang for ``stall`` seconds before answering.
+        stall (float, optional): How long a stalled request hangs.
+        reset_rate (float, optional): Share of connections closed without any answer.
+        token_interval (str | Latency, optional): Delay between streamed tokens.
+        seed (int, optional): Seed for the random choices.
+        script (iterable, optional): Faults of the first requests, in order: None for a normal answer, 'reset',
+                                     'stall' or an error status. The rates apply once the script is used up.
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        error_rate=0.0,
+        error_statuses=(429, 500, 503),
+        retry_after=1.0,
+        stall_rate=0.0,
+        stall=60.0,
+        reset_rate=0.0,
+        token_interval=0.0,
+        seed=None,
+        script=(),
+    ):
+        self.latency = Latency.parse(latency)
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.retry_after = retry_after
+        self.stall_rate = stall_rate
+        self.stall = stall
+        self.reset_rate = reset_rate
+        self.token_interval = Latency.parse(token_interval)
+        self.stats = {"requests": 0, "errors": 0, "stalls": 0, "resets": 0}
+        self._script = collections.deque(script)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def decide(self):
+        """Returns (fault, delay) for a request: fault is None, 'reset', 'stall' or an error status."""
+        with self._lock:
+            self.stats["requests"] += 1
+            delay = self.latency.sample(self._rng)
+            if self._script:
+                return self._count(self._script.popleft(), delay)
+            roll = self._rng.random()
+            if roll < self.reset_rate:
+                self.stats["resets"] += 1
+                return "reset", delay
+            roll -= self.reset_rate
+            if roll < self.stall_rate:
+                self.stats["stalls"] += 1
+                return "stall", self.stall
+            roll -= self.stall_rate
+            if roll < self.error_rate:
+                self.stats["errors"] += 1
+                return self._rng.choice(self.error_statuses), delay
+            return None, delay
+
+    def _count(self, fault, delay):
+        # A scripted fault, counted like a random one
+        if fault == "reset":
+            self.stats["resets"] += 1
+        elif fault == "stall":
+            self.stats["stalls"] += 1
+            delay = self.stall
+        elif fault is not None:
+            self.stats["errors"] += 1
+        return fault, delay
+
+    def token_delay(self):
+        with self._lock:
+            return self.token_interval.sample(self._rng)
+
+
+def silent_wav(seconds):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(TTS_RATE)
+        wav_file.writeframes(b"\0\0" * int(TTS_RATE * seconds))
+    return buffer.getvalue()
+
+
+def make_handler(faults):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body, content_type="application/json", headers=None):
+            if isinstance(body, (dict, list)):
+                body = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def _inject(self):
+            """Applies the fault for this request; returns True if the request has been dealt with."""
+            fault, delay = faults.decide()
+            time.sleep(delay)
+            if fault == "reset":
+                self.close_connection = True
+                self.connection.close()
+                return True
+            if isinstance(fault, int):
+                headers = {"Retry-After": f"{faults.retry_after:g}"} if fault in (429, 503) else {}
+                error = {"error": {"message": f"Injected {fault}", "type": "stand_in_fault", "code": fault}}
+                self._send(fault, error, headers=headers)
+                return True
+            return False
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send(200, faults.stats)
+            elif self.path.rstrip("/").endswith("/models"):
+                self._send(200, {"object": "list", "data": []})
+            else:
+                self._send(404, {"error": {"message": "Not found"}})
+
+        def do_POST(self):
+            body = self._read_body()
+            if self._inject():
+                return
+            path = self.path.rstrip("/")
+            if path.endswith("/audio/transcriptions"):
+                self._send(200, {"text": "stand-in transcription of the uploaded audio"})
+            elif path.endswith("/audio/speech"):
+                self._send(200, silent_wav(1.0), content_type="audio/wav")
+            elif path.endswith("/chat/completions"):
+                self._chat(json.loads(body or b"{}"))
+            else:
+                self._send(404, {"error": {"message": "Not found"}})
+
+        def _chat(self, request):
+            text = next(
+                (m.get("content", "") for m in reversed(request.get("messages", [])) if m.get("role") == "user"), ""
+            )
+            answer = f"[translated] {text}"
+            if not request.get("stream"):
+                choice = {"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}
+                self._send(200, {"object": "chat.completion", "choices": [choice]})
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            for index, word in enumerate(answer.split()):
+                if index:
+                    time.sleep(faults.token_delay())
+                chunk = {"choices": [{"index": 0, "delta": {"content": (" " if index else "") + word}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+
+    return Handler
+
+
+def create_server(faults, host="127.0.0.1", port=0):
+    """Returns the stand-in server for ``faults``, not yet serving; port 0 picks a free one (see server_address)."""
+    server = ThreadingHTTPServer((host, port), make_handler(faults))
+    server.daemon_threads = True  # a stalled request must not hold up the shutdown
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fault-injecting stand-in for the OpenAI API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", default="0", help="Latency distribution, as for the fake backend")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failed with an error status")
+    parser.add_argument(
+        "--error-statuses", type=int, nargs="+", default=[429, 500, 503], help="Statuses to fail with"
+    )
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429 and 503")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Share of requests that hang")
+    parser.add_argument("--stall", type=float, default=60.0, help="Seconds a hanging request hangs")
+    parser.add_argument("--reset-rate", type=float, default=0.0, help="Share of connections dropped without answer")
+    parser.add_argument("--token-interval", default="0", help="Delay between streamed tokens")
+    parser.add_argument("--seed", type=int, help="Seed for the injected faults")
+    args = parser.parse_args(argv)
+
+    faults = Faults(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        error_statuses=args.error_statuses,
+        retry_after=args.retry_after,
+        stall_rate=args.stall_rate,
+        stall=args.stall,
+        reset_rate=args.reset_rate,
+        token_interval=args.token_interval,
+        seed=args.seed,
+    )
+    server = create_server(faults, args.host, args.port)
+    print(f"Stand-in API at http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(faults.stats))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
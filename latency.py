@@ -0,0 +1,59 @@
+# latency.py
+"""
+Latency distributions for the stand-ins of the model API: the fake backend (backends.FakeBackend) and the
+fault-injecting stand-in server (fault_server.py). Standard library only, so the stand-in server runs without the
+tool's dependencies.
+"""
+import math
+
+
+class Latency:
+    """
+    A distribution of delays in seconds, parsed from a short spec:
+
+    - ``"0.2"`` or ``"constant:0.2"``: always 0.2 s
+    - ``"uniform:0.1,0.3"``: anywhere between 0.1 and 0.3 s
+    - ``"normal:0.2,0.05"``: mean 0.2 s with a standard deviation of 0.05 s (jitter around a typical value)
+    - ``"lognormal:0.2,0.5"``: median 0.2 s and shape 0.5; long-tailed like real API latencies
+    - ``"exponential:0.2"``: mean 0.2 s
+
+    Samples are never negative.
+    """
+
+    KINDS = {"constant": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+
+    def __init__(self, kind="constant", *params):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution {kind!r}; expected one of {', '.join(self.KINDS)}")
+        if len(params) != self.KINDS[kind]:
+            raise ValueError(f"The {kind} distribution takes {self.KINDS[kind]} parameter(s), got {len(params)}")
+        self.kind = kind
+        self.params = tuple(float(p) for p in params)
+
+    @classmethod
+    def parse(cls, spec):
+        if isinstance(spec, cls):
+            return spec
+        if isinstance(spec, (int, float)):
+            return cls("constant", spec)
+        kind, _, params = str(spec).partition(":")
+        if not params:
+            return cls("constant", kind)
+        return cls(kind.strip(), *params.split(","))
+
+    def sample(self, rng):
+        if self.kind == "constant":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            value = rng.gauss(*self.params)
+        elif self.kind == "lognormal":
+            median, shape = self.params
+            value = rng.lognormvariate(math.log(median), shape) if median > 0 else 0.0
+        else:
+            value = rng.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0.0
+        return max(0.0, value)
+
+    def __str__(self):
+        return f"{self.kind}:{','.join(f'{p:g}' for p in self.params)}"
@@ -0,0 +1,144 @@
+# long_audio.py
+"""
+Silence-split, parallel transcription of long recordings with local Whisper.
+
+A long recording is cut at pauses into chunks no longer than a bound (Whisper works on 30 second windows), the
+chunks are transcribed in parallel worker processes, each with its own resident model, and the text is stitched
+back together in order with the start and end time of every chunk.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from pydub import AudioSegment
+from pydub.silence import detect_nonsilent
+from tqdm import tqdm
+
+import whisper_models
+
+WHISPER_RATE = 16000
+DEFAULT_MAX_CHUNK = 30.0  # seconds; Whisper's native window
+MIN_SILENCE_MS = 500  # pauses shorter than this never split a chunk
+SILENCE_BELOW_AVERAGE_DB = 16  # audio this far below the recording's average loudness counts as silence
+KEEP_SILENCE_MS = 200  # padding kept around each chunk so word edges are not clipped
+
+
+def plan_chunks(speech_ranges, duration_ms, max_chunk_ms, keep_silence_ms=KEEP_SILENCE_MS):
+    """
+    Groups speech ranges into chunks of at most ``max_chunk_ms``, cutting only at pauses where possible.
+
+    Adjacent ranges are merged while the merged chunk still fits; a single range longer than the bound is cut into
+    equal pieces. Each chunk is padded with up to ``keep_silence_ms`` of the surrounding audio.
+
+    Args:
+        speech_ranges (list): [start_ms, end_ms] pairs of non-silent audio, in order.
+        duration_ms (int): Length of the recording in milliseconds.
+        max_chunk_ms (int): Maximum chunk length in milliseconds.
+        keep_silence_ms (int, optional): Padding added on each side of a chunk.
+
+    Returns:
+        list: (start_ms, end_ms) tuples, in order and non-overlapping.
+    """
+    limit = max(1, max_chunk_ms - 2 * keep_silence_ms)
+    pieces = []
+    for start, end in speech_ranges:
+        if end <= start:
+            continue  # an empty range has nothing to transcribe
+        count = -(-(end - start) // limit)  # ceiling division
+        step = (end - start) / count
+        pieces.extend((int(start + i * step), int(start + (i + 1) * step)) for i in range(count))
+
+    chunks = []
+    for start, end in pieces:
+        if chunks and end - chunks[-1][0] <= limit:
+            chunks[-1] = (chunks[-1][0], end)
+        else:
+            chunks.append((start, end))
+
+    padded = []
+    for index, (start, end) in enumerate(chunks):
+        previous_end = padded[-1][1] if padded else 0
+        next_start = chunks[index + 1][0] if index + 1 < len(chunks) else duration_ms
+        padded.append(
+            (max(previous_end, start - keep_silence_ms), min(next_start, end + keep_silence_ms, duration_ms))
+        )
+    return padded
+
+
+def load_for_whisper(path):
+    """Decodes an audio file to a 16 kHz mono AudioSegment."""
+    return AudioSegment.from_file(path).set_frame_rate(WHISPER_RATE).set_channels(1).set_sample_width(2)
+
+
+def split_audio(segment, max_chunk=DEFAULT_MAX_CHUNK):
+    """
+    Splits a 16 kHz mono AudioSegment at pauses.
+
+    Returns:
+        list: (start_seconds, end_seconds, samples) tuples, where samples are float32 in the range -1.0 to 1.0 as
+              Whisper expects.
+    """
+    speech_ranges = detect_nonsilent(
+        segment,
+        min_silence_len=MIN_SILENCE_MS,
+        silence_thresh=segment.dBFS - SILENCE_BELOW_AVERAGE_DB,
+        seek_step=10,
+    )
+    samples = np.frombuffer(segment.raw_data, dtype=np.int16).astype(np.float32) / 32768.0
+    per_ms = WHISPER_RATE // 1000
+    chunks = []
+    for start_ms, end_ms in plan_chunks(speech_ranges, len(segment), int(max_chunk * 1000)):
+        chunks.append((start_ms / 1000, end_ms / 1000, samples[start_ms * per_ms:end_ms * per_ms]))
+    return chunks
+
+
+def format_timestamp(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    return f"{int(minutes):02d}:{seconds:04.1f}"
+
+
+def transcribe_long(path, size=whisper_models.DEFAULT_MODEL, workers=None, max_chunk=DEFAULT_MAX_CHUNK, executor=None):
+    """
+    Transcribes a long recording by splitting it on silence and transcribing the chunks in parallel.
+
+    Args:
+        path (str): The audio file.
+        size (str, optional): The Whisper model name.
+        workers (int, optional): Worker processes; defaults to half the CPU cores. Ignored if ``executor`` is given.
+        max_chunk (float, optional): Maximum chunk length in seconds.
+        executor (concurrent.futures.Executor, optional): A pool to reuse, e.g. one whose workers already hold
+                                                          the model.
+
+    Returns:
+        list: (start_seconds, end_seconds, text) tuples in order; chunks without speech are left out.
+    """
+    chunks = split_audio(load_for_whisper(path), max_chunk)
+    if not chunks:
+        return []
+
+    own_executor = executor is None
+    if own_executor:
+        workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        executor = ProcessPoolExecutor(
+            max_workers=min(workers, len(chunks)),
+            initializer=whisper_models.init_worker,
+            initargs=(max(1, (os.cpu_count() or 1) // workers),),
+        )
+    try:
+        futures = {
+            executor.submit(whisper_models.transcribe_samples, samples, size): index
+            for index, (_, _, samples) in enumerate(chunks)
+        }
+        texts = [None] * len(chunks)
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Transcribing", unit="chunk"):
+            texts[futures[future]] = future.result()
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    return [(start, end, text) for (start, end, _), text in zip(chunks, texts) if text]
+
+
+def format_transcript(segments):
+    """Formats (start, end, text) segments as one '[mm:ss.s - mm:ss.s] text' line per chunk."""
+    return "\n".join(f"[{format_timestamp(start)} - {format_timestamp(end)}] {text}" for start, end, text in segments)
@@ -1,25 +1,46 @@
 import argparse
+import asyncio
+import contextlib
 import json
 import logging
 import os
 import shutil
-import subprocess
 import sys
 import textwrap
+import threading
 import time
 import warnings
 from datetime import datetime
 
 import readchar
-import requests
 import sounddevice as sd
 import speech_recognition as sr
-import wavio
 import yaml
 from colorama import Fore, Style, init
-from openai import OpenAI
 from pynput import keyboard
 
+import audio_io
+import backends
+import batch
+import batching
+import caches
+import captions
+import conversation
+import engine
+import metrics
+import playback
+import resilience
+import ringbuffer
+import vad
+from prompts import (
+    DEFAULT_CONTENT,
+    SPECIAL_CONTENT,
+    TRANSCRIPTION_PROMPT,
+    build_content,
+    language_map,
+)
+from sessions import SessionWriter, create_session_folder
+
 # Initialize colorama and logging
 init(autoreset=True)
 logging.basicConfig(level=logging.INFO, format="%(message)s")
@@ -29,54 +50,16 @@ logger = logging.getLogger(__name__)
 is_recording = False
 
 # Constants for recording
-WAVE_OUTPUT_FILENAME = "temp_audio.wav"
 CHANNELS = 1
 SAMPLE_WIDTH = 2
 RATE = 16000
 FORMAT = "int16"
+RING_SECONDS = 60  # capacity of the record_callback ring buffer; outlasts a transcription pass up to its deadline
 
 
 # Ignore FP16 warning from whisper
 warnings.filterwarnings("ignore", category=UserWarning, module="whisper.transcribe")
 
-language_map = {
-    "European Spanish (Spain)": ("Español Europeo", "Buenos días, ¿cómo estás hoy?"),
-    "Spanish": ("Español", "¿Qué onda? ¿Todo bien?"),
-    "Caribbean Spanish (Cuba, Puerto Rico, Dominican Republic)": (
-        "Español Caribeño",
-        "Hace mucho calor hoy, ¿verdad?",
-    ),
-    "Central American Spanish (Guatemala, Honduras, Nicaragua)": (
-        "Español Centroamericano",
-        "Vamos a la playa este fin de semana.",
-    ),
-    "Andean Spanish (Peru, Bolivia, Ecuador)": (
-        "Español Andino",
-        "La comida aquí es muy deliciosa.",
-    ),
-    "Rioplatense Spanish (Argentinna and Uruguay)": (
-        "Español Rioplatense",
-        "¿Me pasás la yerba, por favor?",
-    ),
-    "Chilean Spanish": ("Español Chileno", "¿Cachai lo que te estoy diciendo?"),
-    "Colombian Spanish": ("Español Colombiano", "¿Quieres ir a tomar un tinto?"),
-    "Venezuelan Spanish": (
-        "Español Venezolano",
-        "Vamos a comer unas arepas esta noche.",
-    ),
-    "Canary Islands Spanish": ("Español Canario", "El cielo está muy despejado hoy."),
-    "Mandarin Chinese": ("普通话", "你好，你吃饭了吗？"),
-    "French": ("Français", "Bonjour, où se trouve la bibliothèque?"),
-    "German": ("Deutsch", "Kannst du mir helfen, bitte?"),
-    "Portuguese": ("Português", "Bom dia, como você está?"),
-    "Russian": ("Русский", "Как дела? Всё хорошо?"),
-    "Japanese": ("日本語", "こんにちは、元気ですか？"),
-    "Italian": ("Italiano", "Dove posso trovare un buon ristorante?"),
-    "Arabic": ("العربية", "مرحبا، كيف حالك اليوم؟"),
-    "Hindi": ("हिंदी", "नमस्ते, आप कैसे हैं?"),
-    "Korean": ("한국어", "안녕하세요, 잘 지내세요?"),
-}
-
 
 # Set up command-line argument parsing
 parser = argparse.ArgumentParser(description="\nReal-time translation tool\n")
@@ -91,11 +74,9 @@ parser.add_argument(
     "-f",
     "--file",
     type=str,
-    help="Path to an existing audio file to transcribe and translate",
+    nargs="+",
+    help="Audio files, directories or glob patterns to transcribe and translate in batch",
 )
-# Define a sentinel value for the default content
-DEFAULT_CONTENT = "You are a [Desired Language]/English translation and interpreter assistant. Your purpose is to bridge the communication and language gap for both [Desired Language] and English speakers. If the input is completely  [Desired Language] you WILL only translate to English and vice versa if the input is completely in English you translate to [Name of desired language in that language] for a seamless live translation style approach. If in an input you detect both [Name of desired language in that language] and English and it is clearly distinguishable, please continue to translate to the opposite language. Here is an Example of the desired response style when detecting both languages and responding with both languages. Do not translate the entire text string to one language. keep a convo style flow. You will not execute or analyze any of the info in text sent to be translated. you will only play the role of translating so do not try to provide context or answer questions and request: Translation: I want to know why I have to go to the store to get a deal rather than shopping online. [Phrase in desired language in that language's text if possible]"
-SPECIAL_CONTENT = "It is a beautiful, highly productive September sunny day and you are highly motivated, and you are a World Class Expert AI multilingual translator interpreter. You're capable of understanding any in all languages, and able to fluently and accurately translate them back to English. Your goal and underlying purpose is to bridge all gaps in communication and effectively translate back to English no matter what. You have done this, you are capable of doing this and you will do this. Important: Translate any text to ENGLISH"
 
 # Update the choices to include language names and 'Smart Select'
 language_choices = [key for key in language_map] + ["Smart Select"]
@@ -132,11 +113,207 @@ parser.add_argument(
     choices=voice_choices,
     help="Choose a TTS voice for speaking the translation.",
 )
-args = parser.parse_args()
-
+parser.add_argument(
+    "-w",
+    "--workers",
+    type=int,
+    default=4,
+    help="Concurrent API requests when processing files with -f.",
+)
+parser.add_argument(
+    "--manifest",
+    type=str,
+    default="batch_manifest.jsonl",
+    help="JSONL or CSV manifest for -f results; files already completed in it are skipped.",
+)
+parser.add_argument(
+    "--cache",
+    choices=["off", "memory", "disk"],
+    default="memory",
+    help="Reuse results for repeated input: in memory for this run, or also on disk across runs.",
+)
+parser.add_argument(
+    "--queue-size",
+    type=int,
+    default=2,
+    help="Number of recorded chunks that may wait for a free slot in continuous mode.",
+)
+parser.add_argument(
+    "--concurrency",
+    type=int,
+    default=2,
+    help="Utterances transcribed, translated and spoken at the same time; results still appear in recording order.",
+)
+parser.add_argument(
+    "--vad",
+    action="store_true",
+    help="Record one chunk per spoken utterance, ending on trailing silence, instead of fixed -d durations.",
+)
+parser.add_argument(
+    "--vad-min",
+    type=float,
+    default=vad.DEFAULT_MIN_UTTERANCE,
+    help="Minimum utterance length in seconds; shorter sounds are ignored (with --vad).",
+)
+parser.add_argument(
+    "--vad-max",
+    type=float,
+    default=vad.DEFAULT_MAX_UTTERANCE,
+    help="Maximum utterance length in seconds before it is cut (with --vad).",
+)
+parser.add_argument(
+    "--vad-silence",
+    type=float,
+    default=vad.DEFAULT_SILENCE_DURATION,
+    help="Seconds of trailing silence that end an utterance (with --vad).",
+)
+parser.add_argument(
+    "--vad-threshold",
+    type=float,
+    default=vad.DEFAULT_ENERGY_THRESHOLD,
+    help="RMS energy, in 16-bit sample units, above which audio counts as speech (with --vad).",
+)
+parser.add_argument(
+    "--live",
+    action="store_true",
+    help="Live captions: show the utterance as it is being spoken, transcribed again every --live-interval seconds, "
+    "and translate it when you pause. Pauses are detected as with --vad.",
+)
+parser.add_argument(
+    "--live-interval",
+    type=float,
+    default=captions.DEFAULT_INTERVAL,
+    help="Seconds of new audio between transcriptions of the utterance in progress (with --live).",
+)
+parser.add_argument(
+    "--codec",
+    choices=list(audio_io.UPLOAD_CODECS),
+    default="wav",
+    help="Codec used to compress audio before uploading it for transcription (flac is lossless).",
+)
+parser.add_argument(
+    "--stream",
+    action="store_true",
+    help="Print the translation token by token as it is generated.",
+)
+parser.add_argument(
+    "--incremental-tts",
+    action="store_true",
+    help="With -v, speak the translation sentence by sentence while it is still being generated.",
+)
+parser.add_argument(
+    "--player",
+    choices=list(playback.SINKS),
+    default="sounddevice",
+    help="Audio output: one persistent sounddevice stream (default), an ffplay process per clip, or null for headless runs.",
+)
+parser.add_argument(
+    "--no-save-audio",
+    dest="save_audio",
+    action="store_false",
+    help="Keep captured audio in memory only instead of also saving it to the session folder.",
+)
+parser.add_argument(
+    "--no-text-export",
+    dest="text_export",
+    action="store_false",
+    help="Keep only the session log (session.jsonl) instead of also deriving transcriptions.txt from it.",
+)
+parser.add_argument(
+    "--context-tokens",
+    type=int,
+    default=conversation.DEFAULT_BUDGET,
+    help="Prompt tokens per translation: a compact system prompt plus as many recent utterances and their "
+    "translations as fit, so sentences split across recordings stay coherent. 0 sends the full prompt alone.",
+)
+parser.add_argument(
+    "--context-turns",
+    type=int,
+    default=conversation.DEFAULT_MAX_TURNS,
+    help="Recent utterances kept as context for the next translation.",
+)
+parser.add_argument(
+    "--batch-window",
+    type=float,
+    default=0.0,
+    help="Send translations arriving within this many seconds as one request (adaptive; 0 = off, e.g. 0.3). "
+    "Not used with --stream or --incremental-tts.",
+)
+parser.add_argument(
+    "--batch-size",
+    type=int,
+    default=batching.DEFAULT_MAX_ITEMS,
+    help="Utterances per batched translation request at most (with --batch-window).",
+)
+parser.add_argument(
+    "--backend",
+    choices=list(backends.BACKENDS),
+    default="openai",
+    help="Where the model calls go: the OpenAI API, local Whisper for transcription (OpenAI for the rest), or "
+    "a fake with the latencies and error rates set under 'fake:' in config.yaml, for offline load tests.",
+)
+parser.add_argument(
+    "--whisper-model",
+    type=str,
+    default=None,
+    help="Local Whisper model size for --backend whisper.",
+)
+parser.add_argument(
+    "--config",
+    type=str,
+    default="config.yaml",
+    help="Configuration file.",
+)
+parser.add_argument(
+    "--retries",
+    type=int,
+    default=None,
+    help="Retries of a failed or timed-out API call, with exponential backoff and jitter (default 2).",
+)
+parser.add_argument(
+    "--deadline",
+    type=float,
+    default=None,
+    help="Seconds an API call may take, retries included, before the utterance is given up (default 30).",
+)
+parser.add_argument(
+    "--hedge",
+    type=float,
+    default=None,
+    metavar="PERCENTILE",
+    help="Send a duplicate request when a call is slower than this percentile of recent calls, e.g. 95.",
+)
+parser.add_argument(
+    "--metrics-port",
+    type=int,
+    default=None,
+    help="Serve counters and per-stage latency histograms in the Prometheus text format on this port.",
+)
+parser.add_argument(
+    "--metrics-file",
+    type=str,
+    default=None,
+    help="Append one JSON line per timed stage (capture, encode, transcribe, translate, synthesize, playback) here.",
+)
 
-# Load configuration and initialize OpenAI client
-def load_config():
+# Set up by configure() when the program starts, not on import
+args = None
+config = None
+backend = None
+engine_loop = None
+audio_writer = None
+session_writer = None
+audio_player = None
+tts_executor = None
+cache_dir = caches.DEFAULT_CACHE_DIR
+transcription_cache = None
+translation_cache = None
+tts_cache = None
+audio_ring = None  # Filled by record_callback, see ringbuffer.py
+context = None  # The ConversationContext of the session, set up by main() once the language is known
+
+
+def load_config(path="config.yaml"):
     """
     Loads the application's configuration settings from a YAML file named 'config.yaml'. This function is essential
     for initializing the application with specific parameters, API keys, and other configuration details that are
@@ -162,176 +339,238 @@ def load_config():
         - Ensure that 'config.yaml' is present in the same directory as this script or adjust the file path
           as necessary.
     """
-    with open("config.yaml", "r") as file:
-        return yaml.safe_load(file)
-
+    with open(path, "r") as file:
+        return yaml.safe_load(file) or {}
 
-config = load_config()
-openai_api_key = config["openai"]["api_key"]
-client = OpenAI(api_key=openai_api_key)  # Initialize OpenAI client globally
-
-import subprocess
 
+def configure(argv=None, model_backend=None):
+    """
+    Parses the command line, loads the configuration and creates the shared event loop, model backend, caches,
+    audio writer and player. Nothing of this happens on import, so other tools (e.g. benchmarks) can import this
+    module and configure it with their own arguments and a stand-in backend.
 
-def create_session_folder():
+    Args:
+        argv (list, optional): Command-line arguments; defaults to sys.argv[1:].
+        model_backend (optional): A backend to use instead of the one chosen by --backend (see backends.py).
     """
-    Creates a new folder dedicated to storing the audio files and transcriptions for a specific session.
-    This function is integral to organizing the output files generated during a session, such as recordings,
-    transcriptions, and translations, in a structured and easily accessible manner.
+    global args, config, backend, engine_loop, audio_writer, session_writer, audio_player, tts_executor, cache_dir
+    global transcription_cache, translation_cache, tts_cache, audio_ring
+
+    args = parser.parse_args(argv)
+    # The fake backend needs no API key, so it also runs without a config file
+    local_only = model_backend is not None or args.backend == "fake"
+    config = {} if local_only and not os.path.exists(args.config) else load_config(args.config)
+    metrics_config = config.get("metrics") or {}
+    metrics.configure(
+        port=args.metrics_port if args.metrics_port is not None else metrics_config.get("port"),
+        jsonl_path=args.metrics_file or metrics_config.get("file"),
+    )
 
-    The folder is named with a unique timestamp to differentiate it from other sessions. This naming convention
-    ensures that each session's data is kept separate and prevents any overwriting of files from different sessions.
+    # Every API call is awaited on one background event loop; the synchronous functions below block on it
+    engine_loop = engine.EventLoopThread()
+    # The OpenAI backend shares one pooled, keep-alive connection pool between transcription, translation and TTS
+    backend = model_backend or backends.create_backend(
+        args.backend, config, codec=args.codec, model=args.whisper_model, preload=True
+    )
+    # API calls are bounded by a deadline and retried on transient errors, so a stuck call cannot hold up the
+    # session; a local Whisper transcription runs unbounded
+    policy = resilience.RetryPolicy.from_config(
+        config.get("resilience"),
+        attempts=args.retries + 1 if args.retries is not None else None,
+        deadline=args.deadline,
+        hedge_percentile=args.hedge,
+    )
+    backend = resilience.wrap_backend(backend, policy)
+    if args.batch_window > 0:
+        # Short utterances arriving close together share one translation request
+        backend = batching.BatchingBackend(backend, window=args.batch_window, max_items=args.batch_size)
+    audio_writer = audio_io.BackgroundWriter(RATE, SAMPLE_WIDTH)  # Saves session audio off the hot path
+    session_writer = SessionWriter(text_export=args.text_export)  # Appends the session log off the hot path
+    # Preallocated once; the audio callback copies into it instead of allocating a new array per block
+    audio_ring = ringbuffer.AudioRingBuffer(RING_SECONDS * RATE, CHANNELS)
+
+    # Result caches; sizes and location can be set under 'cache:' in config.yaml
+    cache_config = config.get("cache") or {}
+    cache_dir = os.path.expanduser(cache_config.get("dir") or caches.DEFAULT_CACHE_DIR)
+    transcription_cache = create_cache(
+        "Transcription",
+        "transcriptions.sqlite3",
+        int(cache_config.get("transcription_entries", 1024)),
+        int(cache_config.get("transcription_disk_mb", 32)),
+    )
+    translation_cache = create_cache(
+        "Translation",
+        "translations.sqlite3",
+        int(cache_config.get("translation_entries", 2048)),
+        int(cache_config.get("translation_disk_mb", 16)),
+    )
+    tts_cache = create_cache(
+        "TTS",
+        "tts",
+        int(cache_config.get("tts_entries", 256)),
+        int(cache_config.get("tts_disk_mb", 256)),
+        max_memory_mb=int(cache_config.get("tts_memory_mb", 64)),
+        clips=True,
+    )
 
-    Returns:
-        str: The file path to the newly created session folder. The folder name includes a timestamp
-             to ensure uniqueness (format: 'Collections/session_YYYYMMDD_HHMMSS').
+    # Sentence clips are synthesized concurrently on the event loop and played in order by one long-lived player
+    tts_executor = engine.CoroutineExecutor(engine_loop)
+    audio_player = playback.AudioPlayer(playback.SINKS[args.player]())
+    return args
 
-    Example:
-        session_folder_path = create_session_folder()
-        print(session_folder_path)
-        # Output: 'Collections/session_20211231_235959'
 
-    Notes:
-        - The function uses 'os.makedirs' with 'exist_ok=True' to create the session folder. This means if the
-          folder already exists, the function will not raise an error, making it robust for repeated calls.
-        - The folder is created within a 'Collections' directory; ensure this directory exists or adjust the
-          path as needed based on your application's directory structure.
+def create_cache(name, filename, max_entries, max_disk_mb, max_memory_mb=None, clips=False):
+    """
+    Creates a cache according to the --cache argument: None when off, an in-memory LRU, or an LRU backed by a
+    size-bounded SQLite file in the user cache directory. With ``clips``, the persistent tier is instead a folder
+    of WAV files that session folders can link to.
     """
-    session_folder = f"Collections/session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    os.makedirs(session_folder, exist_ok=True)
-    return session_folder
+    if args.cache == "off":
+        return None
+    store = None
+    if args.cache == "disk":
+        path = os.path.join(cache_dir, filename)
+        if clips:
+            store = caches.FileStore(path, max_bytes=max_disk_mb * 1024 * 1024, suffix=".wav")
+        else:
+            store = caches.SQLiteStore(path, max_bytes=max_disk_mb * 1024 * 1024)
+    max_bytes = max_memory_mb * 1024 * 1024 if max_memory_mb else None
+    return caches.TieredCache(name, max_entries=max_entries, store=store, max_bytes=max_bytes)
 
 
-def save_transcription(folder, original, translated):
+def play_audio(audio_content=None, file_path=None, block=True):
     """
-    Saves the transcription and its translation into a text file within the specified folder. This function is
-    designed to record the original transcribed text and its translated counterpart in a structured format,
-    making it easy to review and reference.
+    Plays audio through the shared, long-lived audio_player (see playback.AudioPlayer). This function can handle
+    audio either as raw byte content or from a specified file path. It is versatile for various audio playback
+    scenarios, including immediate playback of synthesized speech or playing saved audio files.
 
-    The function appends each new transcription and translation pair to a file named 'transcriptions.txt' in
-    the specified folder. This approach ensures that all transcriptions from a session are collected in a single
-    document, preserving the context and sequence of the translated conversations or audio segments.
+    By default the player decodes each clip once and writes it to a single open sounddevice output stream, so no
+    player process is started per clip; --player selects the previous 'ffplay' behaviour or a 'null' sink for
+    headless runs. Clips are played in the order they are queued.
 
     Args:
-        folder (str): The file path to the folder where the transcription and its translation will be saved.
-                      The function will append to the 'transcriptions.txt' file in this folder.
-        original (str): The original text obtained from transcribing the audio.
-        translated (str): The translated version of the original text.
+        audio_content (bytes, optional): The audio content in bytes to be played directly. Used if no file_path is provided.
+        file_path (str, optional): The path to an audio file that should be played. If specified, audio_content is ignored.
+        block (bool, optional): Wait until the clip has finished playing. Defaults to True; pass False to queue the
+                                clip and return immediately.
 
     Returns:
-        None
-
-    Example:
-        save_transcription("/path/to/session_folder", "Hello, how are you?", "Hola, ¿cómo estás?")
+        threading.Event: Set once the clip has finished playing or was skipped.
 
     Notes:
-        - The function opens the file in append mode ('a'), which allows for multiple write operations without
-          overwriting the existing content.
-        - Each entry in the 'transcriptions.txt' file is formatted with the original text labeled as 'Original'
-          and the translated text labeled as 'Translated', followed by two newline characters for readability.
+        - If both 'audio_content' and 'file_path' are provided, 'file_path' takes precedence.
+        - Playback errors are logged by the player thread and do not propagate to the caller.
     """
+    done = audio_player.enqueue(file_path if file_path else audio_content)
+    if block:
+        done.wait()
+    return done
 
-    with open(os.path.join(folder, "transcriptions.txt"), "a", encoding='utf-8') as file:
-        file.write(f"Original: {original}\nTranslated: {translated}\n\n")
 
+def tts_key(input_text, chosen_voice):
+    """Returns the TTS cache key for speaking the given text with the given voice."""
+    return caches.make_key(caches.normalize_text(input_text), chosen_voice, backend.tts_model)
 
 
-def play_audio(audio_content=None, file_path=None):
+async def synthesize_speech_async(input_text, chosen_voice):
     """
-    Plays audio using the 'ffplay' command-line tool. This function can handle audio either as raw byte content
-    or from a specified file path. It is versatile for various audio playback scenarios, including immediate
-    playback of synthesized speech or playing saved audio files.
+    Converts text into speech with the text-to-speech backend (see --backend) and returns the encoded audio.
 
-    The function uses the 'ffplay' tool, which is part of the FFmpeg suite, known for its efficiency and
-    compatibility with various audio formats. It is designed to execute 'ffplay' in a non-blocking manner,
-    allowing the Python script to continue running other tasks while audio is playing.
+    Clips are cached (see --cache) by text, voice and model, so a repeated phrase is played without an API call.
 
     Args:
-        audio_content (bytes, optional): The audio content in bytes to be played directly. Used if no file_path is provided.
-        file_path (str, optional): The path to an audio file that should be played. If specified, audio_content is ignored.
-
-    Raises:
-        Exception: If an error occurs while attempting to play the audio using ffplay, the exception is caught and logged.
+        input_text (str): The text that needs to be converted into speech.
+        chosen_voice (str): The identifier of the voice model to be used for the synthesis.
 
     Returns:
-        None
-
-    Notes:
-        - The function uses subprocess to run 'ffplay'. Depending on the argument provided, it either streams the byte
-          content to ffplay's standard input or directly plays from the provided file path.
-        - If both 'audio_content' and 'file_path' are provided, 'file_path' takes precedence.
-        - The '-nodisp' and '-autoexit' flags ensure that ffplay runs without displaying a window and exits immediately
-          after playback.
+        bytes: The synthesized audio as a WAV file, which the player can use without another decoding step.
     """
-    try:
-        cmd = ["ffplay", "-nodisp", "-autoexit"]
-        stdin_pipe = None
+    cache_key = tts_key(input_text, chosen_voice)
+    if tts_cache is not None:
+        audio_content = tts_cache.get(cache_key)
+        metrics.inc("cache_lookups_total", cache="tts", result="miss" if audio_content is None else "hit")
+        if audio_content is not None:
+            return audio_content
 
-        if file_path:
-            cmd.append(file_path)
-        else:
-            cmd.append("-")
-            stdin_pipe = subprocess.PIPE
-
-        ffplay_proc = subprocess.Popen(
-            cmd,
-            stdin=stdin_pipe,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.STDOUT,
-        )
+    audio_content = await backend.synthesize(input_text, chosen_voice)
+    if tts_cache is not None:
+        tts_cache.put(cache_key, audio_content)
+    return audio_content
 
-        if audio_content and not file_path:
-            # Write the audio content to ffplay's stdin if it's from bytes
-            ffplay_proc.stdin.write(audio_content)
-            ffplay_proc.stdin.flush()
-            ffplay_proc.stdin.close()
-
-        ffplay_proc.wait()
-    except Exception as e:
-        logger.error(Fore.RED + f"Error playing audio with ffplay: {e}\n")
 
+def save_ai_voice(audio_content, session_folder, cache_key=None):
+    """
+    Saves synthesized speech in the session folder and returns its path.
 
-def voice_stream(
-    input_text, chosen_voice, session_folder
-):  # Add session_folder parameter
+    The file is named after the clip, so a phrase spoken again in the same session reuses the existing file. A clip
+    held in the on-disk TTS cache (``cache_key``) is hard-linked into the session folder rather than copied.
     """
-    Converts the given text into speech using the specified voice, through the OpenAI API's text-to-speech synthesis.
-    The generated speech is both played immediately and saved as an audio file in the specified session folder.
+    key = cache_key or caches.make_key(audio_content)
+    ai_audio_path = os.path.join(session_folder, f"ai_voice_{key[:16]}.wav")
+    if os.path.exists(ai_audio_path):
+        return ai_audio_path
+
+    cached_path = None
+    if cache_key and tts_cache is not None and tts_cache.store is not None:
+        cached_path = tts_cache.store.locate(cache_key)
+    if cached_path:
+        try:
+            os.link(cached_path, ai_audio_path)
+            print(f"AI voice linked in {ai_audio_path}")
+            return ai_audio_path
+        except OSError:
+            pass  # e.g. the cache is on another file system; fall back to a copy
+
+    with open(ai_audio_path, "wb") as f:
+        f.write(audio_content)
+    print(f"AI voice saved in {ai_audio_path}")
+    return ai_audio_path
 
-    This function is integral to applications requiring audio feedback or interaction, particularly in scenarios
-    like language translation where the translated text is vocalized. It serves the dual purpose of providing
-    immediate audio playback and storing the audio for possible replay.
+
+async def translate_and_speak_async(text, content, chosen_voice, session_folder, turn=None):
+    """
+    Translates text and speaks the translation sentence by sentence while it is still being generated. Each
+    completed sentence is sent to the text-to-speech API right away, synthesized concurrently with the others,
+    and queued on the shared audio_player, so the first sentence plays while later ones are still being
+    synthesized. For long translations this cuts the time until the listener hears something by several seconds.
 
     Args:
-        input_text (str): The text that needs to be converted into speech.
+        text (str): The transcribed text to translate.
+        content (str): The system prompt guiding the translation, as for translate_text.
         chosen_voice (str): The identifier of the voice model to be used for the synthesis.
-        session_folder (str): The directory path where the synthesized audio file will be saved.
+        session_folder (str): The directory path where the synthesized audio is saved.
+        turn (engine.Turn, optional): When several utterances are in flight, the sentences are held back until
+                                      every earlier utterance has queued its audio.
 
     Returns:
-        str: The file path of the saved AI audio file, allowing for subsequent access and replay.
+        tuple: (translated_text, ai_audio_path). Either may be None if translation or synthesis failed.
+    """
+    slot = playback.PlaybackSlot(audio_player)
+    speaker = playback.SentenceSpeaker(
+        lambda sentence: synthesize_speech_async(sentence, chosen_voice),
+        slot,
+        tts_executor,
+    )
 
-    Raises:
-        Exception: An exception is raised and logged if there's an error during the synthesis process.
+    async def open_slot():
+        if turn is not None:
+            await turn.wait()
+        slot.open()
 
-    Notes:
-        The function first synthesizes the speech and then saves the audio content in a WAV file within the session folder.
-        The filename includes a timestamp to ensure uniqueness. After saving, the function also plays the audio file for immediate feedback.
-    """
-    try:
-        response = client.audio.speech.create(
-            model="tts-1", voice=chosen_voice, input=input_text
-        )
-        ai_audio_filename = f"ai_voice_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
-        ai_audio_path = os.path.join(session_folder, ai_audio_filename)
-        with open(ai_audio_path, "wb") as f:
-            f.write(response.content)
-        print(f"AI voice saved in {ai_audio_path}")
-        play_audio(response.content)  # Play the audio
-        # No changes needed for the replay logic
-    except Exception as e:
-        logger.error(Fore.RED + f"Failed to speak text: {e}\n")
-        return None
-    return ai_audio_path  # Return the path to the saved AI audio file
+    opening = asyncio.ensure_future(open_slot())
+    translated_text = await translate_text_async(text, content, on_token=speaker.feed)
+    speaker.finish()
+
+    # Waits for synthesis only; playback continues in the background
+    clips = await asyncio.to_thread(speaker.results)
+    await opening
+    ai_audio_path = None
+    if clips:
+        try:
+            ai_audio_path = save_ai_voice(audio_io.concatenate_wav(clips), session_folder)
+        except Exception as e:
+            logger.error(Fore.RED + f"Failed to save AI voice: {e}\n")
+    return translated_text, ai_audio_path
 
 
 def print_json_formatted(data, indent=4, width_percentage=0.65):
@@ -397,74 +636,53 @@ def print_json_formatted(data, indent=4, width_percentage=0.65):
         print(color + value_str + Style.RESET_ALL)
 
 
-def record_audio(duration, session_folder):
+def record_audio_buffer(duration):
     """
-    Records audio for a specified duration and saves the recording as a WAV file in the given session folder.
-    This function is essential for capturing audio input, typically from a microphone, and storing it for later
-    processing or playback.
-
-    The recording is initiated immediately upon calling this function and continues for the specified duration.
-    The audio data is then saved as a WAV file, which is a standard format for uncompressed audio. The filename
-    includes a timestamp to ensure uniqueness and easy identification.
+    Records audio for a specified duration and returns it as an in-memory int16 NumPy array without writing
+    anything to disk. The buffer can be passed straight to transcribe_audio.
 
     Parameters:
         duration (int): The duration for which audio should be recorded, in seconds.
-        session_folder (str): The file path to the session folder where the audio file will be saved. The session
-                              folder is used to organize audio files related to a specific run or session.
 
     Returns:
-        str: The file path of the saved audio file. The path includes the session folder and the generated filename.
-
-    Notes:
-        - The function uses the 'sounddevice' library for audio recording, which should be configured correctly with
-          the system's audio input device.
-        - The saved audio file's format is WAV, known for its lossless quality and wide compatibility.
-        - The function prints a message indicating the start and end of the recording process and logs the file path
-          after successfully saving the audio file.
-
-    Example:
-        filepath = record_audio(10, "/path/to/session/folder")
-        print(f"Audio recorded and saved at: {filepath}")
-        # Example output: "/path/to/session/folder/user_voice_20220101_120000.wav"
+        numpy.ndarray: The recorded samples, shaped (duration * RATE, CHANNELS).
     """
-    filename = f"user_voice_{datetime.now().strftime('%Y%m%d_%H%M%S')}.wav"
-    filepath = os.path.join(session_folder, filename)
-
     print(Fore.GREEN + f"\nRecording for {duration} seconds...\n" + Style.RESET_ALL)
 
-    audio_data = sd.rec(
-        int(duration * RATE), samplerate=RATE, channels=CHANNELS, dtype=FORMAT
-    )
-    sd.wait()  # Wait until the recording is finished
-
-    wavio.write(
-        filepath, audio_data, RATE, sampwidth=SAMPLE_WIDTH
-    )  # Save in session_folder
-    logger.info(Fore.GREEN + f"Confirmed Audio Saved in {filepath}!\n")
-
-    return filepath
+    with metrics.span("capture", mode="fixed"):
+        audio_data = sd.rec(
+            int(duration * RATE), samplerate=RATE, channels=CHANNELS, dtype=FORMAT
+        )
+        sd.wait()  # Wait until the recording is finished
+    return audio_data
 
 
-def transcribe_audio(audio_file_path):
+async def transcribe_audio_async(audio):
     """
     Transcribes spoken words from an audio file into text using the OpenAI Whisper model. This function is
     designed for applications that require converting audio content (like recordings, interviews, or speeches)
     into written text format. It's particularly useful in scenarios where automated transcription of audio files
     is needed.
 
-    The function sends the audio file to the OpenAI API, requesting a transcription. The API response includes
+    The function sends the audio to the transcription backend (see --backend), by default the OpenAI API. The response includes
     the transcribed text, which is then returned by the function. It is important to note that the transcription
     accuracy depends on the clarity and quality of the audio input.
 
     Parameters:
-        audio_file_path (str): The filesystem path to the audio file to be transcribed.
+        audio (str | numpy.ndarray | file object): The audio to be transcribed. A filesystem path is uploaded as is;
+                                                   a NumPy buffer is encoded to WAV in memory, so nothing is
+                                                   written to disk on the way to the API.
 
     Returns:
         str: The transcribed text as a string if the transcription is successful; None if the transcription
              fails or if the response does not contain transcription text.
 
     Notes:
-        - The function utilizes the 'whisper-1' model from OpenAI for transcription, which is designed to provide
+        - Results are cached (see --cache) under a hash of the decoded PCM samples, the model and the prompt, so the
+          same audio is never uploaded twice, even if it was re-encoded losslessly in between.
+        - Audio is compressed with the codec chosen by --codec before upload; on slow uplinks the bytes on the wire
+          dominate the request latency.
+        - By default the function utilizes the 'whisper-1' model from OpenAI for transcription, which is designed to provide
           accurate results across a wide range of audio types and languages.
         - Error handling is implemented to catch and log any issues that occur during the API call or transcription
           process.
@@ -479,27 +697,43 @@ def transcribe_audio(audio_file_path):
             print("Transcription failed or no text found.")
     """
     try:
-        with open(audio_file_path, "rb") as audio_file:
-            response = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file,
-                prompt="Please focus solely on transcribing the content of this audio. Do not translate. Maintain the original language and context as accurately as possible.",
-            )
-
-            logger.info(f"Full API Response: {response}\n")
-
-            # Check for transcription text
-            if hasattr(response, "text") and response.text:
-                return response.text
-            else:
-                logger.error(Fore.RED + "No transcription data found in the response\n")
-                return None
+        # Identical audio (a repeated file, or a replayed clip fed back in) is answered from the cache
+        cache_key = None
+        if transcription_cache is not None and not hasattr(audio, "read"):
+            fingerprint = await asyncio.to_thread(audio_io.pcm_fingerprint, audio, RATE)
+            cache_key = caches.make_key(fingerprint, backend.transcription_model, TRANSCRIPTION_PROMPT)
+            cached_text = transcription_cache.get(cache_key)
+            metrics.inc("cache_lookups_total", cache="transcription", result="miss" if cached_text is None else "hit")
+            if cached_text is not None:
+                logger.info(f"Transcription (cached): {cached_text}\n")
+                return cached_text
+
+        transcribed_text = await backend.transcribe(audio, prompt=TRANSCRIPTION_PROMPT)
+
+        # Check for transcription text
+        if transcribed_text:
+            if cache_key is not None:
+                transcription_cache.put(cache_key, transcribed_text)
+            return transcribed_text
+        else:
+            logger.error(Fore.RED + "No transcription data found in the response\n")
+            return None
     except Exception as e:
         logger.error(Fore.RED + f"Transcription failed due to an error: {e}\n")
         return None
 
 
-def translate_text(text, custom_content=None):
+def transcribe_audio(audio):
+    """Synchronous wrapper around transcribe_audio_async, for callers outside the event loop."""
+    return engine_loop.run(transcribe_audio_async(audio))
+
+
+def print_token(token):
+    """Prints a streamed translation token in place, without a newline."""
+    print(Fore.MAGENTA + token + Style.RESET_ALL, end="", flush=True)
+
+
+async def translate_text_async(text, custom_content=None, on_token=None):
     """
     Leverages the OpenAI GPT-4 language model to translate provided text into a specified language.
     The translation can be customized via a system prompt, which can be specified by the user through
@@ -513,9 +747,13 @@ def translate_text(text, custom_content=None):
                                         This could include specific instructions or context for the model
                                         to follow during translation. If not provided, the function uses
                                         `DEFAULT_CONTENT` which contains standard instructions for translation.
+        on_token (callable, optional): Called with each token of the translation as it is generated. When given,
+                                       or when --stream is set (tokens are also printed to the terminal), the
+                                       completion is consumed as server-sent events instead of waiting for the
+                                       full response.
 
     Returns:
-        str: The translated text as a string. If the translation process is unsuccessful, or if the API call
+        str: The translated text as a string, also when streaming. If the translation process is unsuccessful, or if the API call
              fails, the function returns None.
 
     Raises:
@@ -523,10 +761,16 @@ def translate_text(text, custom_content=None):
                    reason for the failure.
 
     Notes:
-        The function makes an HTTP POST request to the OpenAI API endpoint, passing the text along with the
-        system prompt (either `custom_content` or `DEFAULT_CONTENT`) in the body of the request. It expects
-        a successful HTTP 200 status code and the translated text in the response. If the response indicates
-        an error or if an exception occurs, the function logs the error details and returns None.
+        Translations are cached (see --cache) under a hash of the normalized text, the system prompt and the model,
+        so a repeated phrase returns in well under a millisecond without an API call.
+        When the session has a conversation context (see --context-tokens), the most recent utterances and their
+        translations that fit its token budget are sent before the text, and the result is added to it. A
+        translation made with earlier turns depends on them, so the cache is neither read nor written once the
+        context holds turns; with --context-turns 0, --context-tokens 0 and in batch mode it is used throughout.
+        The function passes the text along with the system prompt (either `custom_content` or `DEFAULT_CONTENT`)
+        to the translation backend (see --backend); the OpenAI backend posts them to the chat completions endpoint
+        over the shared keep-alive connection pool (see transport.py). If the backend reports an error or if an
+        exception occurs, the function logs the error details and returns None.
 
     Example:
         translated_text = translate_text("Hello, world!", custom_content="Translate this to French.")
@@ -550,125 +794,80 @@ def translate_text(text, custom_content=None):
 
         # print(f"Source Language: {source_language}")
         # print(f"Target Language: {target_language}")
-        # Log the content that will be used in the API call
-        logger.info(f"Content used for translation: {content}")
-
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {openai_api_key}",
-            },
-            json={
-                "model": "gpt-4-1106-preview",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": content,
-                    },
-                    {"role": "user", "content": f"{text}"},
-                ],
-            },
-        )
+        # Repeated phrases are answered from the cache without an API call, unless earlier turns are sent with
+        # the text: the same phrase can then need a different translation
+        cache_key = None
+        if translation_cache is not None and not (context is not None and context.turns):
+            cache_key = caches.make_key(caches.normalize_text(text), content, backend.translation_model)
+            cached_text = translation_cache.get(cache_key)
+            metrics.inc("cache_lookups_total", cache="translation", result="miss" if cached_text is None else "hit")
+            if cached_text is not None:
+                logger.info(f"Translated text (cached): {cached_text}")
+                if args.stream:
+                    print(Fore.MAGENTA + cached_text + Style.RESET_ALL)
+                if on_token is not None:
+                    on_token(cached_text)
+                if context is not None:
+                    context.add(text, cached_text)
+                return cached_text
+
+        # Recent utterances and their translations, within the token budget of the conversation context
+        history = context.window(text) if context is not None else ()
+
+        if on_token is not None or args.stream:
+            tokens = []
+            start = time.perf_counter()
+            async for token in backend.stream_translation(text, content, history):
+                if not tokens:
+                    first_token_time = time.perf_counter() - start
+                tokens.append(token)
+                if args.stream:
+                    print_token(token)
+                if on_token is not None:
+                    on_token(token)
+            if args.stream:
+                print()  # End the streamed line
+            translated_text = "".join(tokens).strip()
+            if tokens:
+                logger.info(f"First translated word after {first_token_time:.3f}s")
+            logger.info(f"Translated text: {translated_text}")
+            if translated_text and cache_key is not None:
+                translation_cache.put(cache_key, translated_text)
+            if context is not None:
+                context.add(text, translated_text)
+            return translated_text or None
 
-        if response.status_code == 200:
-            response_data = json.loads(response.text)
-            translated_text = response_data["choices"][0]["message"]["content"].strip()
+        try:
+            translated_text = await backend.translate(text, content, history)
+        except backends.BackendError as e:
+            logger.error(Fore.RED + f"Failed to translate text: {e}\n")
+            return None
 
-            # Log and print the successful translation
-            log_message = f"Translated text: {translated_text}"
-            logging.info(log_message)
+        # Log and print the successful translation
+        log_message = f"Translated text: {translated_text}"
+        logger.info(log_message)
+        if translated_text and cache_key is not None:
+            translation_cache.put(cache_key, translated_text)
+        if context is not None:
+            context.add(text, translated_text)
 
-            return translated_text  # If you want to print to the console as well
-        else:
-            logger.error(Fore.RED + f"Failed to translate text: {response.text}\n")
-            return None
+        return translated_text  # If you want to print to the console as well
     except Exception as e:
         logger.error(Fore.RED + f"Translation failed: {e}\n")
         return None
 
 
-def voice_to_text():
-    """
-    Transcribes spoken words from recorded audio data into text. This function first compiles the collected
-    audio frames into a WAV file and then uses the Whisper model from the OpenAI API to transcribe the audio
-    content into textual form.
-
-    The function is designed to be used in applications that require converting spoken language into written
-    text, such as voice-controlled systems or automated transcription services. It plays a crucial role in
-    scenarios where real-time or near-real-time transcription is needed.
-
-    Returns:
-        str: The transcribed text as a string. If the transcription is successful, it returns the text extracted
-             from the audio. In case of failure (e.g., no audio data, API error), it may return an empty string
-             or None, depending on the response from the Whisper model.
-
-    Notes:
-        - The function assumes that the global variable `audio_frames` contains the audio data to be transcribed.
-        - It first writes this audio data to a file named 'WAVE_OUTPUT_FILENAME' in WAV format.
-        - Then, it sends this file to the OpenAI API for transcription.
-        - The success of transcription depends on the clarity of the audio and the capabilities of the Whisper model.
-
-    Example:
-        transcribed_text = voice_to_text()
-        print(transcribed_text)
-    """
-    global audio_frames
-    # Save the recorded audio data to a WAV file
-    wavio.write(WAVE_OUTPUT_FILENAME, audio_frames, RATE, sampwidth=SAMPLE_WIDTH)
-
-    # Transcribe the saved audio file
-    with open(WAVE_OUTPUT_FILENAME, "rb") as f:
-        transcript = client.audio.transcriptions.create(model="whisper-1", file=f)
-        return transcript.text
-
-
-# Global variable to store audio frames
-audio_frames = []
-
-
-def record_audio_continuous():
-    """
-    Initiates continuous audio recording, storing incoming audio frames in memory until the recording is
-    stopped. It relies on the `sounddevice.InputStream` to capture audio in real-time, with a designated
-    callback function that processes and stores each audio frame.
-
-    This function is designed to be part of a larger system that requires real-time audio data capture, such
-    as a speech translation or voice command application. It will record indefinitely until the `is_recording`
-    global variable is explicitly set to False, typically by another part of the application in response to
-    a user command or action.
-
-    Parameters:
-        None
-
-    Returns:
-        bytes: A bytes object that contains all recorded audio frames concatenated together. This object can
-               be written to a file, processed, or streamed further depending on the application's requirements.
-
-    Notes:
-        The recording loop runs on the main thread, with actual audio capture happening on a background thread
-        managed by the `sounddevice` library. The function prints a message to the console indicating it is
-        ready to record and will continue to do so until it is instructed to stop.
-
-    Example:
-        # Begin recording
-        audio_data = record_audio_continuous()
-        # To stop recording, set is_recording to False from another thread or signal handler.
-    """
-    global is_recording
-    print(Fore.GREEN + "Say 'stop' to end recording..." + Style.RESET_ALL)
-    with sd.InputStream(channels=1, samplerate=RATE, callback=record_callback):
-        while is_recording:
-            time.sleep(0.1)
-    return b"".join(audio_frames)
+def translate_text(text, custom_content=None, on_token=None):
+    """Synchronous wrapper around translate_text_async; ``on_token`` is called on the event loop thread."""
+    return engine_loop.run(translate_text_async(text, custom_content, on_token))
 
 
 def record_callback(indata, frames, time, status):
     """
     Callback function for the sounddevice.InputStream that processes incoming audio data.
     This function is called from a separate thread for each audio block captured by the
-    audio input stream. It appends the captured audio frames to a global list if recording
-    is active. It also handles the reporting of any audio stream statuses, such as overflows
+    audio input stream. It copies the captured audio frames into the global ring buffer if
+    recording is active. It also handles the reporting of any audio stream statuses, such as overflows
     or underflows, which are indicators of potential issues with the recording process.
 
     Parameters:
@@ -681,19 +880,195 @@ def record_callback(indata, frames, time, status):
                                             of the audio input stream.
 
     Notes:
-        - The function modifies the global `audio_frames` list, appending new audio data if `is_recording` is True.
+        - The function writes into the preallocated global `audio_ring` if `is_recording` is True, so no memory is
+          allocated per block; frames that do not fit because the consumer fell behind are counted as overruns.
         - Any important `status` flags are printed to the standard error stream to alert of issues like buffer overflows.
         - This callback is designed to operate in the background, and its efficiency is crucial to avoid latency or
           loss of audio data. Therefore, operations within the callback should be kept to a minimum.
     """
 
-    global is_recording, audio_frames
     if is_recording:
-        audio_frames.append(indata.copy())
+        audio_ring.write(indata)
     if status:
         print(status, file=sys.stderr)
 
 
+def capture_audio_chunks(duration, stop_event):
+    """
+    Records back-to-back chunks of audio from a single open input stream and yields each chunk as it completes.
+    Because the stream stays open between chunks, PortAudio keeps buffering while a chunk is being handed off,
+    so no speech is lost between consecutive recordings.
+
+    Args:
+        duration (int): Length of each chunk in seconds.
+        stop_event (threading.Event): Set by the caller to stop recording after the current chunk.
+
+    Yields:
+        numpy.ndarray: The samples of each recorded chunk, in capture order.
+    """
+    print(Fore.GREEN + f"\nRecording continuously in {duration} second chunks...\n" + Style.RESET_ALL)
+    with sd.InputStream(samplerate=RATE, channels=CHANNELS, dtype=FORMAT) as stream:
+        while not stop_event.is_set():
+            with metrics.span("capture", mode="continuous"):
+                audio_data, overflowed = stream.read(int(duration * RATE))
+            if overflowed:
+                metrics.inc("audio_overflows_total")
+                logger.warning(Fore.YELLOW + "Audio input overflowed; some frames were dropped.\n")
+            yield audio_data
+
+
+def capture_utterances(stop_event=None):
+    """
+    Streams audio from the microphone and yields one in-memory audio buffer per spoken utterance. Utterances
+    are delimited by the voice-activity detector in vad.py and bounded by the --vad-min, --vad-max,
+    --vad-silence and --vad-threshold arguments, so no fixed duration is needed.
+
+    Args:
+        stop_event (threading.Event, optional): Set by the caller to stop listening.
+
+    Yields:
+        numpy.ndarray: The samples of each utterance, as soon as its trailing silence is detected.
+    """
+    print(Fore.GREEN + "\nListening... (each utterance is sent when you pause)\n" + Style.RESET_ALL)
+    for audio_data in vad.stream_utterances(
+        RATE,
+        channels=CHANNELS,
+        stop_event=stop_event,
+        energy_threshold=args.vad_threshold,
+        min_duration=args.vad_min,
+        max_duration=args.vad_max,
+        silence_duration=args.vad_silence,
+    ):
+        metrics.observe("utterance_audio_seconds", len(audio_data) / RATE)
+        yield audio_data
+
+
+def save_user_audio(audio_data, session_folder):
+    """
+    Queues a captured int16 audio buffer to be saved as a uniquely named WAV file in the session folder. The
+    write happens on the background audio_writer thread, so the caller never waits on disk I/O; call
+    audio_writer.flush() before relying on the file being present.
+
+    Args:
+        audio_data (numpy.ndarray): The recorded samples.
+        session_folder (str): The session folder the file is saved to.
+
+    Returns:
+        str: The file path the audio will be saved to, or None if saving is disabled with --no-save-audio.
+    """
+    if not args.save_audio:
+        return None
+    filename = f"user_voice_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.wav"
+    filepath = os.path.join(session_folder, filename)
+    audio_writer.save(filepath, audio_data)
+    return filepath
+
+
+async def process_utterance(
+    audio_data, content, session_folder, audio_files, turn, tasks, show=False, transcribed_text=None, audio_path=None
+):
+    """
+    Transcribes, translates and, if a voice is set, speaks one recorded utterance.
+
+    The API calls overlap with those of other utterances in flight; logging the utterance, printing and queuing
+    the AI voice wait for ``turn``, so they still happen in the order the utterances were recorded. The session
+    record (text, stage latencies and audio files) is queued on session_writer, which writes it in the background.
+
+    Args:
+        audio_data (numpy.ndarray): The recorded samples.
+        content (str): The system prompt guiding the translation.
+        session_folder (str): Where the session record and AI voice are saved.
+        audio_files (list): Files created for this session; the AI voice clip is added for cleanup.
+        turn (engine.Turn): This utterance's place in line.
+        tasks (engine.OrderedTasks): Records the per-stage latencies.
+        show (bool, optional): Also print the original and translation as formatted JSON.
+        transcribed_text (str, optional): The transcription, if the utterance has already been transcribed (as by
+                                          the live captions); the audio is then not transcribed again.
+        audio_path (str, optional): The saved recording, referenced in the session record.
+
+    Returns:
+        str: The path of the saved AI voice clip, or None.
+    """
+    metrics.inc("utterances_total")
+    timings = {}
+    if transcribed_text is None:
+        transcribed_text = await tasks.timed("transcribe", transcribe_audio_async(audio_data), timings)
+    if not transcribed_text:
+        metrics.inc("utterances_dropped_total", stage="transcribe")
+        return None
+
+    ai_audio_path = None
+    audio_content = None
+    if args.voice and args.incremental_tts:
+        # Speech starts while translating, held back until earlier utterances have queued theirs
+        translated_text, ai_audio_path = await tasks.timed(
+            "translate",
+            translate_and_speak_async(transcribed_text, content, args.voice, session_folder, turn),
+            timings,
+        )
+    else:
+        translated_text = await tasks.timed("translate", translate_text_async(transcribed_text, content), timings)
+        if args.voice and translated_text:
+            try:
+                audio_content = await tasks.timed(
+                    "speak", synthesize_speech_async(translated_text, args.voice), timings
+                )
+            except Exception as e:
+                logger.error(Fore.RED + f"Failed to speak text: {e}\n")
+
+    await turn.wait()
+    if audio_content:
+        ai_audio_path = save_ai_voice(audio_content, session_folder, tts_key(translated_text, args.voice))
+        play_audio(audio_content, block=False)
+    session_writer.write(
+        session_folder,
+        {
+            "type": "utterance",
+            "original": transcribed_text,
+            "translation": translated_text,
+            "latency": timings,
+            "audio": audio_path and os.path.basename(audio_path),
+            "ai_audio": ai_audio_path and os.path.basename(ai_audio_path),
+        },
+    )
+    if ai_audio_path and ai_audio_path not in audio_files:
+        audio_files.append(ai_audio_path)  # Track AI audio file as well
+    if show:
+        print_json_formatted({"Original": transcribed_text, "Translation": translated_text})
+    turn.done()
+    return ai_audio_path
+
+
+async def continuous_session(content, session_folder, audio_files, stop_event):
+    """
+    The asyncio body of continuous_run_mode: captures chunks until ``stop_event`` is set and processes up to
+    --concurrency of them at once, finishing every captured chunk before it returns.
+    """
+    if args.vad:
+        chunks = capture_utterances(stop_event)
+    else:
+        chunks = capture_audio_chunks(args.duration if args.duration else 20, stop_event)
+
+    tasks = engine.OrderedTasks(args.concurrency, stages=["transcribe", "translate", "speak"])
+    try:
+        async for audio_data in engine.iterate_in_thread(chunks, maxsize=args.queue_size):
+            audio_file_path = save_user_audio(audio_data, session_folder)
+            if audio_file_path:
+                audio_files.append(audio_file_path)  # Add to the list of audio files
+            # Transcribed from memory, the saved copy is written in the background
+            await tasks.submit(
+                lambda turn, audio_data=audio_data, audio_file_path=audio_file_path: process_utterance(
+                    audio_data, content, session_folder, audio_files, turn, tasks, audio_path=audio_file_path
+                )
+            )
+        await tasks.join()
+    except asyncio.CancelledError:
+        tasks.cancel()
+        raise
+    finally:
+        logger.info(Fore.CYAN + "Pipeline stage latencies:\n" + tasks.report() + "\n")
+
+
 def continuous_run_mode(content):
     """
     Initiates the continuous run mode of the real-time translation application. In this mode, the application
@@ -701,15 +1076,16 @@ def continuous_run_mode(content):
     The translations, along with the transcriptions, are stored, and optionally, the application can generate
     and play AI-generated audio of the translated text if a voice has been specified.
 
-    This function is responsible for:
-    - Creating a session folder for the current run to organize the resulting files.
-    - Continuously recording audio based on a predefined or user-specified duration.
-    - Using the transcribe_audio function to convert speech in the audio files to text.
-    - Employing the translate_text function to translate the transcribed text into the desired language,
-      following the guidance of the provided content.
-    - Saving the transcription and translation in the session folder.
-    - If a voice is set, synthesizing the translated text into speech and saving the AI-generated audio.
-    - Tracking all generated files for potential cleanup or preservation based on user preference.
+    The work runs on the asyncio engine (see engine.py) through continuous_session:
+    - capture: Continuously records audio chunks of a predefined or user-specified duration into the session folder.
+    - transcribe: Uses the transcribe_audio_async function to convert speech in the audio to text.
+    - translate: Employs the translate_text_async function to translate the transcribed text into the desired
+      language, following the guidance of the provided content.
+    - speak: Saves the transcription and translation in the session folder and, if a voice is set, synthesizes
+      the translated text into speech and saves the AI-generated audio.
+    Up to --concurrency chunks are processed at once and up to --queue-size more may wait, so the microphone keeps
+    recording while earlier chunks are still being processed, and results are produced in the order they were
+    recorded. Per-stage latency counters are printed on exit to show which stage is the bottleneck.
 
     Args:
         content (str): A custom system prompt or instructions provided to guide the AI translation model. This content
@@ -720,7 +1096,8 @@ def continuous_run_mode(content):
                            gracefully exit the continuous run mode.
 
     Notes:
-        The user can exit continuous run mode by issuing a KeyboardInterrupt (Ctrl+C). Upon exit, the user can decide
+        The user can exit continuous run mode by issuing a KeyboardInterrupt (Ctrl+C). Chunks that were already
+        recorded are finished before exiting; a second Ctrl+C abandons them. Upon exit, the user can decide
         whether to keep or delete the recorded and generated files. If the 'save_recordings' command-line argument is
         set, the function will preserve all files in the session folder; otherwise, it will delete them.
 
@@ -730,29 +1107,23 @@ def continuous_run_mode(content):
     print(Fore.GREEN + "\nContinuous run mode activated.\n" + Style.RESET_ALL)
     session_folder = create_session_folder()
     audio_files = []  # Track all audio files for potential cleanup
+    stop_event = threading.Event()
 
+    session = engine_loop.submit(continuous_session(content, session_folder, audio_files, stop_event))
     try:
-        while True:
-            audio_file_path = record_audio(
-                args.duration, session_folder
-            )  # Modified to pass session_folder
-            audio_files.append(audio_file_path)  # Add to the list of audio files
-            transcribed_text = transcribe_audio(audio_file_path)
-
-            if transcribed_text:
-                translated_text = translate_text(transcribed_text, content)
-                save_transcription(session_folder, transcribed_text, translated_text)
-
-                if args.voice:
-                    # Modified voice_stream function to accept session_folder and save AI audio
-                    ai_audio_path = voice_stream(
-                        translated_text, args.voice, session_folder
-                    )
-                    audio_files.append(ai_audio_path)  # Track AI audio file as well
-
-    except KeyboardInterrupt:
-        print(Fore.RED + "\nExiting continuous run mode." + Style.RESET_ALL)
+        try:
+            session.result()
+        except KeyboardInterrupt:
+            print(Fore.RED + "\nExiting continuous run mode, finishing queued chunks..." + Style.RESET_ALL)
+            stop_event.set()
+            try:
+                session.result()
+            except KeyboardInterrupt:
+                print(Fore.RED + "Abandoning queued chunks." + Style.RESET_ALL)
+                session.cancel()
     finally:
+        audio_writer.flush()  # Make sure background writes have landed before cleanup
+        session_writer.flush(session_folder)
         # Cleanup or save logic for audio files
         if not args.save_recordings:  # Assume a new argument to keep recordings
             for file_path in audio_files:
@@ -772,21 +1143,194 @@ def continuous_run_mode(content):
             )
 
 
+def show_caption(update):
+    """
+    Redraws the caption line: the committed words of the utterance in progress, then the provisional ones dimmed.
+    A final update ends the line, so the next utterance starts on a new one.
+    """
+    width = shutil.get_terminal_size().columns - 1
+    provisional = " ".join(update.provisional)
+    text = f"{update.text} {provisional}".strip()
+    if len(text) > width:  # Keep the end of a long utterance in view
+        text = "…" + text[len(text) - width + 1:]
+    cut = max(0, len(text) - len(provisional))
+    line = Fore.WHITE + text[:cut] + Style.DIM + text[cut:] + Style.RESET_ALL
+    print("\r\x1b[K" + line, end="\n" if update.final else "", flush=True)
+
+
+async def live_session(content, session_folder, audio_files, stop_event):
+    """
+    The asyncio body of live_caption_mode. The record_callback stream fills audio_ring; the utterance in progress
+    is fed to a captions.LiveCaptioner and transcribed every --live-interval seconds, and every finished utterance
+    is translated (and spoken) like in continuous mode, without being transcribed again.
+    """
+    global is_recording
+    captioner = captions.LiveCaptioner(
+        backend.transcribe,
+        RATE,
+        interval=args.live_interval,
+        detector=vad.VoiceActivityDetector(energy_threshold=args.vad_threshold),
+        silence_duration=args.vad_silence,
+        max_duration=args.vad_max,
+        min_duration=args.vad_min,
+    )
+    tasks = engine.OrderedTasks(args.concurrency, stages=["caption", "translate", "speak"])
+    audio_ring.clear()
+    overruns = audio_ring.overruns
+    is_recording = True
+    try:
+        with sd.InputStream(samplerate=RATE, channels=CHANNELS, dtype=FORMAT, callback=record_callback):
+            while True:
+                stopping = stop_event.is_set()
+                # Feed the frames recorded so far straight from the ring; the callback keeps writing behind them
+                views = audio_ring.views()
+                for view in views:
+                    captioner.feed(view)
+                audio_ring.consume(sum(len(view) for view in views))
+                if audio_ring.overruns != overruns:
+                    metrics.inc("audio_overflows_total", audio_ring.overruns - overruns)
+                    logger.warning(Fore.YELLOW + "Audio buffer overran; some frames were dropped.\n")
+                    overruns = audio_ring.overruns
+                start = time.perf_counter()
+                update = await (captioner.flush() if stopping else captioner.step())
+                if update is None:
+                    if stopping:
+                        break
+                    await asyncio.sleep(0.05)
+                    continue
+                tasks.stats["caption"].record(time.perf_counter() - start)
+                show_caption(update)
+                if update.final and update.text:
+                    audio_file_path = save_user_audio(update.audio, session_folder)
+                    if audio_file_path:
+                        audio_files.append(audio_file_path)
+                    await tasks.submit(
+                        lambda turn, update=update, audio_file_path=audio_file_path: process_utterance(
+                            update.audio, content, session_folder, audio_files, turn, tasks,
+                            transcribed_text=update.text, audio_path=audio_file_path,
+                        )
+                    )
+                if stopping:
+                    break
+        await tasks.join()
+    except asyncio.CancelledError:
+        tasks.cancel()
+        raise
+    finally:
+        is_recording = False
+        logger.info(Fore.CYAN + "Pipeline stage latencies:\n" + tasks.report() + "\n" + audio_ring.report())
+
+
+def live_caption_mode(content):
+    """
+    Runs the live caption mode (--live): captions appear while you speak, and each utterance is translated, and
+    spoken if a voice is set, once you pause. Press Ctrl+C to stop; the utterance in progress and those being
+    translated are finished first, a second Ctrl+C abandons them.
+
+    Args:
+        content (str): The system prompt guiding the translation.
+    """
+    print(Fore.GREEN + "\nLive captions activated. Press Ctrl+C to stop.\n" + Style.RESET_ALL)
+    session_folder = create_session_folder()
+    audio_files = []
+    stop_event = threading.Event()
+
+    session = engine_loop.submit(live_session(content, session_folder, audio_files, stop_event))
+    try:
+        session.result()
+    except KeyboardInterrupt:
+        print(Fore.RED + "\nExiting live captions, finishing the last utterances..." + Style.RESET_ALL)
+        stop_event.set()
+        try:
+            session.result()
+        except KeyboardInterrupt:
+            print(Fore.RED + "Abandoning the last utterances." + Style.RESET_ALL)
+            session.cancel()
+    finally:
+        audio_writer.flush()
+        session_writer.flush(session_folder)
+        print(Fore.GREEN + f"The session is saved in {session_folder}." + Style.RESET_ALL)
+
+
+def record_utterance():
+    """Listens until one utterance has been spoken (see capture_utterances) and returns its samples."""
+    with contextlib.closing(capture_utterances()) as utterances:
+        return next(utterances)
+
+
+async def single_session(content, session_folder, audio_files):
+    """
+    The asyncio body of single_run_mode. Keys are read without blocking the loop, so 'r' and 's' respond while a
+    translation is in flight, and a new recording can start while earlier ones are still being processed.
+    """
+    tasks = engine.OrderedTasks(args.concurrency, stages=["transcribe", "translate", "speak"])
+    last_ai_audio_path = None  # Keep track of the last AI audio file
+    recording = None
+
+    async def handle(audio_data, audio_file_path, turn):
+        nonlocal last_ai_audio_path
+        ai_audio_path = await process_utterance(
+            audio_data, content, session_folder, audio_files, turn, tasks, show=True, audio_path=audio_file_path
+        )
+        if ai_audio_path:
+            last_ai_audio_path = ai_audio_path  # Update last AI audio path
+
+    async def record():
+        if args.vad:
+            # Record a single utterance, stopping as soon as the speaker pauses
+            audio_data = await asyncio.to_thread(record_utterance)
+        else:
+            audio_data = await asyncio.to_thread(record_audio_buffer, args.duration if args.duration else 20)
+        audio_file_path = save_user_audio(audio_data, session_folder)
+        if audio_file_path:
+            audio_files.append(audio_file_path)
+        await tasks.submit(lambda turn: handle(audio_data, audio_file_path, turn))
+
+    try:
+        while True:
+            user_input = await engine.read_key(readchar.readkey)
+            if user_input == " ":
+                if recording is not None and not recording.done():
+                    print(Fore.YELLOW + "Already recording." + Style.RESET_ALL)
+                    continue
+                recording = asyncio.create_task(record())
+
+            elif user_input.lower() == "r":  # Replay last translation
+                if last_ai_audio_path:
+                    play_audio(file_path=last_ai_audio_path, block=False)
+
+            elif user_input.lower() == "s":  # Stop playback
+                audio_player.cancel()
+
+            elif user_input.lower() == "exit" or user_input == engine.CTRL_C:
+                break
+
+        # Let the recording and the utterances in flight finish before the session ends
+        if recording is not None:
+            await recording
+        await tasks.join()
+    except asyncio.CancelledError:
+        tasks.cancel()
+        raise
+    finally:
+        logger.info(Fore.CYAN + "Stage latencies:\n" + tasks.report() + "\n")
+
+
 def single_run_mode(content):
     """
     Executes the single-run mode of the real-time translation tool. In this mode, the user manually initiates
     audio recording and translation operations. The function handles recording, transcription, translation,
     and audio playback, including an option to replay the last translation or continue to the next recording.
 
-    The single_run_mode orchestrates the following steps:
+    The single_run_mode orchestrates the following steps (see single_session, which runs them on the asyncio engine):
     - Creates a session folder for organizing audio and transcription files.
     - Waits for user input to start audio recording (space bar), replay the last translation ('r'), or exit the application ('exit').
     - Records audio for a duration specified by command-line arguments or defaults to 20 seconds.
-    - Utilizes the transcribe_audio function to convert the audio to text.
-    - Employs the translate_text function to translate the transcription, using the provided content as guidance.
+    - Utilizes the transcribe_audio_async function to convert the audio to text.
+    - Employs the translate_text_async function to translate the transcription, using the provided content as guidance.
     - Saves both the original transcription and the translated text within the session folder.
-    - If a text-to-speech voice is specified, invokes the voice_stream function to synthesize and play the translation.
-    - Offers the option to replay the last AI voice translation by pressing 'r'.
+    - If a text-to-speech voice is specified, synthesizes and plays the translation.
+    - Offers the option to replay the last AI voice translation by pressing 'r', and to stop playback with 's'.
     - Formats and displays the transcription and translation in JSON format.
     - Upon completion, prompts the user to delete or keep the session files.
 
@@ -794,57 +1338,24 @@ def single_run_mode(content):
         content (str): Custom content or system prompt used for guiding the translation model.
 
     Notes:
-        The function maintains the path of the last AI-generated audio file to enable replay functionality.
-        It responds to user inputs for controlling the flow of recording and translation.
+        Keys stay responsive while a recording is being transcribed and translated; up to --concurrency recordings
+        are processed at once and their results are shown in recording order.
     """
     session_folder = create_session_folder()  # Create a session folder
     audio_files = []  # Keep track of recorded audio files
-    last_ai_audio_path = None  # Keep track of the last AI audio file
 
     print(
         Fore.GREEN
-        + "Press the space bar to start recording, 'r' to replay the last translation, or 'exit' to quit:"
+        + "Press the space bar to start recording, 'r' to replay the last translation, 's' to stop playback, or 'exit' to quit:"
         + Style.RESET_ALL
     )
 
-    while True:
-        try:
-            user_input = readchar.readkey()
-            if user_input == " ":
-                audio_file_path = record_audio(
-                    args.duration if args.duration else 20, session_folder
-                )
-                audio_files.append(audio_file_path)
-                transcribed_text = transcribe_audio(audio_file_path)
-
-                if transcribed_text:
-                    translated_text = translate_text(transcribed_text, content)
-                    save_transcription(
-                        session_folder, transcribed_text, translated_text
-                    )
-
-                    if args.voice:
-                        ai_audio_path = voice_stream(
-                            translated_text, args.voice, session_folder
-                        )
-                        audio_files.append(
-                            ai_audio_path
-                        )  # Save AI audio path for cleanup
-                        last_ai_audio_path = ai_audio_path  # Update last AI audio path
-
-                    print_json_formatted(
-                        {"Original": transcribed_text, "Translation": translated_text}
-                    )
-
-            elif user_input.lower() == "r":  # Replay last translation
-                if last_ai_audio_path:
-                    play_audio(file_path=last_ai_audio_path)
-
-            elif user_input.lower() == "exit":
-                break
-
-        except KeyboardInterrupt:
-            break
+    try:
+        engine_loop.run(single_session(content, session_folder, audio_files))
+    except KeyboardInterrupt:
+        pass
+    audio_writer.flush()  # Make sure background writes have landed, whether the files are kept or deleted
+    session_writer.flush(session_folder)
 
     # At the end of the session, decide whether to delete or keep the files
     if (
@@ -866,10 +1377,36 @@ def single_run_mode(content):
         )
 
 
-# Note: Ensure the record_audio and voice_stream functions are adapted to save files to session_folder
+def batch_file_mode(content):
+    """
+    Transcribes and translates recorded audio files offline. The -f argument accepts files, directories and glob
+    patterns; the files are processed by a pool of --workers threads (the work is API-bound, so threads suffice)
+    and every result is appended to the --manifest file as soon as it completes. Files already completed in the
+    manifest are skipped, so an interrupted run can be resumed by running the same command again. Throughput is
+    reported in audio-seconds per wall-second.
+
+    Args:
+        content (str): Custom content or system prompt used for guiding the translation model.
+    """
+    files = batch.expand_inputs(args.file)
+    if not files:
+        print(Fore.RED + f"No audio files found in {' '.join(args.file)}." + Style.RESET_ALL)
+        sys.exit(1)
+    print(Fore.GREEN + f"\nProcessing {len(files)} file(s) with {args.workers} workers...\n" + Style.RESET_ALL)
+
+    def process(audio_file_path):
+        transcribed_text = transcribe_audio(audio_file_path)
+        if not transcribed_text:
+            raise RuntimeError("Transcription failed")
+        translated_text = translate_text(transcribed_text, content)
+        if translated_text is None:
+            raise RuntimeError("Translation failed")
+        return {"transcription": transcribed_text, "translation": translated_text}
+
+    batch.run_batch(files, process, args.manifest, workers=args.workers)
 
 
-def main():
+def main(argv=None):
     """
     This function acts as the entry point of the program. It facilitates real-time audio translation by prompting the user to select a translation language and operates in either continuous run mode or single run mode, influenced by command line arguments.
 
@@ -890,15 +1427,20 @@ def main():
     - These prompts delegate the language of translation chosen by the user, aligning the translate function with the user's choice for a seamless experience.
     - When the '-c' argument is used, the placeholders in DEFAULT_CONTENT are replaced with the user's chosen language and a corresponding phrase.
     - SPECIAL_CONTENT maps directly to the "Smart Select" option in the drop-down list, triggered after '-c' is called.
+    - Unless --context-tokens is 0, the compact versions of these prompts are sent instead, built once for the session,
+      together with the most recent utterances and their translations (see conversation.py).
 
     Example Usage:
     main()
     """
+    global context
+
+    configure(argv)
     print(
         Fore.GREEN + "\nWelcome to the real-time translation tool.\n" + Style.RESET_ALL
     )
 
-    content = DEFAULT_CONTENT  # Set the default content
+    language = None  # The generic default content
 
     # Present a numbered list of languages if -c is used without a value or with an invalid value
     if (args.content is None) or (
@@ -915,22 +1457,7 @@ def main():
                 int(input("Enter the number of your language or 'Smart Select': ")) - 1
             )
             if 0 <= choice_index < len(language_options):
-                chosen_language = language_options[choice_index]
-                if chosen_language == "Smart Select":
-                    content = SPECIAL_CONTENT
-                else:
-                    selected_language = language_map[chosen_language]
-                    content = DEFAULT_CONTENT.replace(
-                        "[Desired Language]", chosen_language
-                    )
-                    content = content.replace(
-                        "[Name of desired language in that language]",
-                        selected_language[0],
-                    )
-                    content = content.replace(
-                        "[Phrase in desired language in that language's text if possible]",
-                        selected_language[1],
-                    )
+                language = language_options[choice_index]
             else:
                 print("Invalid choice. Exiting.")
                 sys.exit(1)  # Exit if the choice is invalid
@@ -940,21 +1467,37 @@ def main():
 
     # If -c is used with a valid language directly
     elif args.content in language_map:
-        selected_language = language_map[args.content]
-        content = DEFAULT_CONTENT.replace("[Desired Language]", args.content)
-        content = content.replace(
-            "[Name of desired language in that language]", selected_language[0]
-        )
-        content = content.replace(
-            "[Phrase in desired language in that language's text if possible]",
-            selected_language[1],
-        )
+        language = args.content
 
-    if args.continuous:
+    content = build_content(language)
+    if args.context_tokens > 0:
+        # The compact prompt is built once for the session; batch files are unrelated, so they share no history
+        context = conversation.ConversationContext.for_language(
+            language, budget=args.context_tokens, max_turns=0 if args.file else args.context_turns
+        )
+        content = context.content
+    logger.debug(f"System prompt for translation: {content}")  # Logged once, not with every translation
+
+    if args.file:
+        batch_file_mode(content)
+    elif args.live:
+        live_caption_mode(content)
+    elif args.continuous:
         continuous_run_mode(content)
     else:
         single_run_mode(content)
 
+    for cache in (transcription_cache, translation_cache, tts_cache):
+        if cache is not None:
+            logger.info(Fore.CYAN + cache.report() + Style.RESET_ALL)
+    if context is not None:
+        logger.info(Fore.CYAN + context.report() + Style.RESET_ALL)
+    if isinstance(backend, batching.BatchingBackend):
+        logger.info(Fore.CYAN + backend.summary() + Style.RESET_ALL)
+    audio_writer.flush()  # The writer's thread is a daemon; queued recordings would be lost at exit
+    session_writer.close()
+    metrics.close()
+
 
 if __name__ == "__main__":
     main()
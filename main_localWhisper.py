@@ -1,8 +1,8 @@
 # main_LocalWhisper.py
+import functools
 import os
 import yaml
 import whisper
-import requests
 import json
 import sys
 import wavio
@@ -12,9 +12,13 @@ import warnings
 import sounddevice as sd
 from scipy.io.wavfile import write
 from pydub import AudioSegment
-from pydub.silence import split_on_silence
 from colorama import Fore, Style, init
-from tqdm import tqdm
+
+import batch
+import caches
+import long_audio
+import transport
+import whisper_models
 
 # Initialize colorama
 init(autoreset=True)
@@ -39,12 +43,62 @@ parser.add_argument(
     "-f",
     "--file",
     type=str,
-    help="Path to an existing audio file to transcribe and translate",
+    nargs="+",
+    help="Audio files, directories or glob patterns to transcribe and translate; more than one file runs a batch",
+)
+parser.add_argument(
+    "-m",
+    "--model",
+    type=str,
+    choices=whisper.available_models(),
+    default=whisper_models.DEFAULT_MODEL,
+    help="Local Whisper model size to transcribe with",
+)
+parser.add_argument(
+    "--preload",
+    action="store_true",
+    help="Load the Whisper model in the background while recording",
+)
+parser.add_argument(
+    "-w",
+    "--workers",
+    type=int,
+    default=max(1, (os.cpu_count() or 2) // 2),
+    help="Worker processes for batch transcription",
+)
+parser.add_argument(
+    "-l",
+    "--long",
+    action="store_true",
+    help="Split long audio on silence and transcribe the chunks in parallel (uses -w workers)",
+)
+parser.add_argument(
+    "--max-chunk",
+    type=float,
+    default=long_audio.DEFAULT_MAX_CHUNK,
+    help="Maximum chunk length in seconds for --long",
+)
+parser.add_argument(
+    "--manifest",
+    type=str,
+    default="batch_manifest.jsonl",
+    help="JSONL or CSV manifest for batch results; completed files in it are skipped on the next run",
+)
+parser.add_argument(
+    "--cache",
+    choices=["off", "disk"],
+    default="disk",
+    help="Reuse transcriptions of audio that was transcribed before with the same model (default: disk)",
 )
-args = parser.parse_args()
 
-# Use the provided duration or default to 5 seconds if none is provided
-duration = args.duration if args.duration else 5
+# Set up by configure() when the program starts, not on import
+args = None
+duration = 5
+openai_api_key = None
+transport_config = None
+http_client = None
+transcription_cache_path = None
+transcription_cache_bytes = None
 
 
 # Load configuration
@@ -59,8 +113,38 @@ def load_config():
         return yaml.safe_load(file)
 
 
-config = load_config()
-openai_api_key = config["openai"]["api_key"]
+def configure(argv=None):
+    """
+    Parses the command line, loads config.yaml and opens the HTTP client. The transcription cache is only located
+    here; it is opened on first use (see transcription_store), so that batch workers open their own connections.
+    """
+    global args, duration, openai_api_key, transport_config, http_client
+    global transcription_cache_path, transcription_cache_bytes
+
+    args = parser.parse_args(argv)
+    # Use the provided duration or default to 5 seconds if none is provided
+    duration = args.duration if args.duration else 5
+
+    config = load_config()
+    openai_api_key = config["openai"]["api_key"]
+    transport_config = transport.transport_settings(config)
+    http_client = transport.create_http_client(**transport_config)  # Reuses connections across translations
+
+    # Transcriptions are keyed by a hash of the decoded audio, so a file that was already transcribed by the same
+    # model is not run through Whisper again
+    cache_config = config.get("cache") or {}
+    transcription_cache_path = os.path.join(
+        os.path.expanduser(cache_config.get("dir") or caches.DEFAULT_CACHE_DIR), "local_transcriptions.sqlite3"
+    )
+    transcription_cache_bytes = int(cache_config.get("transcription_disk_mb", 32)) * 1024 * 1024
+    return args
+
+
+def transcription_store():
+    """Returns this process's on-disk transcription cache, or None unless --cache disk is set."""
+    if args.cache != "disk":
+        return None
+    return whisper_models.open_store(transcription_cache_path, transcription_cache_bytes)
 
 
 def record_audio():
@@ -84,18 +168,54 @@ def record_audio():
 # record_audio(duration=record_audio_duration, filename=record_audio_filename)
 
 
-def transcribe_audio(audio_file_path):
+def transcribe_audio(audio_file_path, model_size=None):
     """
     Transcribes audio from a file using Whisper.
+
+    The model is taken from the process-wide registry in whisper_models, so it is loaded from disk only on the
+    first call. Load time and inference time are reported separately.
+
+    With --long, the audio is split on silence into chunks of at most --max-chunk seconds, which are transcribed in
+    parallel worker processes and stitched back together in order; the timestamped transcript is printed.
+
+    Unless --cache is off, audio that was transcribed before with the same model and mode is answered from the
+    on-disk transcription cache.
     """
+    model_size = model_size or args.model
+    cache_key = None
+    store = transcription_store()
     try:
-        model = whisper.load_model("small")
-        result = model.transcribe(audio_file_path)
-        return result["text"]
+        if store is not None:
+            options = ("long", args.max_chunk) if args.long else ()
+            cache_key = whisper_models.transcription_key(audio_file_path, model_size, *options)
+            cached_text = store.get(cache_key)
+            if cached_text is not None:
+                print(f"{Fore.CYAN}Transcription cache hit for model '{model_size}'{Style.RESET_ALL}")
+                return cached_text
+
+        if args.long:
+            segments = long_audio.transcribe_long(
+                audio_file_path, model_size, workers=args.workers, max_chunk=args.max_chunk
+            )
+            print(long_audio.format_transcript(segments))
+            text = " ".join(text for _, _, text in segments)
+        else:
+            result, load_seconds, inference_seconds = whisper_models.transcribe(
+                audio_file_path, model_size
+            )
+            print(
+                f"{Fore.CYAN}Model '{model_size}' load: {load_seconds:.2f}s, "
+                f"inference: {inference_seconds:.2f}s{Style.RESET_ALL}"
+            )
+            text = result["text"]
     except Exception as e:
         print(f"Transcription failed: {e}")
         return None
 
+    if cache_key is not None and text:
+        store.put(cache_key, text)
+    return text
+
 
 def translate_text(text, openai_api_key):
     """
@@ -120,8 +240,8 @@ def translate_text(text, openai_api_key):
     translation_prompt = f"[{source_language} to {target_language} translation]: {text}"
 
     # Prepare the API request
-    response = requests.post(
-        "https://api.openai.com/v1/chat/completions",
+    response = http_client.post(
+        transport.chat_completion_url(transport_config["base_url"]),
         headers={
             "Content-Type": "application/json",
             "Authorization": f"Bearer {openai_api_key}",
@@ -148,18 +268,58 @@ def translate_text(text, openai_api_key):
         return None
 
 
-def main():
+def run_batch_mode(files):
+    """
+    Transcribes many files in parallel worker processes, each holding its own resident Whisper model, and
+    translates the results in the parent process as they arrive. Results are appended to the manifest and
+    files already completed in it are skipped.
+    """
+    torch_threads = (os.cpu_count() or 1) // max(1, args.workers)
+
+    def translate(record):
+        translated_text = translate_text(record["transcription"], openai_api_key)
+        if translated_text is None:
+            raise RuntimeError("Translation failed")
+        return {"translation": translated_text}
+
+    batch.run_batch(
+        files,
+        functools.partial(
+            whisper_models.transcribe_file,
+            size=args.model,
+            cache_path=transcription_cache_path if args.cache == "disk" else None,
+            cache_bytes=transcription_cache_bytes,
+        ),
+        args.manifest,
+        workers=args.workers,
+        use_processes=True,
+        finalize=translate,
+        initializer=whisper_models.init_worker,
+        initargs=(torch_threads,),
+    )
+
+
+def main(argv=None):
     """
     The main function is the entry point of the program. It prints a welcome message and checks if a file path is provided. If a file path is provided, it checks if the file exists. If the file does not exist, it prints an error message and exits the program. If a file path is not provided, it records new audio and gets the file path. It then transcribes the audio, translates the transcribed text using the OpenAI API, and prints the translated text. If the transcription fails, it prints an error message. The function handles keyboard interrupts and exits the program gracefully.
     """
+    configure(argv)
     print(Fore.YELLOW + Style.BRIGHT + "Welcome to the real-time translation tool.")
 
+    if args.preload:
+        # Warm the model up while the user is still recording
+        whisper_models.preload(args.model)
+
     # Check if a file path is provided
     if args.file:
-        audio_file_path = args.file
-        if not os.path.isfile(audio_file_path):
-            print(f"The file {audio_file_path} does not exist.")
+        files = batch.expand_inputs(args.file)
+        if not files:
+            print(f"No audio files found in {' '.join(args.file)}.")
             sys.exit(1)
+        if len(files) > 1 or not os.path.isfile(args.file[0]):
+            run_batch_mode(files)
+            return
+        audio_file_path = files[0]
     else:
         # Record new audio and get the file path
         audio_file_path = record_audio()
@@ -0,0 +1,323 @@
+# metrics.py
+"""
+Counters, histograms and spans for the hot path, exported as Prometheus text or as a JSONL file.
+
+Metrics are off until ``configure`` is called. While they are off every call returns after a single check (spans
+are one shared no-op object), so the instrumentation can stay in the hot path.
+
+    metrics.configure(port=9464)                          # serve http://127.0.0.1:9464/metrics
+    metrics.configure(jsonl_path="metrics.jsonl")         # append one line per span, and totals on close
+
+    with metrics.span("transcribe"):                      # also works around awaits
+        text = await backend.transcribe(audio)
+    metrics.inc("cache_hits_total", cache="translation")
+    metrics.observe("upload_bytes", len(upload), buckets=metrics.SIZE_BUCKETS)
+
+A span records its duration in the ``stage_seconds`` histogram and counts exceptions that escape it in
+``stage_errors_total``, both labelled with the stage name.
+"""
+import atexit
+import json
+import logging
+import math
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "livetranslation_"
+# Seconds; from a cache hit to a stuck API call
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Bytes; from a short Opus upload to a long WAV clip
+SIZE_BUCKETS = (1e3, 4e3, 16e3, 64e3, 256e3, 1e6, 4e6, 16e6)
+
+_registry = None
+_exporters = []
+
+
+class Histogram:
+    """Cumulative bucket counts plus the sum and count of observed values, as Prometheus expects."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # the last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    """Thread-safe storage for counters, gauges and histograms, keyed by name and label set."""
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount, labels):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, name, value, labels):
+        with self._lock:
+            self.gauges[(name, labels)] = value
+
+    def observe(self, name, value, labels, buckets):
+        key = (name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def render_prometheus(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted({name for name, _ in metrics}):
+                    lines.append(f"# TYPE {PREFIX}{name} {kind}")
+                    for (metric, labels), value in sorted(metrics.items()):
+                        if metric == name:
+                            lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value:g}")
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for (metric, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if metric != name:
+                        continue
+                    for bound, total in histogram.cumulative():
+                        le = "+Inf" if bound == math.inf else f"{bound:g}"
+                        lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels + (('le', le),))} {total}")
+                    lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {histogram.sum:g}")
+                    lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Returns the current values as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "counters": [_entry(name, labels, value=value) for (name, labels), value in self.counters.items()],
+                "gauges": [_entry(name, labels, value=value) for (name, labels), value in self.gauges.items()],
+                "histograms": [
+                    _entry(
+                        name,
+                        labels,
+                        count=histogram.count,
+                        sum=round(histogram.sum, 6),
+                        buckets={f"{bound:g}": count for bound, count in zip(histogram.buckets + (math.inf,), histogram.counts)},
+                    )
+                    for (name, labels), histogram in self.histograms.items()
+                ],
+            }
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+def _entry(name, labels, **values):
+    return {"name": name, "labels": dict(labels), **values}
+
+
+class JSONLExporter:
+    """
+    Appends one JSON line per finished span to a file from a background thread, and the totals on close.
+
+    Args:
+        path (str): The file; lines are appended, so several runs can share it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="metrics-jsonl", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        with open(self.path, "a", encoding="utf-8") as file:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                if self._queue.empty():
+                    file.flush()
+
+    def span(self, name, start, seconds, labels, error):
+        record = {"type": "span", "span": name, "start": round(start, 6), "seconds": round(seconds, 6)}
+        if labels:
+            record["labels"] = dict(labels)
+        if error:
+            record["error"] = error
+        self._queue.put(record)
+
+    def close(self, registry):
+        self._queue.put({"type": "totals", "time": time.time(), **registry.snapshot()})
+        self._queue.put(None)
+        self._thread.join()
+
+
+class PrometheusExporter:
+    """
+    Serves the registry at ``/metrics`` in the Prometheus text format from a background thread.
+
+    Args:
+        registry (Registry): The metrics to serve.
+        port (int): The port; 0 picks a free one (see ``port`` afterwards).
+        host (str, optional): The interface to listen on.
+    """
+
+    def __init__(self, registry, port, host="127.0.0.1"):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # scrapes would otherwise flood the console
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+
+    def span(self, name, start, seconds, labels, error):
+        pass  # spans reach Prometheus through the stage_seconds histogram
+
+    def close(self, registry):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class Span:
+    """Times a block; use ``metrics.span`` rather than creating one directly."""
+
+    __slots__ = ("name", "labels", "_start", "_wall")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self._wall = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        seconds = time.perf_counter() - self._start
+        registry = _registry
+        if registry is None:
+            return False
+        labels = (("stage", self.name),) + self.labels
+        registry.observe("stage_seconds", seconds, labels, LATENCY_BUCKETS)
+        error = None
+        if exc_type is not None:
+            error = exc_type.__name__
+            registry.inc("stage_errors_total", 1, labels + (("error", error),))
+        for exporter in _exporters:
+            exporter.span(self.name, self._wall, seconds, self.labels, error)
+        return False
+
+
+class _NoOpSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NOOP_SPAN = _NoOpSpan()
+
+
+def enabled():
+    return _registry is not None
+
+
+def span(name, **labels):
+    """Returns a context manager that times the block as stage ``name``; a shared no-op when metrics are off."""
+    if _registry is None:
+        return _NOOP_SPAN
+    return Span(name, tuple(sorted(labels.items())))
+
+
+def inc(name, amount=1, **labels):
+    """Adds ``amount`` to a counter."""
+    if _registry is not None:
+        _registry.inc(name, amount, tuple(sorted(labels.items())))
+
+
+def set_gauge(name, value, **labels):
+    if _registry is not None:
+        _registry.set(name, value, tuple(sorted(labels.items())))
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    """Records a value in a histogram; ``buckets`` applies when the histogram is first used."""
+    if _registry is not None:
+        _registry.observe(name, value, tuple(sorted(labels.items())), buckets)
+
+
+def configure(port=None, jsonl_path=None, host="127.0.0.1"):
+    """
+    Turns metrics on and starts the requested exporters. Without a port or a path metrics stay off. The exporters
+    are closed at interpreter exit if ``close`` has not been called by then.
+
+    Args:
+        port (int, optional): Serve Prometheus text at http://host:port/metrics.
+        jsonl_path (str, optional): Append span records and, on close, the totals to this file.
+        host (str, optional): Interface for the Prometheus endpoint.
+
+    Returns:
+        Registry: The registry, or None if metrics stay off.
+    """
+    global _registry
+    if port is None and not jsonl_path:
+        return None
+    registry = Registry()
+    if port is not None:
+        exporter = PrometheusExporter(registry, port, host)
+        _exporters.append(exporter)
+        logger.info(f"Metrics at http://{host}:{exporter.port}/metrics")
+    if jsonl_path:
+        _exporters.append(JSONLExporter(jsonl_path))
+    _registry = registry
+    atexit.register(close)
+    return registry
+
+
+def close():
+    """Stops the exporters (the JSONL file receives the totals) and turns metrics off."""
+    global _registry
+    registry, _registry = _registry, None
+    while _exporters:
+        _exporters.pop().close(registry)
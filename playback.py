@@ -0,0 +1,348 @@
+# playback.py
+"""
+Ordered, incremental speech playback.
+
+``AudioPlayer`` is a long-lived playback engine: clips are enqueued without blocking and played one after another
+through a sink. ``SoundDeviceSink`` decodes each clip once and writes PCM to a single open ``sd.OutputStream``, so
+no player process is spawned per clip; ``FFplaySink`` keeps the previous ffplay behaviour and ``NullSink`` lets
+the pipeline run headless.
+
+``SentenceSpeaker`` splits a translation into sentences while it is still being generated and synthesizes them
+concurrently. Every clip is queued on the player in sentence order, so the first sentence starts playing while
+later ones are still being synthesized.
+"""
+import io
+import logging
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+import wave
+from concurrent.futures import Future
+
+import numpy as np
+import sounddevice as sd
+from colorama import Fore
+from pydub import AudioSegment
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_RATE = 24000  # the rate OpenAI text-to-speech produces; other clips are resampled to it
+OUTPUT_CHANNELS = 1
+BLOCK_MS = 50  # granularity at which a playing clip can be skipped
+
+# A sentence ends at terminal punctuation (plus closing quotes or brackets) followed by whitespace. CJK full-width
+# punctuation is not followed by a space, so it ends a sentence on its own.
+_SENTENCE_END = re.compile(r"[.!?…]+[\"'”’)\]]*\s+|[。！？]+")
+DEFAULT_MIN_SENTENCE_CHARS = 20  # shorter fragments are merged with the next sentence to avoid tiny TTS requests
+
+
+class SentenceSplitter:
+    """
+    Incrementally splits streamed text into sentences.
+
+    Args:
+        min_chars (int, optional): Minimum length of an emitted sentence; shorter ones are merged with the next.
+    """
+
+    def __init__(self, min_chars=DEFAULT_MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text):
+        """Adds text and returns the list of sentences it completed."""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.end()].strip()
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self):
+        """Returns whatever text is left over (or None) and resets the splitter."""
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return rest or None
+
+
+def decode_audio(clip, rate=OUTPUT_RATE, channels=OUTPUT_CHANNELS):
+    """
+    Decodes a clip to int16 PCM at the given rate and channel count.
+
+    Args:
+        clip (bytes | str): Encoded audio bytes or the path to an audio file.
+        rate (int, optional): The sample rate to decode to.
+        channels (int, optional): The number of channels to decode to.
+
+    Returns:
+        numpy.ndarray: The samples, shaped (n, channels).
+    """
+    if isinstance(clip, (bytes, bytearray)) and clip[:4] == b"RIFF":
+        # 16-bit WAV in the output format (what the TTS request asks for) needs no ffmpeg round-trip
+        with wave.open(io.BytesIO(clip), "rb") as wav_file:
+            if (wav_file.getframerate(), wav_file.getnchannels(), wav_file.getsampwidth()) == (rate, channels, 2):
+                frames = wav_file.readframes(wav_file.getnframes())
+                return np.frombuffer(frames, dtype=np.int16).reshape(-1, channels)
+    source = clip if isinstance(clip, (str, os.PathLike)) else io.BytesIO(clip)
+    segment = AudioSegment.from_file(source).set_frame_rate(rate).set_channels(channels).set_sample_width(2)
+    return np.frombuffer(segment.raw_data, dtype=np.int16).reshape(-1, channels)
+
+
+class SoundDeviceSink:
+    """
+    Plays clips through one sounddevice OutputStream that stays open for the whole session.
+
+    Args:
+        rate (int, optional): Output sample rate; every clip is decoded to it.
+        channels (int, optional): Output channel count.
+    """
+
+    def __init__(self, rate=OUTPUT_RATE, channels=OUTPUT_CHANNELS):
+        self.rate = rate
+        self.channels = channels
+        self._stream = None
+
+    def play(self, clip, stop_event):
+        samples = decode_audio(clip, self.rate, self.channels)
+        if self._stream is None:
+            self._stream = sd.OutputStream(samplerate=self.rate, channels=self.channels, dtype="int16")
+            self._stream.start()
+        block = int(self.rate * BLOCK_MS / 1000)
+        for start in range(0, len(samples), block):
+            if stop_event.is_set():
+                # Drop whatever is still buffered so the skip is immediate
+                self._stream.abort()
+                self._stream.start()
+                return
+            self._stream.write(samples[start:start + block])
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+
+class FFplaySink:
+    """Plays each clip with a separate 'ffplay' process, as the tool originally did."""
+
+    def play(self, clip, stop_event):
+        cmd = ["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet"]
+        from_file = isinstance(clip, (str, os.PathLike))
+        cmd.append(os.fspath(clip) if from_file else "-")
+        ffplay_proc = subprocess.Popen(
+            cmd,
+            stdin=None if from_file else subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.STDOUT,
+        )
+        if not from_file:
+            # Write the audio content to ffplay's stdin if it's from bytes
+            ffplay_proc.stdin.write(clip)
+            ffplay_proc.stdin.close()
+        while ffplay_proc.poll() is None:
+            if stop_event.is_set():
+                ffplay_proc.terminate()
+            time.sleep(BLOCK_MS / 1000)
+
+    def close(self):
+        pass
+
+
+class NullSink:
+    """Discards audio instead of playing it, for headless runs and tests. Played clips are kept in ``played``."""
+
+    def __init__(self):
+        self.played = []
+
+    def play(self, clip, stop_event):
+        self.played.append(clip)
+
+    def close(self):
+        pass
+
+
+SINKS = {"sounddevice": SoundDeviceSink, "ffplay": FFplaySink, "null": NullSink}
+
+
+class AudioPlayer:
+    """
+    A single long-lived playback engine fed by a queue of clips.
+
+    Clips are played strictly in the order they are enqueued. A clip may be encoded audio bytes, a file path, or a
+    Future that resolves to bytes, so synthesis can still be running when the clip is queued; the player waits for
+    it when its turn comes.
+
+    Args:
+        sink: Where the audio goes, e.g. SoundDeviceSink(), FFplaySink() or NullSink().
+
+    Example:
+        player = AudioPlayer(SoundDeviceSink())
+        done = player.enqueue(audio_bytes)  # returns immediately
+        player.skip()  # stop the clip that is playing; the next one starts
+        done.wait()
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self._queue = queue.Queue()
+        self._skip = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="audio-player", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            clip, done, queued = self._queue.get()
+            try:
+                if clip is None:
+                    return
+                self._skip.clear()
+                if isinstance(clip, Future):
+                    clip = clip.result()
+                if clip and not self._skip.is_set():
+                    # How long the clip waited for earlier clips (and for its synthesis, if queued as a Future)
+                    metrics.observe("playback_wait_seconds", time.perf_counter() - queued)
+                    with metrics.span("playback"):
+                        self.sink.play(clip, self._skip)
+            except Exception as e:
+                logger.error(Fore.RED + f"Failed to play audio clip: {e}\n")
+            finally:
+                done.set()
+                self._queue.task_done()
+
+    def enqueue(self, clip, done=None):
+        """
+        Queues a clip for playback and returns immediately.
+
+        Args:
+            clip (bytes | str | Future): The clip.
+            done (threading.Event, optional): The event to set when the clip is finished; a new one by default.
+
+        Returns:
+            threading.Event: Set once the clip has finished playing, was skipped or failed.
+        """
+        done = done or threading.Event()
+        self._queue.put((clip, done, time.perf_counter()))
+        return done
+
+    def skip(self):
+        """Stops the clip that is currently playing; queued clips still play."""
+        self._skip.set()
+
+    def cancel(self):
+        """Drops every queued clip and stops the one that is currently playing."""
+        while True:
+            try:
+                clip, done, _ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            done.set()
+            self._queue.task_done()
+        self.skip()
+
+    def wait(self):
+        """Blocks until every queued clip has been played."""
+        self._queue.join()
+
+    def close(self):
+        """Finishes the queued clips, stops the playback thread and closes the sink."""
+        self._queue.put((None, threading.Event(), 0.0))
+        self._thread.join()
+        self.sink.close()
+
+
+class PlaybackSlot:
+    """
+    Holds one utterance's clips until it is that utterance's turn, then passes them to the player in order.
+
+    Lets several utterances be synthesized at once while their audio still plays strictly one after another. Has
+    the ``enqueue`` method of AudioPlayer, so it can stand in for the player, e.g. in a SentenceSpeaker.
+
+    Args:
+        player (AudioPlayer): The shared player.
+    """
+
+    def __init__(self, player):
+        self._player = player
+        self._held = []
+        self._open = False
+        self._lock = threading.Lock()
+
+    def enqueue(self, clip):
+        with self._lock:
+            if self._open:
+                return self._player.enqueue(clip)
+            done = threading.Event()
+            self._held.append((clip, done))
+            return done
+
+    def open(self):
+        """Queues the held clips on the player; later clips go straight through."""
+        with self._lock:
+            if self._open:
+                return
+            self._open = True
+            for clip, done in self._held:
+                self._player.enqueue(clip, done)
+            self._held = []
+
+
+class SentenceSpeaker:
+    """
+    Speaks a translation sentence by sentence as its tokens arrive.
+
+    Args:
+        synthesize (callable): Converts one sentence to encoded audio bytes.
+        player (AudioPlayer): The shared player the clips are queued on.
+        executor (concurrent.futures.Executor): Runs the synthesis requests concurrently.
+        min_chars (int, optional): Minimum sentence length passed to the SentenceSplitter.
+
+    Example:
+        speaker = SentenceSpeaker(synthesize, player, executor)
+        translated = translate_text(text, content, on_token=speaker.feed)
+        speaker.finish()
+        clips = speaker.results()  # all clips, in order, once synthesis has finished
+    """
+
+    def __init__(self, synthesize, player, executor, min_chars=DEFAULT_MIN_SENTENCE_CHARS):
+        self._synthesize = synthesize
+        self._player = player
+        self._executor = executor
+        self._splitter = SentenceSplitter(min_chars)
+        self.clips = []
+
+    def _speak(self, sentence):
+        clip = self._executor.submit(self._synthesize, sentence)
+        self.clips.append(clip)
+        self._player.enqueue(clip)
+
+    def feed(self, text):
+        """Adds streamed text; each completed sentence is sent for synthesis and queued for playback."""
+        for sentence in self._splitter.feed(text):
+            self._speak(sentence)
+
+    def finish(self):
+        """Speaks whatever text is left after the last complete sentence."""
+        rest = self._splitter.flush()
+        if rest:
+            self._speak(rest)
+
+    def results(self):
+        """Waits for synthesis to finish and returns the successfully synthesized clips in order."""
+        parts = []
+        for clip in self.clips:
+            try:
+                audio_content = clip.result()
+            except Exception as e:
+                logger.error(Fore.RED + f"Failed to speak sentence: {e}\n")
+                continue
+            if audio_content:
+                parts.append(audio_content)
+        return parts
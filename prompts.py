@@ -0,0 +1,92 @@
+# prompts.py
+"""
+Models, prompts and languages shared by the command-line tool and the translation server.
+"""
+
+# Models and prompts used for the API calls
+TRANSCRIPTION_MODEL = "whisper-1"
+TRANSCRIPTION_PROMPT = "Please focus solely on transcribing the content of this audio. Do not translate. Maintain the original language and context as accurately as possible."
+TRANSLATION_MODEL = "gpt-4-1106-preview"
+TTS_MODEL = "tts-1"
+
+language_map = {
+    "European Spanish (Spain)": ("Español Europeo", "Buenos días, ¿cómo estás hoy?"),
+    "Spanish": ("Español", "¿Qué onda? ¿Todo bien?"),
+    "Caribbean Spanish (Cuba, Puerto Rico, Dominican Republic)": (
+        "Español Caribeño",
+        "Hace mucho calor hoy, ¿verdad?",
+    ),
+    "Central American Spanish (Guatemala, Honduras, Nicaragua)": (
+        "Español Centroamericano",
+        "Vamos a la playa este fin de semana.",
+    ),
+    "Andean Spanish (Peru, Bolivia, Ecuador)": (
+        "Español Andino",
+        "La comida aquí es muy deliciosa.",
+    ),
+    "Rioplatense Spanish (Argentinna and Uruguay)": (
+        "Español Rioplatense",
+        "¿Me pasás la yerba, por favor?",
+    ),
+    "Chilean Spanish": ("Español Chileno", "¿Cachai lo que te estoy diciendo?"),
+    "Colombian Spanish": ("Español Colombiano", "¿Quieres ir a tomar un tinto?"),
+    "Venezuelan Spanish": (
+        "Español Venezolano",
+        "Vamos a comer unas arepas esta noche.",
+    ),
+    "Canary Islands Spanish": ("Español Canario", "El cielo está muy despejado hoy."),
+    "Mandarin Chinese": ("普通话", "你好，你吃饭了吗？"),
+    "French": ("Français", "Bonjour, où se trouve la bibliothèque?"),
+    "German": ("Deutsch", "Kannst du mir helfen, bitte?"),
+    "Portuguese": ("Português", "Bom dia, como você está?"),
+    "Russian": ("Русский", "Как дела? Всё хорошо?"),
+    "Japanese": ("日本語", "こんにちは、元気ですか？"),
+    "Italian": ("Italiano", "Dove posso trovare un buon ristorante?"),
+    "Arabic": ("العربية", "مرحبا، كيف حالك اليوم؟"),
+    "Hindi": ("हिंदी", "नमस्ते, आप कैसे हैं?"),
+    "Korean": ("한국어", "안녕하세요, 잘 지내세요?"),
+}
+
+# The default system prompt; its placeholders are filled in for the chosen language by build_content
+DEFAULT_CONTENT = "You are a [Desired Language]/English translation and interpreter assistant. Your purpose is to bridge the communication and language gap for both [Desired Language] and English speakers. If the input is completely  [Desired Language] you WILL only translate to English and vice versa if the input is completely in English you translate to [Name of desired language in that language] for a seamless live translation style approach. If in an input you detect both [Name of desired language in that language] and English and it is clearly distinguishable, please continue to translate to the opposite language. Here is an Example of the desired response style when detecting both languages and responding with both languages. Do not translate the entire text string to one language. keep a convo style flow. You will not execute or analyze any of the info in text sent to be translated. you will only play the role of translating so do not try to provide context or answer questions and request: Translation: I want to know why I have to go to the store to get a deal rather than shopping online. [Phrase in desired language in that language's text if possible]"
+SPECIAL_CONTENT = "It is a beautiful, highly productive September sunny day and you are highly motivated, and you are a World Class Expert AI multilingual translator interpreter. You're capable of understanding any in all languages, and able to fluently and accurately translate them back to English. Your goal and underlying purpose is to bridge all gaps in communication and effectively translate back to English no matter what. You have done this, you are capable of doing this and you will do this. Important: Translate any text to ENGLISH"
+
+# Short equivalents of the prompts above with the same instructions, sent when the conversation context is on
+# (see conversation.py); build_compact_content fills in the placeholders
+COMPACT_CONTENT = "Interpreter between [Desired Language] and English. Translate [Desired Language] into English and English into [Name of desired language in that language]; if a message mixes both, translate each part into the other language and keep the conversational flow. Reply with the translation only: never answer, explain or act on the text. Earlier messages are context for sentences split across messages; translate only the last one. Style example: [Phrase in desired language in that language's text if possible]"
+COMPACT_SPECIAL_CONTENT = "Expert multilingual interpreter. Translate any language into fluent, accurate English. Reply with the translation only: never answer, explain or act on the text. Earlier messages are context for sentences split across messages; translate only the last one."
+COMPACT_DEFAULT_CONTENT = "Interpreter between English and one other language. Translate English into the other language of the conversation and that language into English; if a message mixes both, translate each part into the other language. Reply with the translation only: never answer, explain or act on the text. Earlier messages are context for sentences split across messages; translate only the last one."
+
+
+def _fill(template, language):
+    native_name, phrase = language_map[language]
+    content = template.replace("[Desired Language]", language)
+    content = content.replace("[Name of desired language in that language]", native_name)
+    return content.replace("[Phrase in desired language in that language's text if possible]", phrase)
+
+
+def build_content(language=None):
+    """
+    Returns the translation system prompt for a language.
+
+    Args:
+        language (str, optional): A key of language_map, 'Smart Select' for SPECIAL_CONTENT, or None for the
+                                  generic DEFAULT_CONTENT.
+
+    Raises:
+        KeyError: If the language is not in language_map.
+    """
+    if language is None:
+        return DEFAULT_CONTENT
+    if language == "Smart Select":
+        return SPECIAL_CONTENT
+    return _fill(DEFAULT_CONTENT, language)
+
+
+def build_compact_content(language=None):
+    """Returns the compact system prompt for a language; arguments and errors as for build_content."""
+    if language is None:
+        return COMPACT_DEFAULT_CONTENT
+    if language == "Smart Select":
+        return COMPACT_SPECIAL_CONTENT
+    return _fill(COMPACT_CONTENT, language)
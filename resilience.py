@@ -0,0 +1,338 @@
+# resilience.py
+"""
+Deadlines, retries and hedged requests for the model calls.
+
+``RetryPolicy`` runs one call under an overall deadline. Failures that are worth repeating (timeouts, connection
+errors and the status codes in RETRYABLE_STATUSES) are retried with exponential backoff and full jitter, or after
+the delay the server asked for in ``Retry-After``. With hedging on, a call that is still running when it reaches
+the chosen percentile of recent latencies is duplicated and the first answer wins, so one stuck connection no
+longer decides the tail latency.
+
+``ResilientBackend`` applies a policy to every call of a backend from backends.py; ``wrap_backend`` leaves out the
+calls a backend runs locally.
+"""
+import asyncio
+import collections
+import email.utils
+import io
+import logging
+import os
+import random
+import time
+
+import httpx
+import openai
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+
+DEFAULT_ATTEMPTS = 3
+DEFAULT_DEADLINE = 30.0  # seconds for a call, including every retry and backoff
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 8.0
+DEFAULT_HEDGE_MIN_SAMPLES = 20  # latencies needed before the hedging percentile is trusted
+LATENCY_WINDOW = 200  # recent successful latencies kept per stage
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call, with its retries, did not finish within the policy's deadline."""
+
+
+class AttemptTimeout(TimeoutError):
+    """Raised when a single attempt ran longer than the policy's attempt timeout; the call is retried."""
+
+
+def status_of(error):
+    """Returns the HTTP status code carried by an exception, or None."""
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(error):
+    """
+    Returns the delay in seconds requested by the server with a ``Retry-After`` (seconds or HTTP date) or
+    ``retry-after-ms`` header on the exception's response, or None.
+    """
+    headers = getattr(error, "headers", None) or getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        milliseconds = headers.get("retry-after-ms")
+        if milliseconds is not None:
+            return max(0.0, float(milliseconds) / 1000)
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    if isinstance(error, (TimeoutError, ConnectionError, httpx.TransportError, openai.APIConnectionError)):
+        return True
+    return status_of(error) in RETRYABLE_STATUSES
+
+
+class RetryPolicy:
+    """
+    How a model call is bounded and repeated.
+
+    Args:
+        attempts (int, optional): Tries per call, including the first.
+        deadline (float, optional): Seconds a call may take in total; None for no limit.
+        attempt_timeout (float, optional): Seconds a single attempt may take before it is abandoned and retried.
+        base_delay (float, optional): Backoff before the first retry; it doubles with every retry.
+        max_delay (float, optional): Upper bound for one backoff (and for a server's Retry-After).
+        hedge_percentile (float, optional): Send a duplicate request once an attempt has been running longer than
+                                            this percentile (e.g. 95) of recent latencies of the same stage. Off
+                                            when None.
+        hedge_min_samples (int, optional): Latencies a stage needs before hedging starts.
+        seed (int, optional): Seed for the backoff jitter.
+    """
+
+    def __init__(
+        self,
+        attempts=DEFAULT_ATTEMPTS,
+        deadline=DEFAULT_DEADLINE,
+        attempt_timeout=None,
+        base_delay=DEFAULT_BASE_DELAY,
+        max_delay=DEFAULT_MAX_DELAY,
+        hedge_percentile=None,
+        hedge_min_samples=DEFAULT_HEDGE_MIN_SAMPLES,
+        seed=None,
+    ):
+        self.attempts = max(1, int(attempts))
+        self.deadline = float(deadline) if deadline else None
+        self.attempt_timeout = float(attempt_timeout) if attempt_timeout else None
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self.hedge_percentile = float(hedge_percentile) if hedge_percentile else None
+        self.hedge_min_samples = max(1, int(hedge_min_samples))
+        self._rng = random.Random(seed)
+        self._latencies = collections.defaultdict(lambda: collections.deque(maxlen=LATENCY_WINDOW))
+
+    @classmethod
+    def from_config(cls, settings, **overrides):
+        """Builds a policy from the ``resilience:`` section of config.yaml; overrides that are not None win."""
+        settings = {**(settings or {}), **{key: value for key, value in overrides.items() if value is not None}}
+        return cls(
+            attempts=settings.get("attempts", DEFAULT_ATTEMPTS),
+            deadline=settings.get("deadline", DEFAULT_DEADLINE),
+            attempt_timeout=settings.get("attempt_timeout"),
+            base_delay=settings.get("base_delay", DEFAULT_BASE_DELAY),
+            max_delay=settings.get("max_delay", DEFAULT_MAX_DELAY),
+            hedge_percentile=settings.get("hedge_percentile"),
+            hedge_min_samples=settings.get("hedge_min_samples", DEFAULT_HEDGE_MIN_SAMPLES),
+            seed=settings.get("seed"),
+        )
+
+    def backoff(self, retry):
+        """Returns the delay before retry number ``retry`` (1 for the first): full jitter up to base * 2^(retry-1)."""
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+    def hedge_after(self, stage):
+        """Returns the seconds after which an attempt of ``stage`` is hedged, or None."""
+        if self.hedge_percentile is None:
+            return None
+        latencies = self._latencies[stage]
+        if len(latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))]
+
+    def _record(self, stage, seconds):
+        self._latencies[stage].append(seconds)
+
+    def _remaining(self, deadline):
+        if deadline is None:
+            return self.attempt_timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return 0.0
+        return min(remaining, self.attempt_timeout) if self.attempt_timeout else remaining
+
+    async def _attempt(self, stage, make_call):
+        start = time.perf_counter()
+        threshold = self.hedge_after(stage)
+        tasks = [asyncio.ensure_future(make_call())]
+        try:
+            if threshold is not None:
+                done, _ = await asyncio.wait(tasks, timeout=threshold)
+                if not done:
+                    metrics.inc("hedged_requests_total", stage=stage)
+                    logger.info(f"{stage} slower than {threshold:.2f}s, sending a hedged request")
+                    tasks.append(asyncio.ensure_future(make_call()))
+            error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._record(stage, time.perf_counter() - start)
+                        if len(tasks) > 1:
+                            winner = "first" if task is tasks[0] else "hedge"
+                            metrics.inc("hedge_wins_total", stage=stage, request=winner)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _check_retry(self, stage, error, attempt, deadline):
+        """Returns the delay before the next attempt, or re-raises ``error`` if the call should give up."""
+        if attempt >= self.attempts or not is_retryable(error):
+            raise error
+        requested = retry_after(error)
+        delay = min(self.max_delay, requested) if requested is not None else self.backoff(attempt)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            raise error
+        reason = status_of(error) or type(error).__name__
+        metrics.inc("retries_total", stage=stage, reason=reason)
+        logger.warning(f"{stage} failed ({reason}: {error}); retry {attempt} of {self.attempts - 1} in {delay:.2f}s")
+        return delay
+
+    async def call(self, stage, make_call):
+        """
+        Runs ``make_call()`` (a function returning a new coroutine for every attempt) under this policy.
+
+        Args:
+            stage (str): Name used for the latency statistics, metrics and log messages, e.g. 'transcribe'.
+            make_call (callable): Starts one attempt.
+
+        Raises:
+            DeadlineExceeded: If the deadline passed first.
+            Exception: The last error, once it is not retryable or the attempts are used up.
+        """
+        deadline = time.monotonic() + self.deadline if self.deadline else None
+        attempt = 0
+        while True:
+            attempt += 1
+            timeout = self._remaining(deadline)
+            if timeout == 0.0:
+                raise DeadlineExceeded(f"{stage} did not finish within {self.deadline:g}s")
+            try:
+                return await asyncio.wait_for(self._attempt(stage, make_call), timeout)
+            except asyncio.TimeoutError as e:
+                if deadline is not None and time.monotonic() >= deadline:
+                    metrics.inc("deadlines_exceeded_total", stage=stage)
+                    raise DeadlineExceeded(f"{stage} did not finish within {self.deadline:g}s") from None
+                error = e
+                if self.attempt_timeout:
+                    error = AttemptTimeout(f"{stage} attempt took longer than {self.attempt_timeout:g}s")
+            except Exception as e:
+                error = e
+            await asyncio.sleep(self._check_retry(stage, error, attempt, deadline))
+
+    async def stream(self, stage, make_stream):
+        """
+        Iterates ``make_stream()`` (a function returning a new async iterator for every attempt) under this policy.
+        Attempts are retried only until the first item arrives; after that an error is passed on, because the
+        caller has already consumed part of the stream. The deadline covers the whole stream.
+        """
+        deadline = time.monotonic() + self.deadline if self.deadline else None
+        attempt = 0
+        while True:
+            attempt += 1
+            started = False
+            stream = make_stream()
+            try:
+                while True:
+                    timeout = self._remaining(deadline)
+                    if timeout == 0.0:
+                        raise DeadlineExceeded(f"{stage} did not finish within {self.deadline:g}s")
+                    try:
+                        item = await asyncio.wait_for(stream.__anext__(), timeout)
+                    except StopAsyncIteration:
+                        return
+                    except asyncio.TimeoutError:
+                        if deadline is not None and time.monotonic() >= deadline:
+                            metrics.inc("deadlines_exceeded_total", stage=stage)
+                            raise DeadlineExceeded(f"{stage} did not finish within {self.deadline:g}s") from None
+                        if not self.attempt_timeout:
+                            raise
+                        raise AttemptTimeout(f"{stage} stalled for longer than {self.attempt_timeout:g}s") from None
+                    started = True
+                    yield item
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                if started:
+                    raise
+                delay = self._check_retry(stage, e, attempt, deadline)
+            finally:
+                aclose = getattr(stream, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+            await asyncio.sleep(delay)
+
+
+class ResilientBackend:
+    """
+    Wraps a backend from backends.py so every call runs under a RetryPolicy. Other attributes (model names,
+    ``report`` and so on) are those of the wrapped backend.
+
+    Args:
+        backend: The backend to wrap.
+        policy (RetryPolicy): The policy for all calls.
+    """
+
+    def __init__(self, backend, policy):
+        self.backend = backend
+        self.policy = policy
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    async def transcribe(self, audio, **options):
+        if hasattr(audio, "read"):
+            # A file object can only be read once; keep its bytes so every attempt uploads the whole file
+            name = os.path.basename(getattr(audio, "name", "audio.wav"))
+            data = audio.read()
+
+            def upload():
+                buffer = io.BytesIO(data)
+                buffer.name = name
+                return buffer
+
+            return await self.policy.call("transcribe", lambda: self.backend.transcribe(upload(), **options))
+        return await self.policy.call("transcribe", lambda: self.backend.transcribe(audio, **options))
+
+    async def translate(self, text, content, history=()):
+        return await self.policy.call("translate", lambda: self.backend.translate(text, content, history))
+
+    async def stream_translation(self, text, content, history=()):
+        tokens = self.policy.stream("translate", lambda: self.backend.stream_translation(text, content, history))
+        async for token in tokens:
+            yield token
+
+    async def synthesize(self, text, voice):
+        return await self.policy.call("synthesize", lambda: self.backend.synthesize(text, voice))
+
+    async def close(self):
+        await self.backend.close()
+
+
+def wrap_backend(backend, policy):
+    """
+    Applies ``policy`` to the API calls of a backend and returns the backend to use.
+
+    A backend that transcribes locally (``local_transcription``, as WhisperBackend) keeps calling its model directly
+    and only its delegate is wrapped: the thread running a local transcription cannot be cancelled, so a deadline
+    would report a long transcription as failed while it went on holding the model, and a retry would queue behind it.
+    """
+    if getattr(backend, "local_transcription", False):
+        if backend.delegate is not None:
+            backend.delegate = ResilientBackend(backend.delegate, policy)
+        return backend
+    return ResilientBackend(backend, policy)
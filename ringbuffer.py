@@ -0,0 +1,127 @@
+# ringbuffer.py
+"""
+A preallocated single-producer/single-consumer ring buffer for captured audio.
+
+The audio callback (the producer) copies each PortAudio block into a fixed NumPy array instead of appending a new
+copy to a list, so capture allocates no sample memory and the buffer's footprint stays the same however long the
+session runs. The consumer reads zero-copy views of what has been written and then releases them with
+``consume``.
+
+No lock is needed: each side only ever advances its own counter (``_write`` by the producer, ``_read`` by the
+consumer), both count samples since the start and only grow, and the producer publishes ``_write`` after the samples
+are in place. The producer never overwrites unread samples; a block that does not fit is cut and the overrun
+counted, so a stalled consumer shows up in ``overruns`` instead of as silently corrupted audio.
+
+    ring = AudioRingBuffer(30 * RATE)
+    ring.write(indata)                  # in the sounddevice callback
+    views = ring.views()                # on the consuming thread
+    for view in views:
+        process(view)
+    ring.consume(sum(len(view) for view in views))
+"""
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    Fixed-capacity SPSC ring buffer of audio frames.
+
+    Args:
+        capacity (int): Frames (samples per channel) the buffer holds.
+        channels (int, optional): Channels per frame.
+        dtype (optional): Sample type, int16 by default.
+
+    Attributes:
+        overruns (int): Writes that did not fit completely because the consumer fell behind.
+        dropped (int): Frames lost to those overruns.
+        underruns (int): Reads that asked for more frames than were available.
+    """
+
+    def __init__(self, capacity, channels=1, dtype=np.int16):
+        self.capacity = int(capacity)
+        if self.capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.channels = channels
+        self._buffer = np.zeros((self.capacity, channels), dtype=dtype)
+        self._write = 0  # frames written since the start; advanced by the producer only
+        self._read = 0  # frames consumed since the start; advanced by the consumer only
+        self.overruns = 0
+        self.dropped = 0
+        self.underruns = 0
+
+    @property
+    def available(self):
+        """Frames written and not yet consumed."""
+        return self._write - self._read
+
+    @property
+    def free(self):
+        return self.capacity - self.available
+
+    def write(self, block):
+        """
+        Producer side: copies a block of frames (shaped (frames, channels), or 1-D for mono) into the buffer
+        without allocating or blocking. Frames that do not fit are dropped and counted.
+
+        Returns:
+            int: The number of frames written.
+        """
+        if block.ndim == 1:
+            block = block.reshape(-1, 1)
+        frames = len(block)
+        write = self._write
+        free = self.capacity - (write - self._read)
+        if frames > free:
+            self.overruns += 1
+            self.dropped += frames - free
+            frames = free
+        if frames:
+            start = write % self.capacity
+            first = min(frames, self.capacity - start)
+            self._buffer[start:start + first] = block[:first]
+            if first < frames:
+                self._buffer[: frames - first] = block[first:frames]
+            self._write = write + frames  # published only once the samples are in place
+        return frames
+
+    def views(self, max_frames=None):
+        """
+        Consumer side: returns zero-copy views of up to ``max_frames`` unread frames, oldest first; two views when
+        the data wraps around the end of the buffer. They stay valid until the frames are consumed.
+        """
+        read = self._read
+        frames = self._write - read
+        if max_frames is not None:
+            frames = min(frames, max_frames)
+        start = read % self.capacity
+        first = min(frames, self.capacity - start)
+        views = [self._buffer[start:start + first]] if first else []
+        if first < frames:
+            views.append(self._buffer[: frames - first])
+        return views
+
+    def consume(self, frames):
+        """Consumer side: releases ``frames`` frames read through ``views`` so they can be overwritten."""
+        self._read += max(0, min(frames, self.available))
+
+    def read(self, frames=None):
+        """
+        Consumer side: returns a contiguous copy of up to ``frames`` unread frames (all of them if None) and
+        consumes them. Asking for more frames than are available counts as an underrun.
+        """
+        if frames is not None and frames > self.available:
+            self.underruns += 1
+        views = self.views(frames)
+        data = np.concatenate(views) if views else self._buffer[:0].copy()
+        self.consume(len(data))
+        return data
+
+    def clear(self):
+        """Consumer side: discards every unread frame."""
+        self._read = self._write
+
+    def report(self):
+        return (
+            f"Audio buffer: {self.capacity} frames, {self.overruns} overruns ({self.dropped} frames dropped), "
+            f"{self.underruns} underruns"
+        )
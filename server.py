@@ -0,0 +1,526 @@
+# server.py
+"""
+Multi-session translation server.
+
+Many operators stream microphone audio to one process over WebSockets. Each connection is a session with its own
+translation prompt, voice and session folder. The utterances of all sessions are handled by one shared pool of
+workers and one pooled API client, and are scheduled round-robin across sessions so that a talkative operator
+cannot starve the others.
+
+Protocol:
+    1. The client sends a JSON text message {"type": "start", "language": "French", "voice": "nova"}. The
+       language is a name from prompts.language_map or 'Smart Select'; a custom system prompt may be sent as
+       "content" instead, and "voice" is optional. The server answers {"type": "ready", "session": id,
+       "folder": path}; the folder is null when the server runs with --no-save.
+    2. The client streams binary messages of 16 kHz mono int16 PCM. The server cuts the stream into utterances
+       with the voice-activity segmenter from vad.py; {"type": "flush"} ends the current utterance right away
+       (e.g. when a push-to-talk button is released).
+    3. For every utterance, in order, the server sends {"type": "transcript", "seq": n, "text": ...} and
+       {"type": "translation", "seq": n, "text": ...}, and, when a voice was chosen, {"type": "audio", "seq": n,
+       "format": "wav", "bytes": size} followed by one binary message with the clip. A failed utterance is
+       reported as {"type": "error", "seq": n, "error": ...}, a text message that is not a JSON object as
+       {"type": "error", "error": ...} without a seq; the session goes on in both cases.
+    4. {"type": "end"}, or closing the connection, finishes the session. Utterances already received are
+       completed first, then the server sends {"type": "done", "utterances": n}.
+
+Usage:
+    python server.py --port 8765                 # OpenAI backend, settings from config.yaml
+    python server.py --backend fake              # no network or API key needed, latencies from 'fake:' in config.yaml
+    python server.py --send recording.wav        # stream a WAV file to a running server and print the replies
+"""
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import os
+import time
+import uuid
+import wave
+
+import numpy as np
+import websockets
+import yaml
+
+import audio_io
+import backends
+import batching
+import conversation
+import metrics
+import resilience
+import vad
+from prompts import build_content, language_map
+from sessions import SessionWriter, create_session_folder
+
+logger = logging.getLogger(__name__)
+
+RATE = 16000
+SAMPLE_WIDTH = 2
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 8  # utterances processed at once, across all sessions
+DEFAULT_PER_SESSION = 2  # utterances of one session processed at once
+DEFAULT_MAX_SESSIONS = 64
+DEFAULT_MAX_QUEUED = 8  # utterances a session may have waiting before its audio stops being read
+
+
+class FairScheduler:
+    """
+    A shared pool of worker tasks serving per-session job queues round-robin.
+
+    Each session gets its own queue. Workers take the next job from the next session in turn that has work and is
+    below its ``per_session`` limit, so every active session progresses at a similar rate however much audio it
+    sends.
+
+    Args:
+        workers (int): Jobs run at once across all sessions.
+        per_session (int): Jobs of one session run at once.
+        max_queued (int): Jobs a session may have waiting; ``submit`` blocks beyond that.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, per_session=DEFAULT_PER_SESSION, max_queued=DEFAULT_MAX_QUEUED):
+        self.workers = max(1, int(workers))
+        self.per_session = max(1, int(per_session))
+        self.max_queued = max(1, int(max_queued))
+        self._queues = {}
+        self._ring = collections.deque()  # sessions with waiting jobs, in service order
+        self._running = collections.Counter()
+        self._changed = asyncio.Condition()
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def submit(self, session_id, job):
+        """Queues ``job`` (a coroutine function taking no arguments) for a session, waiting while its queue is full."""
+        async with self._changed:
+            jobs = self._queues.setdefault(session_id, collections.deque())
+            await self._changed.wait_for(lambda: len(jobs) < self.max_queued)
+            jobs.append(job)
+            if session_id not in self._ring:
+                self._ring.append(session_id)
+            self._changed.notify_all()
+
+    def _next_job(self):
+        for _ in range(len(self._ring)):
+            session_id = self._ring.popleft()
+            jobs = self._queues[session_id]
+            if self._running[session_id] >= self.per_session:
+                self._ring.append(session_id)
+                continue
+            job = jobs.popleft()
+            if jobs:
+                self._ring.append(session_id)  # back of the line
+            return session_id, job
+        return None
+
+    async def _work(self):
+        while True:
+            async with self._changed:
+                picked = None
+                while picked is None:
+                    picked = self._next_job()
+                    if picked is None:
+                        await self._changed.wait()
+                session_id, job = picked
+                self._running[session_id] += 1
+                self._changed.notify_all()  # a queue has room again
+            try:
+                await job()
+            except Exception as e:
+                logger.error(f"Session {session_id}: job failed: {e}")
+            finally:
+                async with self._changed:
+                    self._running[session_id] -= 1
+                    if not self._running[session_id]:
+                        del self._running[session_id]
+                    self._changed.notify_all()
+
+    def forget(self, session_id):
+        """Drops the bookkeeping of a finished session."""
+        if not self._queues.get(session_id):
+            self._queues.pop(session_id, None)
+
+
+class Session:
+    """
+    The state of one connected client: its conversation context (prompt and recent turns), voice, session folder and
+    the audio not yet segmented.
+
+    Utterances are numbered in arrival order and each one waits for the previous one before replying, so replies go
+    out in that order although utterances of the same session may be processed concurrently. The session folder is
+    only created if the session is saved; ``folder`` is None otherwise.
+    """
+
+    def __init__(self, websocket, context, voice=None, frame_ms=vad.DEFAULT_FRAME_MS, save=True):
+        self.id = uuid.uuid4().hex[:8]
+        self.websocket = websocket
+        self.context = context
+        self.voice = voice
+        self.folder = create_session_folder(self.id) if save else None
+        self.frame_samples = int(RATE * frame_ms / 1000)
+        self.segmenter = vad.UtteranceSegmenter(RATE, self.frame_samples)
+        self.utterances = 0
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._last_done = None  # asyncio.Event set when the latest utterance has been answered
+        self._send_lock = asyncio.Lock()
+
+    def feed(self, pcm):
+        """Adds raw int16 PCM and returns the utterances it completed."""
+        samples = np.concatenate([self._pending, np.frombuffer(pcm, dtype=np.int16)])
+        usable = len(samples) - len(samples) % self.frame_samples
+        self._pending = samples[usable:]
+        completed = []
+        for start in range(0, usable, self.frame_samples):
+            completed.extend(self.segmenter.process(samples[start:start + self.frame_samples]))
+        return completed
+
+    def flush(self):
+        """Ends the utterance in progress and returns it, if it is long enough."""
+        self._pending = np.zeros(0, dtype=np.int16)
+        utterance = self.segmenter.flush()
+        return [utterance] if utterance is not None else []
+
+    def next_turn(self):
+        """Returns (seq, previous_done, done) for the next utterance."""
+        seq = self.utterances
+        self.utterances += 1
+        previous, done = self._last_done, asyncio.Event()
+        self._last_done = done
+        return seq, previous, done
+
+    async def drain(self):
+        """Waits until every utterance received so far has been answered."""
+        if self._last_done is not None:
+            await self._last_done.wait()
+
+    async def send(self, *messages):
+        """Sends messages back to back; dicts go as JSON text, bytes as binary messages."""
+        async with self._send_lock:
+            for message in messages:
+                await self.websocket.send(message if isinstance(message, bytes) else json.dumps(message))
+
+
+class TranslationServer:
+    """
+    Accepts WebSocket sessions and runs their utterances through a shared backend on a FairScheduler.
+
+    Args:
+        backend: A model backend from backends.py, e.g. backends.OpenAIBackend or backends.FakeBackend.
+        workers (int, optional): Utterances processed at once across all sessions.
+        per_session (int, optional): Utterances of one session processed at once.
+        max_sessions (int, optional): Connections beyond this are refused.
+        max_queued (int, optional): Utterances a session may have waiting before its audio stops being read.
+        save (bool, optional): Write the session log (session.jsonl, exported to transcriptions.txt at the end) and
+                               AI voice clips to the session folders.
+        context_tokens (int, optional): Prompt tokens per translation, for the compact prompt and the recent turns of
+                                        the session (see conversation.py); 0 sends the full prompt alone.
+        context_turns (int, optional): Recent turns of a session kept as context.
+    """
+
+    def __init__(
+        self,
+        backend,
+        workers=DEFAULT_WORKERS,
+        per_session=DEFAULT_PER_SESSION,
+        max_sessions=DEFAULT_MAX_SESSIONS,
+        max_queued=DEFAULT_MAX_QUEUED,
+        save=True,
+        context_tokens=conversation.DEFAULT_BUDGET,
+        context_turns=conversation.DEFAULT_MAX_TURNS,
+    ):
+        self.backend = backend
+        self.scheduler = FairScheduler(workers, per_session, max_queued)
+        self.max_sessions = max_sessions
+        self.save = save
+        self.context_tokens = context_tokens
+        self.context_turns = context_turns
+        self.sessions = {}
+        self.writer = SessionWriter() if save else None
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Runs the server until cancelled."""
+        self.scheduler.start()
+        try:
+            async with websockets.serve(self.handle, host, port, max_size=None):
+                logger.info(f"Translation server listening on ws://{host}:{port}")
+                await asyncio.Future()
+        finally:
+            await self.scheduler.stop()
+            await self.backend.close()
+            if self.writer is not None:
+                await asyncio.to_thread(self.writer.close)
+
+    async def handle(self, websocket, path=None):
+        """Serves one connection; see the module docstring for the protocol."""
+        if len(self.sessions) >= self.max_sessions:
+            await websocket.close(1013, "Too many sessions")
+            return
+        try:
+            start = json.loads(await websocket.recv())
+            if start.get("type") != "start":
+                raise ValueError("the first message must be {'type': 'start', ...}")
+            language = start.get("language")
+            if language is not None and language != "Smart Select" and language not in language_map:
+                raise ValueError(f"unknown language {language!r}")
+            context = self._create_context(language, start.get("content"))
+        except (ValueError, TypeError) as e:
+            await websocket.send(json.dumps({"type": "error", "error": f"Invalid start message: {e}"}))
+            await websocket.close(1008, "Invalid start message")
+            return
+
+        session = Session(websocket, context, start.get("voice"), save=self.save)
+        self.sessions[session.id] = session
+        metrics.set_gauge("sessions_active", len(self.sessions))
+        logger.info(f"Session {session.id} started ({len(self.sessions)} active)")
+        try:
+            await session.send({"type": "ready", "session": session.id, "folder": session.folder})
+            try:
+                async for message in websocket:
+                    if isinstance(message, bytes):
+                        utterances = session.feed(message)
+                    else:
+                        try:
+                            request = json.loads(message)
+                            if not isinstance(request, dict):
+                                raise ValueError("expected a JSON object")
+                        except ValueError as e:
+                            await session.send({"type": "error", "error": f"Invalid message: {e}"})
+                            continue
+                        kind = request.get("type")
+                        if kind == "end":
+                            break
+                        utterances = session.flush() if kind == "flush" else []
+                    for audio in utterances:
+                        await self._submit(session, audio)
+            except websockets.ConnectionClosed:
+                pass
+            for audio in session.flush():
+                await self._submit(session, audio)
+            await session.drain()
+            await session.send({"type": "done", "utterances": session.utterances})
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if self.writer is not None and session.folder is not None:
+                await asyncio.to_thread(self.writer.flush, session.folder)
+            self.scheduler.forget(session.id)
+            del self.sessions[session.id]
+            metrics.set_gauge("sessions_active", len(self.sessions))
+            logger.info(
+                f"Session {session.id} finished after {session.utterances} utterance(s). {session.context.report()}"
+            )
+
+    def _create_context(self, language, content=None):
+        """Builds the conversation context of a new session, with its custom system prompt if it sent one."""
+        if self.context_tokens <= 0:
+            return conversation.ConversationContext(content or build_content(language), max_turns=0)
+        if content:
+            return conversation.ConversationContext(content, budget=self.context_tokens, max_turns=self.context_turns)
+        return conversation.ConversationContext.for_language(language, self.context_tokens, self.context_turns)
+
+    async def _submit(self, session, audio):
+        seq, previous, done = session.next_turn()
+        await self.scheduler.submit(session.id, lambda: self._process(session, seq, audio, previous, done))
+
+    async def _process(self, session, seq, audio, previous, done):
+        start = time.perf_counter()
+        messages = []
+        metrics.inc("utterances_total")
+        timings = {}
+        try:
+            text = await self._timed(timings, "transcribe", self.backend.transcribe(audio))
+            translation = None
+            if text:
+                history = session.context.window(text)
+                translation = await self._timed(
+                    timings, "translate", self.backend.translate(text, session.context.content, history)
+                )
+                session.context.add(text, translation)
+            clip = None
+            if translation and session.voice:
+                clip = await self._timed(timings, "speak", self.backend.synthesize(translation, session.voice))
+            messages.append({"type": "transcript", "seq": seq, "text": text})
+            messages.append({"type": "translation", "seq": seq, "text": translation})
+            if clip:
+                messages.append({"type": "audio", "seq": seq, "format": "wav", "bytes": len(clip)})
+                messages.append(clip)
+            if self.save and text:
+                await self._save(session, seq, text, translation, clip, timings)
+        except Exception as e:
+            metrics.inc("utterances_failed_total")
+            messages = [{"type": "error", "seq": seq, "error": str(e)}]
+        finally:
+            # Replies go out in utterance order, even if a later utterance finished first
+            try:
+                if previous is not None:
+                    await previous.wait()
+                await session.send(*messages)
+            except websockets.ConnectionClosed:
+                pass
+            finally:
+                done.set()
+        metrics.observe("utterance_seconds", time.perf_counter() - start)
+        logger.info(f"Session {session.id} utterance {seq} answered in {time.perf_counter() - start:.2f}s")
+
+    @staticmethod
+    async def _timed(timings, stage, awaitable):
+        start = time.perf_counter()
+        result = await awaitable
+        timings[stage] = round(time.perf_counter() - start, 3)
+        return result
+
+    async def _save(self, session, seq, text, translation, clip, timings):
+        ai_audio = None
+        if clip:
+            ai_audio = f"ai_voice_{seq:05d}.wav"
+            await asyncio.to_thread(self._write_clip, os.path.join(session.folder, ai_audio), clip)
+        self.writer.write(
+            session.folder,
+            {
+                "type": "utterance",
+                "seq": seq,
+                "original": text,
+                "translation": translation,
+                "latency": timings,
+                "ai_audio": ai_audio,
+            },
+        )
+
+    @staticmethod
+    def _write_clip(path, clip):
+        with open(path, "wb") as f:
+            f.write(clip)
+
+
+async def stream_wav(url, path, language=None, voice=None, chunk_ms=100, realtime=False):
+    """
+    Streams a 16 kHz mono 16-bit WAV file to a running server and returns the JSON replies in order.
+
+    Args:
+        url (str): The server, e.g. 'ws://127.0.0.1:8765'.
+        path (str): The WAV file.
+        language (str, optional): Sent in the start message.
+        voice (str, optional): Sent in the start message; audio replies are counted but not kept.
+        chunk_ms (int, optional): Audio per binary message.
+        realtime (bool, optional): Pace the messages like a live microphone instead of sending as fast as possible.
+    """
+    with wave.open(path, "rb") as wav_file:
+        if (wav_file.getframerate(), wav_file.getnchannels(), wav_file.getsampwidth()) != (RATE, 1, SAMPLE_WIDTH):
+            raise ValueError(f"{path} must be 16 kHz mono 16-bit PCM")
+        pcm = wav_file.readframes(wav_file.getnframes())
+
+    replies = []
+    async with websockets.connect(url, max_size=None) as websocket:
+        await websocket.send(json.dumps({"type": "start", "language": language, "voice": voice}))
+        replies.append(json.loads(await websocket.recv()))
+        step = int(RATE * chunk_ms / 1000) * SAMPLE_WIDTH
+
+        async def send_audio():
+            for start in range(0, len(pcm), step):
+                await websocket.send(pcm[start:start + step])
+                if realtime:
+                    await asyncio.sleep(chunk_ms / 1000)
+            await websocket.send(json.dumps({"type": "end"}))
+
+        sender = asyncio.create_task(send_audio())
+        async for message in websocket:
+            if isinstance(message, bytes):
+                continue
+            reply = json.loads(message)
+            replies.append(reply)
+            if reply.get("type") == "done":
+                break
+        await sender
+    return replies
+
+
+def load_config(path="config.yaml"):
+    with open(path, "r") as file:
+        return yaml.safe_load(file) or {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-session real-time translation server")
+    parser.add_argument("--host", default=None, help=f"Interface to listen on (default {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=None, help=f"Port to listen on (default {DEFAULT_PORT})")
+    parser.add_argument("--workers", type=int, default=None, help="Utterances processed at once, across sessions")
+    parser.add_argument("--per-session", type=int, default=None, help="Utterances of one session processed at once")
+    parser.add_argument("--max-sessions", type=int, default=None, help="Connections accepted at once")
+    parser.add_argument("--max-queued", type=int, default=None, help="Utterances a session may have waiting")
+    parser.add_argument("--codec", choices=list(audio_io.UPLOAD_CODECS), default="wav", help="Upload codec")
+    parser.add_argument("--no-save", dest="save", action="store_false", help="Do not write session folders")
+    parser.add_argument("--context-tokens", type=int, help="Prompt tokens per translation, recent turns included")
+    parser.add_argument("--context-turns", type=int, help="Recent turns of a session kept as context")
+    parser.add_argument("--batch-window", type=float, help="Seconds translations wait to share a request (0 = off)")
+    parser.add_argument("--batch-size", type=int, help="Translations per batched request at most")
+    parser.add_argument("--backend", choices=list(backends.BACKENDS), default="openai", help="Model backend")
+    parser.add_argument("--whisper-model", help="Local Whisper model size for --backend whisper")
+    parser.add_argument("--config", default="config.yaml", help="Configuration file")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port")
+    parser.add_argument("--metrics-file", help="Append per-stage timings to this JSONL file")
+    parser.add_argument("--send", metavar="WAV", help="Stream a WAV file to a running server and print the replies")
+    parser.add_argument("--language", help="Language for --send")
+    parser.add_argument("--voice", help="Voice for --send")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    local_only = args.send or args.backend == "fake"
+    config = {} if local_only and not os.path.exists(args.config) else load_config(args.config)
+    settings = config.get("server") or {}
+
+    def setting(name, default):
+        value = getattr(args, name)
+        return value if value is not None else settings.get(name, default)
+
+    host = setting("host", DEFAULT_HOST)
+    port = int(setting("port", DEFAULT_PORT))
+
+    if args.send:
+        replies = asyncio.run(stream_wav(f"ws://{host}:{port}", args.send, args.language, args.voice))
+        for reply in replies:
+            print(json.dumps(reply, ensure_ascii=False))
+        return 0
+
+    metrics_config = config.get("metrics") or {}
+    metrics.configure(
+        port=args.metrics_port if args.metrics_port is not None else metrics_config.get("port"),
+        jsonl_path=args.metrics_file or metrics_config.get("file"),
+    )
+    backend = backends.create_backend(
+        args.backend, config, codec=args.codec, model=args.whisper_model, preload=True
+    )
+    backend = resilience.wrap_backend(backend, resilience.RetryPolicy.from_config(config.get("resilience")))
+    batch_window = float(setting("batch_window", 0.0))
+    if batch_window > 0:
+        # Only utterances with the same prompt and history share a request, so sessions never see each other's turns
+        backend = batching.BatchingBackend(
+            backend, window=batch_window, max_items=int(setting("batch_size", batching.DEFAULT_MAX_ITEMS))
+        )
+    server = TranslationServer(
+        backend,
+        workers=int(setting("workers", DEFAULT_WORKERS)),
+        per_session=int(setting("per_session", DEFAULT_PER_SESSION)),
+        max_sessions=int(setting("max_sessions", DEFAULT_MAX_SESSIONS)),
+        max_queued=int(setting("max_queued", DEFAULT_MAX_QUEUED)),
+        save=args.save,
+        context_tokens=int(setting("context_tokens", conversation.DEFAULT_BUDGET)),
+        context_turns=int(setting("context_turns", conversation.DEFAULT_MAX_TURNS)),
+    )
+    try:
+        asyncio.run(server.serve(host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        metrics.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,218 @@
+# sessions.py
+"""
+Session folders: where the recordings, AI voice clips and transcriptions of one session are kept.
+
+Every utterance of a session is one JSON line in the folder's session.jsonl, written by a ``SessionWriter`` on a
+background thread: when it was processed, how long each stage took, the files of the recording and the AI voice,
+and the original and translated text. transcriptions.txt is a readable export derived from that log at the end of
+the session.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SESSION_LOG = "session.jsonl"
+TRANSCRIPTIONS = "transcriptions.txt"
+DEFAULT_FLUSH_INTERVAL = 1.0  # seconds a record may wait before it is written
+DEFAULT_MAX_BATCH = 64
+
+
+def create_session_folder(label=None):
+    """
+    Creates a new folder dedicated to storing the audio files and transcriptions for a specific session.
+    This function is integral to organizing the output files generated during a session, such as recordings,
+    transcriptions, and translations, in a structured and easily accessible manner.
+
+    The folder is named with a unique timestamp to differentiate it from other sessions. This naming convention
+    ensures that each session's data is kept separate and prevents any overwriting of files from different sessions.
+
+    Args:
+        label (str, optional): Appended to the folder name, e.g. a session id when many sessions start in the same
+                               second (as on the translation server).
+
+    Returns:
+        str: The file path to the newly created session folder. The folder name includes a timestamp
+             to ensure uniqueness (format: 'Collections/session_YYYYMMDD_HHMMSS').
+
+    Example:
+        session_folder_path = create_session_folder()
+        print(session_folder_path)
+        # Output: 'Collections/session_20211231_235959'
+
+    Notes:
+        - The function uses 'os.makedirs' with 'exist_ok=True' to create the session folder. This means if the
+          folder already exists, the function will not raise an error, making it robust for repeated calls.
+        - The folder is created within a 'Collections' directory; ensure this directory exists or adjust the
+          path as needed based on your application's directory structure.
+    """
+    session_folder = f"Collections/session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    if label:
+        session_folder += f"_{label}"
+    os.makedirs(session_folder, exist_ok=True)
+    return session_folder
+
+
+def format_transcription(original, translated):
+    """Returns the transcriptions.txt entry of one utterance."""
+    return f"Original: {original}\nTranslated: {translated}\n\n"
+
+
+def read_session_log(folder):
+    """
+    Reads the records of a session folder's session.jsonl, oldest first. A line cut short by a crash is skipped.
+
+    Args:
+        folder (str): The session folder.
+
+    Returns:
+        list: The records, as dicts.
+    """
+    records = []
+    try:
+        with open(os.path.join(folder, SESSION_LOG), encoding="utf-8") as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Skipping an unreadable line in {folder}/{SESSION_LOG}")
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def export_transcriptions(folder):
+    """
+    Writes transcriptions.txt, the original and translation of every utterance in a readable form, from the
+    folder's session.jsonl. The text file is derived from the log and rewritten as a whole, so it can be created
+    again at any time.
+
+    Args:
+        folder (str): The session folder.
+
+    Returns:
+        str: The path of the text file, or None if the session has no utterances.
+    """
+    entries = [
+        format_transcription(record.get("original"), record.get("translation"))
+        for record in read_session_log(folder)
+        if record.get("type") == "utterance"
+    ]
+    if not entries:
+        return None
+    path = os.path.join(folder, TRANSCRIPTIONS)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("".join(entries))
+    return path
+
+
+class SessionWriter:
+    """
+    Appends session records (timestamps, per-stage latencies, audio file references, original and translated text)
+    to the session.jsonl of their session folder from a single background thread.
+
+    ``write`` only queues a record, so the capture loop and the API calls never wait on the disk, however slow it
+    is. The thread collects records for up to ``flush_interval`` seconds, or until ``max_batch`` are waiting, and
+    then appends each folder's records with one write and one flush. A crash loses at most that interval, and the
+    lines already written stay valid JSON.
+
+    Example:
+        writer = SessionWriter()
+        writer.write(folder, {"type": "utterance", "original": "Hello", "translation": "Bonjour"})
+        writer.flush(folder)  # at the end of the session: write what is queued, derive transcriptions.txt
+        writer.close()
+
+    Args:
+        flush_interval (float, optional): Seconds a record may wait before it is written.
+        max_batch (int, optional): Records written at once at most.
+        text_export (bool, optional): Derive transcriptions.txt from the log when a folder is closed.
+    """
+
+    def __init__(self, flush_interval=DEFAULT_FLUSH_INTERVAL, max_batch=DEFAULT_MAX_BATCH, text_export=True):
+        self.flush_interval = flush_interval
+        self.max_batch = max(1, max_batch)
+        self.text_export = text_export
+        self.records = 0
+        self.batches = 0
+        self.failures = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="session-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, folder, record):
+        """Queues ``record`` for the folder's session.jsonl and returns at once; a "time" is added if missing."""
+        if "time" not in record:
+            record = {"time": datetime.now().isoformat(timespec="milliseconds"), **record}
+        self._queue.put(("record", folder, record))
+
+    def flush(self, folder=None):
+        """
+        Blocks until every record queued so far has been written. With a folder, also derives its
+        transcriptions.txt if ``text_export`` is on.
+        """
+        done = threading.Event()
+        self._queue.put(("flush", folder, done))
+        done.wait()
+
+    def close(self):
+        """Writes what is queued and stops the thread."""
+        if self._thread.is_alive():
+            self._queue.put(("stop", None, None))
+            self._thread.join()
+
+    def _run(self):
+        pending = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                kind, folder, item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                kind = None  # the oldest pending record has waited long enough
+            if kind == "record":
+                pending.append((folder, item))
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(pending) < self.max_batch:
+                    continue
+            if pending:
+                self._append(pending)
+                pending = []
+            deadline = None
+            if kind == "flush":
+                if folder is not None and self.text_export:
+                    self._export(folder)
+                item.set()
+            elif kind == "stop":
+                return
+
+    def _append(self, pending):
+        lines = {}
+        for folder, record in pending:
+            lines.setdefault(folder, []).append(json.dumps(record, ensure_ascii=False) + "\n")
+        start = time.perf_counter()
+        for folder, folder_lines in lines.items():
+            try:
+                with open(os.path.join(folder, SESSION_LOG), "a", encoding="utf-8") as file:
+                    file.write("".join(folder_lines))
+            except OSError as e:
+                self.failures += len(folder_lines)
+                metrics.inc("session_records_failed_total", len(folder_lines))
+                logger.error(f"Failed to write {len(folder_lines)} session record(s) to {folder}: {e}")
+        self.records += len(pending)
+        self.batches += 1
+        metrics.observe("session_write_seconds", time.perf_counter() - start)
+
+    @staticmethod
+    def _export(folder):
+        try:
+            export_transcriptions(folder)
+        except OSError as e:
+            logger.error(f"Failed to export the transcriptions of {folder}: {e}")
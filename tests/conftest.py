@@ -0,0 +1,6 @@
+# conftest.py
+"""Shared test setup: the modules live at the repository root, next to main.py."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
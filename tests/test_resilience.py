@@ -0,0 +1,109 @@
+# test_resilience.py
+"""RetryPolicy and ResilientBackend against the fault-injecting stand-in server (fault_server.py)."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("openai")
+pytest.importorskip("numpy")
+pytest.importorskip("pydub")
+
+import backends
+import fault_server
+import resilience
+
+ANSWER = "[translated] Hola"
+
+
+@pytest.fixture
+def stand_in():
+    """Starts a stand-in server with the given Faults options; returns (faults, base_url)."""
+    servers = []
+
+    def start(**options):
+        faults = fault_server.Faults(**options)
+        server = fault_server.create_server(faults)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        host, port = server.server_address
+        return faults, f"http://{host}:{port}/v1"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def translate(base_url, policy, calls=1):
+    """Translates "Hola" ``calls`` times in a row; returns the results and the seconds the last call took."""
+
+    async def run():
+        backend = resilience.ResilientBackend(backends.OpenAIBackend("test-key", base_url=base_url), policy)
+        results = []
+        try:
+            for _ in range(calls):
+                start = time.monotonic()
+                results.append(await backend.translate("Hola", "Translate to English."))
+            return results, time.monotonic() - start
+        finally:
+            await backend.close()
+
+    return asyncio.run(run())
+
+
+def test_retries_error_statuses_and_resets(stand_in):
+    faults, url = stand_in(script=[500, 429, "reset", 503], retry_after=0)
+    results, _ = translate(url, resilience.RetryPolicy(attempts=5, base_delay=0.01, seed=1))
+    assert results == [ANSWER]
+    assert faults.stats == {"requests": 5, "errors": 3, "stalls": 0, "resets": 1}
+
+
+def test_gives_up_when_attempts_are_used_up(stand_in):
+    faults, url = stand_in(script=[500, 502, 500])
+    with pytest.raises(backends.BackendError) as raised:
+        translate(url, resilience.RetryPolicy(attempts=3, base_delay=0.01))
+    assert raised.value.status == 500
+    assert faults.stats["requests"] == 3
+
+
+def test_does_not_retry_client_errors(stand_in):
+    faults, url = stand_in(script=[400])
+    with pytest.raises(backends.BackendError):
+        translate(url, resilience.RetryPolicy(attempts=3, base_delay=0.01))
+    assert faults.stats["requests"] == 1
+
+
+def test_honours_retry_after(stand_in):
+    faults, url = stand_in(script=[429], retry_after=0.4)
+    results, seconds = translate(url, resilience.RetryPolicy(attempts=2, base_delay=0, max_delay=5))
+    assert results == [ANSWER]
+    assert seconds >= 0.4
+
+
+def test_caps_retry_after_at_max_delay(stand_in):
+    faults, url = stand_in(script=[503], retry_after=30)
+    results, seconds = translate(url, resilience.RetryPolicy(attempts=2, base_delay=0, max_delay=0.2))
+    assert results == [ANSWER]
+    assert 0.2 <= seconds < 5
+
+
+def test_deadline_fires_on_a_stall(stand_in):
+    faults, url = stand_in(script=["stall"], stall=10)
+    start = time.monotonic()
+    with pytest.raises(resilience.DeadlineExceeded):
+        translate(url, resilience.RetryPolicy(attempts=3, deadline=0.5))
+    assert time.monotonic() - start < 5
+    assert faults.stats["stalls"] == 1
+
+
+def test_hedge_wins_over_a_stalled_attempt(stand_in):
+    # The first call sets the latency percentile; the first attempt of the second call stalls and is hedged
+    faults, url = stand_in(script=[None, "stall"], latency=0.05, stall=10)
+    policy = resilience.RetryPolicy(attempts=1, deadline=5, hedge_percentile=50, hedge_min_samples=1)
+    results, seconds = translate(url, policy, calls=2)
+    assert results == [ANSWER, ANSWER]
+    assert seconds < 2
+    assert faults.stats == {"requests": 3, "errors": 0, "stalls": 1, "resets": 0}
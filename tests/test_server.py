@@ -0,0 +1,148 @@
+# test_server.py
+"""FairScheduler and TranslationServer (server.py) with the fake backend; no network beyond localhost."""
+import asyncio
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+websockets = pytest.importorskip("websockets")
+pytest.importorskip("httpx")
+pytest.importorskip("openai")
+pytest.importorskip("pydub")
+
+import backends
+import server
+
+RATE = server.RATE
+
+
+def run_jobs(scheduler, submissions):
+    """Queues (session, job) pairs in order, then starts ``scheduler`` and waits until every job has run."""
+
+    async def run():
+        for session_id, job in submissions:
+            await scheduler.submit(session_id, job)
+        scheduler.start()
+        try:
+            while scheduler._ring or scheduler._running:
+                await asyncio.sleep(0.01)
+        finally:
+            await scheduler.stop()
+
+    asyncio.run(run())
+
+
+def test_sessions_are_served_round_robin():
+    order = []
+
+    def job(name):
+        async def run():
+            order.append(name)
+            await asyncio.sleep(0)
+
+        return run
+
+    scheduler = server.FairScheduler(workers=1, per_session=1, max_queued=8)
+    # A talkative session queues all its work first; the quiet one still gets every other slot
+    submissions = [("a", job(f"a{i}")) for i in range(4)] + [("b", job(f"b{i}")) for i in range(2)]
+    run_jobs(scheduler, submissions)
+    assert order == ["a0", "b0", "a1", "b1", "a2", "a3"]
+
+
+def test_per_session_limit():
+    running = {"a": 0, "b": 0}
+    peak = {"a": 0, "b": 0}
+
+    def job(session_id):
+        async def run():
+            running[session_id] += 1
+            peak[session_id] = max(peak[session_id], running[session_id])
+            await asyncio.sleep(0.02)
+            running[session_id] -= 1
+
+        return run
+
+    scheduler = server.FairScheduler(workers=8, per_session=2, max_queued=8)
+    run_jobs(scheduler, [(session_id, job(session_id)) for session_id in "aabbaabbaa"])
+    assert peak == {"a": 2, "b": 2}
+
+
+def test_submit_waits_while_the_session_queue_is_full():
+    async def run():
+        release = asyncio.Event()
+
+        async def job():
+            await release.wait()
+
+        scheduler = server.FairScheduler(workers=1, per_session=1, max_queued=2)
+        scheduler.start()
+        try:
+            await scheduler.submit("a", job)  # taken by the only worker
+            await asyncio.sleep(0.01)
+            await scheduler.submit("a", job)
+            await scheduler.submit("a", job)  # the queue of "a" is now full
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(scheduler.submit("a", job), 0.1)
+            await asyncio.wait_for(scheduler.submit("b", job), 0.1)  # other sessions are not held up
+            release.set()
+            await asyncio.wait_for(scheduler.submit("a", job), 1)
+        finally:
+            await scheduler.stop()
+
+    asyncio.run(run())
+
+
+def speech(utterances):
+    """Int16 PCM with ``utterances`` one-second tones, each followed by a second of silence."""
+    t = np.arange(RATE) / RATE
+    tone = (5000 * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+    silence = np.zeros(RATE, dtype=np.int16)
+    return np.concatenate([part for _ in range(utterances) for part in (tone, silence)]).tobytes()
+
+
+async def session(url, utterances, language="French"):
+    """Runs one client session; returns the replies after 'ready', up to and including 'done'."""
+    async with websockets.connect(url, max_size=None) as websocket:
+        await websocket.send(json.dumps({"type": "start", "language": language}))
+        ready = json.loads(await websocket.recv())
+        assert ready["type"] == "ready" and ready["folder"] is None
+        pcm = speech(utterances)
+        chunk = RATE // 10 * 2  # 100 ms
+        for start in range(0, len(pcm), chunk):
+            await websocket.send(pcm[start:start + chunk])
+        await websocket.send("not json")
+        await websocket.send(json.dumps({"type": "end"}))
+        replies = []
+        while not replies or replies[-1]["type"] != "done":
+            replies.append(json.loads(await websocket.recv()))
+        return replies
+
+
+def test_sessions_get_their_replies_in_order():
+    # Random latencies finish utterances out of order; replies must still follow the audio
+    backend = backends.FakeBackend(
+        transcribe=backends.FakeStage("uniform:0.01,0.2"), translate=backends.FakeStage("uniform:0.01,0.2"), seed=3
+    )
+    translation_server = server.TranslationServer(backend, workers=4, per_session=3, max_queued=4, save=False)
+
+    async def run():
+        translation_server.scheduler.start()
+        try:
+            async with websockets.serve(translation_server.handle, "127.0.0.1", 0, max_size=None) as ws_server:
+                port = ws_server.sockets[0].getsockname()[1]
+                return await asyncio.gather(*(session(f"ws://127.0.0.1:{port}", count) for count in (3, 4, 2)))
+        finally:
+            await translation_server.scheduler.stop()
+
+    results = asyncio.run(run())
+    for count, replies in zip((3, 4, 2), results):
+        errors = [reply for reply in replies if reply["type"] == "error"]
+        assert len(errors) == 1 and "seq" not in errors[0]  # the malformed frame, answered without a seq
+        answers = [reply for reply in replies if reply["type"] in ("transcript", "translation")]
+        assert [(reply["type"], reply["seq"]) for reply in answers] == [
+            (kind, seq) for seq in range(count) for kind in ("transcript", "translation")
+        ]
+        assert all(reply["text"] for reply in answers)
+        assert replies[-1] == {"type": "done", "utterances": count}
+    assert backend.calls["transcribe"] == 9
@@ -0,0 +1,104 @@
+# test_transport.py
+"""Parsing of streamed chat completions (server-sent events) in transport.py."""
+import asyncio
+import json
+import threading
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+import fault_server
+import transport
+
+URL = "http://stand-in/v1/chat/completions"
+
+
+def chunk(content):
+    return "data: " + json.dumps({"choices": [{"index": 0, "delta": {"content": content}}]}) + "\n\n"
+
+
+def stream_tokens(*parts):
+    """Streams a chat completion whose response body arrives in ``parts``; returns the tokens."""
+
+    async def body():
+        for part in parts:
+            yield part.encode("utf-8")
+
+    def respond(request):
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, headers={"Content-Type": "text/event-stream"}, content=body())
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(respond)) as client:
+            return [token async for token in transport.astream_chat_completion(client, URL, {}, {"messages": []})]
+
+    return asyncio.run(run())
+
+
+def test_yields_tokens_until_done():
+    tokens = stream_tokens(chunk("Bon"), chunk("jour"), "data: [DONE]\n\n", chunk("ignored"))
+    assert tokens == ["Bon", "jour"]
+
+
+def test_events_split_across_reads():
+    body = chunk("Hello") + chunk(" world") + "data: [DONE]\n\n"
+    assert stream_tokens(*(body[i:i + 7] for i in range(0, len(body), 7))) == ["Hello", " world"]
+
+
+def test_skips_keep_alive_comments_and_other_fields():
+    tokens = stream_tokens(
+        ": keep-alive\n\n", "event: message\nid: 1\n" + chunk("Hi"), ": ping\n\n", "data: [DONE]\n\n"
+    )
+    assert tokens == ["Hi"]
+
+
+def test_joins_multi_line_data_fields():
+    event = json.dumps({"choices": [{"delta": {"content": "multi\nline"}}]}, indent=1)
+    multi_line = "".join(f"data: {line}\n" for line in event.split("\n")) + "\n"
+    assert stream_tokens(multi_line, "data: [DONE]\n\n") == ["multi\nline"]
+
+
+def test_skips_chunks_without_content():
+    empty = "data: " + json.dumps({"choices": [{"delta": {"role": "assistant"}}]}) + "\n\n"
+    assert stream_tokens(empty, 'data: {"choices": []}\n\n', chunk("Ok"), "data: [DONE]") == ["Ok"]
+
+
+def test_stream_cut_off_mid_event_raises():
+    with pytest.raises(httpx.RemoteProtocolError):
+        stream_tokens(chunk("Bon"), 'data: {"choices": [{"delta": {"cont')
+
+
+def test_stream_ending_without_done_raises():
+    with pytest.raises(httpx.RemoteProtocolError):
+        stream_tokens(chunk("Bon"), chunk("jour"))
+
+
+def test_error_status_raises():
+    def respond(request):
+        return httpx.Response(429, json={"error": {"message": "slow down"}})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(respond)) as client:
+            return [token async for token in transport.astream_chat_completion(client, URL, {}, {})]
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
+
+
+def test_streams_from_the_stand_in_server():
+    server = fault_server.create_server(fault_server.Faults(token_interval=0.01))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    payload = {"messages": [{"role": "user", "content": "Hola amigo"}]}
+
+    async def run():
+        async with httpx.AsyncClient() as client:
+            url = transport.chat_completion_url(f"http://{host}:{port}/v1")
+            return [token async for token in transport.astream_chat_completion(client, url, {}, payload)]
+
+    try:
+        assert "".join(asyncio.run(run())) == "[translated] Hola amigo"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,161 @@
+# transport.py
+"""
+Shared, keep-alive HTTP transport for every API call.
+
+Transcription, translation and text-to-speech all go through one pooled ``httpx.Client`` (or, for the asyncio
+engine, one ``httpx.AsyncClient``): the OpenAI client is built on top of it and the chat completion request uses it
+directly, so connections (and their TCP and TLS handshakes) are reused across utterances instead of being opened
+per call.
+
+Settings are read from the 'openai' section of config.yaml:
+
+    openai:
+      api_key: "..."
+      base_url: "https://api.openai.com/v1"  # point at a local stand-in server for testing
+      pool_size: 10                           # maximum open connections
+      timeout: 60                             # seconds to wait for a response
+      connect_timeout: 5                      # seconds to wait for a connection
+"""
+import json
+
+import httpx
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+KEEPALIVE_EXPIRY = 120.0  # seconds an idle connection is kept open; longer than a typical pause between utterances
+
+
+def transport_settings(config):
+    """
+    Extracts the transport settings from the loaded configuration, filling in defaults.
+
+    Args:
+        config (dict): The configuration loaded from config.yaml.
+
+    Returns:
+        dict: The keys 'base_url', 'pool_size', 'timeout' and 'connect_timeout'.
+    """
+    openai_config = (config or {}).get("openai") or {}
+    return {
+        "base_url": (openai_config.get("base_url") or DEFAULT_BASE_URL).rstrip("/"),
+        "pool_size": int(openai_config.get("pool_size") or DEFAULT_POOL_SIZE),
+        "timeout": float(openai_config.get("timeout") or DEFAULT_TIMEOUT),
+        "connect_timeout": float(openai_config.get("connect_timeout") or DEFAULT_CONNECT_TIMEOUT),
+    }
+
+
+def _client_options(pool_size, timeout, connect_timeout):
+    return {
+        "limits": httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(timeout, connect=connect_timeout),
+    }
+
+
+def create_http_client(
+    pool_size=DEFAULT_POOL_SIZE,
+    timeout=DEFAULT_TIMEOUT,
+    connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+    **_,
+):
+    """
+    Creates the pooled, keep-alive HTTP client shared by all API calls.
+
+    Args:
+        pool_size (int, optional): Maximum number of connections, all of which are kept alive when idle.
+        timeout (float, optional): Seconds to wait for reads, writes and a free pooled connection.
+        connect_timeout (float, optional): Seconds to wait while establishing a new connection.
+
+    Returns:
+        httpx.Client: The client; close it when the application exits.
+    """
+    return httpx.Client(**_client_options(pool_size, timeout, connect_timeout))
+
+
+def create_async_http_client(
+    pool_size=DEFAULT_POOL_SIZE,
+    timeout=DEFAULT_TIMEOUT,
+    connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+    **_,
+):
+    """
+    Creates the pooled, keep-alive HTTP client for the asyncio engine; the settings are as for create_http_client.
+
+    Returns:
+        httpx.AsyncClient: The client. Use it from a single event loop.
+    """
+    return httpx.AsyncClient(**_client_options(pool_size, timeout, connect_timeout))
+
+
+def chat_completion_url(base_url):
+    return f"{base_url}/chat/completions"
+
+
+async def iter_sse_data(lines):
+    """
+    Yields the data of each event of a server-sent event stream until the '[DONE]' marker.
+
+    The 'data:' lines of one event are joined with newlines and a blank line ends the event. Comments (such as
+    ': keep-alive') and other fields are skipped.
+
+    Args:
+        lines (async iterable): Decoded text lines, e.g. from ``httpx.Response.aiter_lines()``.
+
+    Raises:
+        httpx.RemoteProtocolError: If the stream ends before '[DONE]', e.g. when the connection was cut in the
+                                   middle of an event; the unfinished event is not yielded.
+    """
+    data = []
+    async for line in lines:
+        if not line:
+            if data:
+                event, data = "\n".join(data), []
+                if event == "[DONE]":
+                    return
+                yield event
+            continue
+        if line.startswith("data:"):
+            value = line[len("data:"):]
+            data.append(value[1:] if value.startswith(" ") else value)
+    if data == ["[DONE]"]:
+        return  # the marker without its closing blank line
+    raise httpx.RemoteProtocolError("The event stream ended before [DONE]")
+
+
+def _delta_token(data):
+    # The content delta of one streamed chat completion chunk, or None
+    choices = json.loads(data).get("choices") or []
+    if not choices:
+        return None
+    return (choices[0].get("delta") or {}).get("content")
+
+
+async def astream_chat_completion(http_client, url, headers, payload):
+    """
+    Sends a chat completion request with streaming enabled and yields the content tokens as they arrive.
+
+    Args:
+        http_client (httpx.AsyncClient): The shared client.
+        url (str): The chat completions endpoint.
+        headers (dict): Request headers, including authorization.
+        payload (dict): The request body; 'stream' is set to True.
+
+    Yields:
+        str: Each non-empty content delta, in order.
+
+    Raises:
+        httpx.HTTPStatusError: If the server answers with an error status.
+    """
+    async with http_client.stream("POST", url, headers=headers, json={**payload, "stream": True}) as response:
+        if response.status_code != 200:
+            await response.aread()
+            response.raise_for_status()
+        async for data in iter_sse_data(response.aiter_lines()):
+            token = _delta_token(data)
+            if token:
+                yield token
@@ -0,0 +1,217 @@
+# vad.py
+"""
+Streaming microphone capture with a cheap voice-activity detector.
+
+Instead of recording a fixed duration, audio is read continuously from an ``sd.InputStream`` and split into
+utterances: a chunk is emitted as soon as enough trailing silence follows speech. Speech is detected per frame
+from the RMS energy and zero-crossing rate of the int16 samples, which costs a few microseconds per frame.
+"""
+import collections
+import queue
+
+import numpy as np
+
+# Defaults tuned for 16 kHz int16 speech from a desktop microphone
+DEFAULT_FRAME_MS = 30
+DEFAULT_MIN_UTTERANCE = 0.5  # seconds of audio below which an utterance is discarded as a click or cough
+DEFAULT_MAX_UTTERANCE = 30.0  # seconds after which an utterance is cut even if the speaker has not paused
+DEFAULT_SILENCE_DURATION = 0.6  # seconds of trailing silence that end an utterance
+DEFAULT_ENERGY_THRESHOLD = 500.0  # RMS in int16 units
+DEFAULT_ZCR_THRESHOLD = 0.25  # zero crossings per sample for unvoiced (fricative) speech
+DEFAULT_PREROLL = 0.2  # seconds of audio kept from before speech onset
+
+
+class VoiceActivityDetector:
+    """
+    Classifies int16 audio frames as speech or silence.
+
+    A frame is speech when its RMS energy reaches ``energy_threshold``. Quieter frames still count as speech when
+    they carry at least half the threshold energy and a high zero-crossing rate, which catches unvoiced sounds
+    such as 's' and 'f' that have little energy but are clearly not background hum.
+
+    Args:
+        energy_threshold (float, optional): RMS level, in int16 units, above which a frame is speech.
+        zcr_threshold (float, optional): Zero-crossing rate above which a low-energy frame is still speech.
+    """
+
+    def __init__(self, energy_threshold=DEFAULT_ENERGY_THRESHOLD, zcr_threshold=DEFAULT_ZCR_THRESHOLD):
+        self.energy_threshold = float(energy_threshold)
+        self.zcr_threshold = float(zcr_threshold)
+
+    @staticmethod
+    def frame_features(frame):
+        """Returns the (rms, zero_crossing_rate) of a frame of int16 samples."""
+        samples = np.asarray(frame).reshape(-1)
+        if samples.size == 0:
+            return 0.0, 0.0
+        as_float = samples.astype(np.float32)
+        rms = float(np.sqrt(np.mean(as_float * as_float)))
+        signs = np.signbit(samples)
+        zcr = float(np.count_nonzero(signs[1:] != signs[:-1])) / samples.size
+        return rms, zcr
+
+    def is_speech(self, frame):
+        rms, zcr = self.frame_features(frame)
+        if rms >= self.energy_threshold:
+            return True
+        return rms >= self.energy_threshold / 2 and zcr >= self.zcr_threshold
+
+
+class UtteranceSegmenter:
+    """
+    Groups a stream of fixed-size frames into utterances using a VoiceActivityDetector.
+
+    Feed frames with ``process``; it returns the utterances completed by that frame (usually none). The segmenter
+    holds no audio device, so it can be driven from a live stream or from a recording.
+
+    Args:
+        rate (int): Sample rate of the frames.
+        frame_samples (int): Number of samples in each frame.
+        detector (VoiceActivityDetector, optional): The detector to use. Defaults to one with default thresholds.
+        min_duration (float, optional): Utterances shorter than this many seconds are discarded.
+        max_duration (float, optional): Utterances are cut once they reach this many seconds.
+        silence_duration (float, optional): Seconds of trailing silence that end an utterance.
+        preroll (float, optional): Seconds of audio before speech onset to include in the utterance.
+    """
+
+    def __init__(
+        self,
+        rate,
+        frame_samples,
+        detector=None,
+        min_duration=DEFAULT_MIN_UTTERANCE,
+        max_duration=DEFAULT_MAX_UTTERANCE,
+        silence_duration=DEFAULT_SILENCE_DURATION,
+        preroll=DEFAULT_PREROLL,
+    ):
+        if max_duration <= min_duration:
+            raise ValueError("max_duration must be greater than min_duration")
+        self.rate = rate
+        self.frame_samples = frame_samples
+        self.detector = detector or VoiceActivityDetector()
+        frame_seconds = frame_samples / rate
+        self.min_frames = max(1, int(round(min_duration / frame_seconds)))
+        self.max_frames = max(self.min_frames + 1, int(round(max_duration / frame_seconds)))
+        self.silence_frames = max(1, int(round(silence_duration / frame_seconds)))
+        self._preroll = collections.deque(maxlen=max(0, int(round(preroll / frame_seconds))))
+        self._frames = []
+        self._trailing_silence = 0
+
+    @property
+    def in_utterance(self):
+        return bool(self._frames)
+
+    def _finish(self):
+        frames = self._frames
+        # Drop most of the trailing silence, keeping a short tail so the last word is not clipped
+        keep_tail = min(self._trailing_silence, max(1, self.silence_frames // 3))
+        if self._trailing_silence > keep_tail:
+            frames = frames[: len(frames) - (self._trailing_silence - keep_tail)]
+        self._frames = []
+        self._trailing_silence = 0
+        if len(frames) < self.min_frames:
+            return None
+        return np.concatenate(frames)
+
+    def process(self, frame):
+        """
+        Adds one frame and returns a list of completed utterances (int16 NumPy arrays, possibly empty).
+        """
+        completed = []
+        speech = self.detector.is_speech(frame)
+
+        if not self._frames:
+            if speech:
+                self._frames = list(self._preroll) + [frame]
+                self._preroll.clear()
+            else:
+                self._preroll.append(frame)
+            return completed
+
+        self._frames.append(frame)
+        self._trailing_silence = 0 if speech else self._trailing_silence + 1
+
+        if self._trailing_silence >= self.silence_frames:
+            utterance = self._finish()
+            if utterance is not None:
+                completed.append(utterance)
+        elif len(self._frames) >= self.max_frames:
+            # Cut overly long utterances without waiting for a pause; speech continues in the next one
+            self._trailing_silence = 0
+            utterance = self._finish()
+            if utterance is not None:
+                completed.append(utterance)
+        return completed
+
+    def flush(self):
+        """Returns the utterance in progress, if it is long enough, and resets the segmenter."""
+        if not self._frames:
+            return None
+        return self._finish()
+
+
+def stream_utterances(
+    rate,
+    channels=1,
+    stop_event=None,
+    frame_ms=DEFAULT_FRAME_MS,
+    energy_threshold=DEFAULT_ENERGY_THRESHOLD,
+    min_duration=DEFAULT_MIN_UTTERANCE,
+    max_duration=DEFAULT_MAX_UTTERANCE,
+    silence_duration=DEFAULT_SILENCE_DURATION,
+):
+    """
+    Opens the default microphone and yields one int16 NumPy array per detected utterance.
+
+    Frames are delivered by the sounddevice callback into a queue and segmented on the consuming thread, so the
+    audio callback itself only copies the block.
+
+    Args:
+        rate (int): Sample rate to record at.
+        channels (int, optional): Number of input channels. Defaults to 1.
+        stop_event (threading.Event, optional): When set, the in-progress utterance is flushed and the generator
+                                                ends.
+        frame_ms (int, optional): Analysis frame length in milliseconds.
+        energy_threshold (float, optional): RMS threshold for speech, in int16 units.
+        min_duration (float, optional): Minimum utterance length in seconds.
+        max_duration (float, optional): Maximum utterance length in seconds.
+        silence_duration (float, optional): Trailing silence, in seconds, that ends an utterance.
+
+    Yields:
+        numpy.ndarray: The samples of each utterance, shaped (n, channels).
+    """
+    # Imported here so the detector and segmenter also work without an audio device, e.g. on the server
+    import sounddevice as sd
+
+    frame_samples = int(rate * frame_ms / 1000)
+    segmenter = UtteranceSegmenter(
+        rate,
+        frame_samples,
+        detector=VoiceActivityDetector(energy_threshold=energy_threshold),
+        min_duration=min_duration,
+        max_duration=max_duration,
+        silence_duration=silence_duration,
+    )
+    frames = queue.Queue()
+
+    def callback(indata, frame_count, time_info, status):
+        frames.put(indata.copy())
+
+    with sd.InputStream(
+        samplerate=rate,
+        channels=channels,
+        dtype="int16",
+        blocksize=frame_samples,
+        callback=callback,
+    ):
+        while stop_event is None or not stop_event.is_set():
+            try:
+                frame = frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            for utterance in segmenter.process(frame):
+                yield utterance
+
+    utterance = segmenter.flush()
+    if utterance is not None:
+        yield utterance
@@ -0,0 +1,175 @@
+# whisper_models.py
+"""
+Process-wide registry of local Whisper models.
+
+Each model size is loaded from disk once, on first use, and then stays resident for the life of the process.
+A model can also be preloaded on a background thread so that loading overlaps with recording.
+"""
+import os
+import threading
+import time
+
+import torch
+import whisper
+
+import audio_io
+import caches
+
+DEFAULT_MODEL = "small"
+
+_models = {}
+_load_times = {}
+_registry_lock = threading.Lock()
+_size_locks = {}
+_stores = {}
+
+
+def _lock_for(size):
+    with _registry_lock:
+        return _size_locks.setdefault(size, threading.Lock())
+
+
+def get_model(size=DEFAULT_MODEL):
+    """
+    Returns the Whisper model of the given size, loading it on first use.
+
+    Concurrent callers asking for the same size wait for a single load instead of loading it twice.
+
+    Args:
+        size (str, optional): A Whisper model name such as 'tiny', 'base', 'small' or 'medium'.
+
+    Returns:
+        whisper.Whisper: The resident model.
+    """
+    model = _models.get(size)
+    if model is not None:
+        return model
+    with _lock_for(size):
+        model = _models.get(size)
+        if model is None:
+            start = time.perf_counter()
+            model = whisper.load_model(size)
+            _load_times[size] = time.perf_counter() - start
+            _models[size] = model
+    return model
+
+
+def load_time(size=DEFAULT_MODEL):
+    """Returns how many seconds loading the model took, or None if it has not been loaded."""
+    return _load_times.get(size)
+
+
+def is_loaded(size=DEFAULT_MODEL):
+    return size in _models
+
+
+def warm_up(size=DEFAULT_MODEL):
+    """Loads the model if needed and returns its load time; unlike get_model, cheap to return from a worker."""
+    get_model(size)
+    return load_time(size)
+
+
+def preload(size=DEFAULT_MODEL):
+    """
+    Starts loading the model on a background thread and returns the thread. Later calls to get_model wait for
+    this load rather than starting another one.
+    """
+    thread = threading.Thread(target=get_model, args=(size,), name=f"whisper-preload-{size}", daemon=True)
+    thread.start()
+    return thread
+
+
+def transcribe(audio, size=DEFAULT_MODEL, **options):
+    """
+    Transcribes audio with a resident model and times the two phases separately.
+
+    Args:
+        audio (str | numpy.ndarray): A file path, or float32 samples at 16 kHz.
+        size (str, optional): The Whisper model name.
+        **options: Passed through to ``model.transcribe``.
+
+    Returns:
+        tuple: (result, load_seconds, inference_seconds). load_seconds is the time spent waiting for the model in
+               this call, which is close to zero once it is resident.
+    """
+    start = time.perf_counter()
+    model = get_model(size)
+    loaded = time.perf_counter()
+    result = model.transcribe(audio, **options)
+    return result, loaded - start, time.perf_counter() - loaded
+
+
+def transcription_key(path, size=DEFAULT_MODEL, *options):
+    """
+    Returns the cache key for transcribing a file: a hash of its decoded 16 kHz PCM samples, the model and any
+    options that change the result.
+    """
+    return caches.make_key(audio_io.pcm_fingerprint(path, whisper.audio.SAMPLE_RATE), "whisper", size, *options)
+
+
+def open_store(path, max_bytes):
+    """
+    Returns this process's SQLiteStore for the given file, opening it on first use. Stores are keyed by process
+    id, so a worker forked from a process that had the store open opens its own connection instead of sharing the
+    inherited one, which SQLite does not support.
+    """
+    key = (os.getpid(), path)
+    with _registry_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = caches.SQLiteStore(path, max_bytes)
+        return store
+
+
+def init_worker(torch_threads):
+    """
+    Process-pool initializer: limits PyTorch's intra-op threads so that several worker processes share the CPU
+    cores instead of each trying to use all of them.
+    """
+    torch.set_num_threads(max(1, torch_threads))
+
+
+def transcribe_file(path, size=DEFAULT_MODEL, cache_path=None, cache_bytes=64 * 1024 * 1024):
+    """
+    Transcribes one file with the worker process's resident model. Picklable, for use with a process pool.
+
+    If ``cache_path`` is given, the text is looked up in and stored to that SQLite transcription cache (shared by
+    all workers), keyed by ``transcription_key``.
+
+    Returns:
+        dict: The 'transcription' plus the 'load_seconds' and 'inference_seconds' timings.
+
+    Raises:
+        RuntimeError: If the model produced no text.
+    """
+    store = key = None
+    if cache_path:
+        store = open_store(cache_path, cache_bytes)
+        key = transcription_key(path, size)
+        text = store.get(key)
+        if text is not None:
+            return {"transcription": text, "load_seconds": 0.0, "inference_seconds": 0.0}
+
+    result, load_seconds, inference_seconds = transcribe(path, size)
+    text = result["text"].strip()
+    if not text:
+        raise RuntimeError("No speech found")
+    if store is not None:
+        store.put(key, text)
+    return {
+        "transcription": text,
+        "load_seconds": round(load_seconds, 3),
+        "inference_seconds": round(inference_seconds, 3),
+    }
+
+
+def transcribe_samples(samples, size=DEFAULT_MODEL):
+    """
+    Transcribes a chunk of float32 16 kHz samples with the worker process's resident model. Picklable, for use
+    with a process pool.
+
+    Returns:
+        str: The stripped transcription text (empty if the chunk held no speech).
+    """
+    result, _, _ = transcribe(samples, size)
+    return result["text"].strip()